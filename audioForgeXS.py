@@ -6,122 +6,594 @@ __version__ = "v3.0.0"
 
 
 
-import argparse, sys, time, os
-from tqdm import tqdm
-from modules.debugLogger import DebugLogger
-from modules.getAudioInfo import GetAudioInfo
-from modules.pathProcessing import PathProcessing
-from modules.audioBasicProcessing import AudioBasicProcessing
-from modules.getTestSetAndNorm import GetTestSetAndNorm
-from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+#启动时只导入标准库, tqdm/numpy/soundfile/pydub 等较重的依赖在用到的子命令/功能内才导入,
+#-v/--help 和 getFileSize/getInfo 等轻量功能启动更快, 见 benchmarks/startupBenchmark.py
+import argparse, sys, time, os, itertools, collections
 
 
 Basic_functions_info = {"audioNorm": "音频归一化", "getInfo":"获取音频信息",
                         "getMono": "获取音频单通道", "mp3ToWav":"mp3转wav格式",
                         "pcmToWav": "pcm转wav格式", "wavHeadRepair": "wav音频头修复",
                         "getFileSize": "获取wav大小","getAllWavDuration": "获取输入所有wav的总时长",
-                        "structuredAudio": "音频结构化，主要是整理音频结构，方便整理入库"}
+                        "structuredAudio": "音频结构化，主要是整理音频结构，方便整理入库",
+                        "corpusStats": "按结构化文件名统计各指令/人/性别/年龄段/距离/来源的条数与时长"}
 
 class AudioProcessSet:
-    def __init__(self, output_root_path, debug):
+    #getInfo/getAllWavDuration 每批解析的头数量
+    HEAD_BATCH_SIZE = 1024
+    #功能名称 -> (处理对象, 方法名)
+    FUNCTION_DICT = {"audioNorm": ("AudioBasicProcessing", "wavNorm"),
+                     "getInfo": ("GetAudioInfo", "getWavInfor"),
+                     "getMono": ("AudioBasicProcessing", "getMono"),
+                     "mp3ToWav": ("AudioBasicProcessing", "mp3ToWav"),
+                     "wavHeadRepair": ("AudioBasicProcessing", "wavHeadRepair"),
+                     "pcmToWav": ("AudioBasicProcessing", "pcmToWav"),
+                     "getFileSize": ("AudioBasicProcessing", "getFileSize"),
+                     "getAllWavDuration": ("GetAudioInfo", "getWavFileDuration"),
+                     "structuredAudio": ("AudioDataStructureGenerator", "StartStructuredAudio"),
+                     "pipeline": ("AudioPipeline", "run"),
+                     }
+
+    def __init__(self, output_root_path, debug, jobs=1, block_size=0, cache=False, walk_threads=0, in_place=False,
+                 keywords_config=None, norm_channel=0, subtype=None, staged=False, queue_depth=4, memory_budget=1024,
+                 incremental=False, shard=None):
         """
             功能:   初始化参数
             参数：  output_dir: 处理结果输出目录
+                    debug: 是否打开调试打印
+                    jobs: 并行处理的进程数, 1 为单进程, 0 为使用全部 CPU 核
+                    block_size: 流式归一化每块的帧数, 0 为整文件处理
+                    cache: 是否使用输出目录下的元数据缓存
+                    walk_threads: 并行遍历目录的线程数, 0 为单线程顺序遍历
+                    in_place: wavHeadRepair 是否直接修复输入文件
+                    keywords_config: structuredAudio 的扩展关键字配置文件
+                    norm_channel: audioNorm 时多通道音频选取的通道索引或 "mean"
+                    subtype: getMono/audioNorm/流水线输出的编码, None 为与输入一致
+                    staged: audioNorm/getMono/流水线是否按 读取/计算/写出 三段重叠执行
+                    queue_depth: 三段之间队列的长度
+                    memory_budget: 三段执行时同时在内存中的音频数据上限(MB)
+                    incremental: 是否增量处理, 跳过输出已是最新的音频
+                    shard: 分片 "K/N", 只处理按相对路径哈希属于第 K 个分片的音频, None 为不分片
                     Framerate: 音频采样率:  修复头和pcmToWav用到
                     SampleEncoding: 音频位宽:   修复头和pcmToWav用到
                     channels:       音频通道数: 修复头和pcmToWav用到
         """
         self.output_root_path = output_root_path
-
-
+        self.debug = debug
+        self.jobs = jobs
+        self.block_size = block_size
+        self.cache = cache
+        self.walk_threads = walk_threads
+        self.in_place = in_place
+        self.keywords_config = keywords_config
+        self.norm_channel = norm_channel
+        self.subtype = subtype
+        self.staged = staged
+        self.queue_depth = queue_depth
+        self.memory_budget = memory_budget
+        self.incremental = incremental
+        self.shard = shard
+
+        from modules.debugLogger import DebugLogger
         if debug:
             self.logger = DebugLogger("debug")
         else:
             self.logger = DebugLogger("info")
-        self.PathProcessing = PathProcessing(self.logger)
-        self.AudioBasicProcessing = AudioBasicProcessing(self.logger)
-        self.GetAudioInfo = GetAudioInfo(self.logger)
-        self.AudioDataStructureGenerator = AudioDataStructureGenerator(self.logger)
+        self.ShardPlan = None
+        if shard:
+            from modules.shardPlan import ShardPlan
+            self.ShardPlan = ShardPlan(shard, self.logger)
+        #处理对象在第一次用到时才创建, 只导入当前功能需要的模块
+        self.obj_dict = {}
+        self.MetadataCache = None
+        if cache:
+            from modules.metadataCache import MetadataCache
+            cache_path = os.path.join(output_root_path, MetadataCache.CACHE_FILE_NAME)
+            #各分片使用各自的缓存文件, 多台机器不会同时写同一个数据库
+            if self.ShardPlan is not None:
+                cache_path = self.ShardPlan.shard_path(cache_path)
+            self.MetadataCache = MetadataCache(cache_path, self.logger)
+
+
+    @property
+    def PathProcessing(self):
+        if "PathProcessing" not in self.obj_dict:
+            from modules.pathProcessing import PathProcessing
+            self.obj_dict["PathProcessing"] = PathProcessing(self.logger)
+        return self.obj_dict["PathProcessing"]
+
+
+    @property
+    def AudioBasicProcessing(self):
+        if "AudioBasicProcessing" not in self.obj_dict:
+            from modules.audioBasicProcessing import AudioBasicProcessing
+            obj = AudioBasicProcessing(self.logger, self.block_size, self.norm_channel, self.subtype)
+            obj.cache = self.MetadataCache
+            self.obj_dict["AudioBasicProcessing"] = obj
+        return self.obj_dict["AudioBasicProcessing"]
+
+
+    @property
+    def GetAudioInfo(self):
+        if "GetAudioInfo" not in self.obj_dict:
+            from modules.getAudioInfo import GetAudioInfo
+            obj = GetAudioInfo(self.logger)
+            obj.cache = self.MetadataCache
+            self.obj_dict["GetAudioInfo"] = obj
+        return self.obj_dict["GetAudioInfo"]
+
+
+    @property
+    def AudioDataStructureGenerator(self):
+        if "AudioDataStructureGenerator" not in self.obj_dict:
+            from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+            obj = AudioDataStructureGenerator(self.logger)
+            if self.keywords_config:
+                obj.load_keywords_config(self.keywords_config)
+            obj.cache = self.MetadataCache
+            self.obj_dict["AudioDataStructureGenerator"] = obj
+        return self.obj_dict["AudioDataStructureGenerator"]
+
+
+    @property
+    def AudioPipeline(self):
+        if "AudioPipeline" not in self.obj_dict:
+            from modules.audioPipeline import AudioPipeline
+            self.obj_dict["AudioPipeline"] = AudioPipeline(self.output_root_path, self.logger, self.AudioBasicProcessing,
+                                                           self.AudioDataStructureGenerator)
+        return self.obj_dict["AudioPipeline"]
+
+
+    def get_function(self, process_type):
+        """
+            功能:
+                    * 功能名称 -> 处理函数, 只创建该功能所属的处理对象
+        """
+        obj_name, method_name = self.FUNCTION_DICT[process_type]
+        return getattr(getattr(self, obj_name), method_name)
+
+
+    def worker_kwargs(self):
+        """
+            功能:
+                    * 工作进程内重建 AudioProcessSet 所需的构造参数
+            返回值:
+                    * dict 构造参数
+        """
+        return {"output_root_path": self.output_root_path, "debug": self.debug, "jobs": 1,
+                "block_size": self.block_size, "cache": self.cache,
+                "in_place": self.in_place, "keywords_config": self.keywords_config,
+                "norm_channel": self.norm_channel, "subtype": self.subtype, "shard": self.shard}
+
+
+    def process_single(self, audio_path, process_type, input_wav_info=None):
+        """
+            功能:
+                    * 单条音频的基础操作处理, 单进程和工作进程共用
+            参数:
+                    * audio_path: 输入音频路径
+                    * process_type: 功能名称
+                    * input_wav_info: 功能参数
+            返回值:
+                    * 对应功能的返回值
+        """
+        ouput_path = self.output_root_path
+        if process_type == "wavHeadRepair" and self.in_place:
+            ouput_path = audio_path
+        elif process_type in  ["audioNorm", "getMono", "mp3ToWav", "wavHeadRepair", "pcmToWav", "pipeline"]:
+            ouput_path = self.PathProcessing.mirror_path(self.output_root_path, audio_path)
+            os.makedirs(os.path.dirname(ouput_path), exist_ok=True)
+        with self.logger.metrics.timer(process_type):
+            return self.get_function(process_type)(audio_path, ouput_path, input_wav_info)
+
+
+    def io_workers(self):
+        """
+            功能:
+                    * IO 密集操作(读头、计算 MD5)的并发线程数
+        """
+        if self.jobs <= 0:
+            return os.cpu_count() or 1
+        return self.jobs if self.jobs > 1 else 8
+
+
+    def _iter_batches(self, audio_path_iter):
+        """
+            功能:
+                    * 把路径迭代器按 HEAD_BATCH_SIZE 分批
+        """
+        audio_path_iter = iter(audio_path_iter)
+        while True:
+            batch_path_list = list(itertools.islice(audio_path_iter, self.HEAD_BATCH_SIZE))
+            if not batch_path_list:
+                return
+            yield batch_path_list
+
+
+    def _iter_walk_ahead(self, input_path, lock_regular, progress):
+        """
+            功能:
+                    * 在后台线程中遍历输入(含分片过滤), 遍历到的音频数实时计入进度条总数
+                    * 处理不必等待遍历完成, 遍历通常远快于处理, 进度条很快就有百分比和剩余时间
+            参数:
+                    * input_path: 输入音频路径, 支持文件/目录
+                    * lock_regular: 文件名正则
+                    * progress: tqdm 进度条
+            返回值:
+                    * 生成器 音频路径, 与遍历顺序一致
+        """
+        import queue, threading
+        path_queue = queue.Queue()
+        stop_event = threading.Event()
+        walk_end = object()
+        def walk():
+            try:
+                file_num = 0
+                root_is_dir = os.path.isdir(input_path)
+                for audio_path in self.PathProcessing.iter_file_list(input_path, lock_regular, self.walk_threads):
+                    if stop_event.is_set():
+                        return
+                    if self.ShardPlan is not None and \
+                            not self.ShardPlan.owns(self.ShardPlan.relative_key(audio_path, input_path, root_is_dir)):
+                        continue
+                    file_num += 1
+                    progress.total = file_num
+                    path_queue.put(audio_path)
+                progress.total = file_num
+                path_queue.put(walk_end)
+            except BaseException as e:
+                path_queue.put(e)
+
+        threading.Thread(target=walk, name="walkAhead", daemon=True).start()
+        try:
+            while True:
+                item = path_queue.get()
+                if item is walk_end:
+                    return
+                if isinstance(item, BaseException):
+                    raise item
+                yield item
+        finally:
+            stop_event.set()
+
+
+    def incremental_signature(self, process_type, input_wav_info):
+        """
+            功能:
+                    * 增量处理的参数签名, 功能参数或影响输出的设置变化时签名变化
+            返回值:
+                    * str 签名, 不支持增量处理的功能(无输出文件/移动或原地修改输入)返回 None
+        """
+        if process_type not in ["audioNorm", "getMono", "mp3ToWav", "wavHeadRepair", "pcmToWav", "pipeline"]:
+            return None
+        if process_type == "wavHeadRepair" and self.in_place:
+            return None
+        if process_type == "pipeline" and input_wav_info["stages"][-1] == "structuredAudio":
+            return None
+        from modules.buildManifest import BuildManifest
+        return BuildManifest.signature(process_type, input_wav_info, self.subtype, str(self.norm_channel))
+
+
+    def expected_outputs(self, audio_path, process_type, input_wav_info):
+        """
+            功能:
+                    * 单条音频处理后会生成的全部输出路径, 与 process_single 的输出位置一致
+            返回值:
+                    * list 输出路径
+        """
+        ouput_path = self.PathProcessing.mirror_path(self.output_root_path, audio_path)
+        if process_type == "getMono":
+            return self.AudioBasicProcessing.mono_output_paths(audio_path, ouput_path, input_wav_info)
+        if process_type in ["mp3ToWav", "pcmToWav"]:
+            return [self.AudioBasicProcessing.wav_output_path(ouput_path)]
+        if process_type == "pipeline":
+            return [self.AudioPipeline.output_path(audio_path, ouput_path, input_wav_info["stages"])]
+        return [ouput_path]
+
+
+    def staged_fill_para(self, process_type, input_wav_info):
+        """
+            功能:
+                    * 把功能参数转换为流水线参数, 供三段执行引擎使用
+            返回值:
+                    * dict {"stages": 步骤列表, "paras": 步骤 -> 参数}, 不支持三段执行的功能返回 None
+        """
+        if process_type == "pipeline":
+            return input_wav_info
+        if process_type == "audioNorm":
+            return {"stages": ["audioNorm"], "paras": {"audioNorm": input_wav_info}}
+        if process_type == "getMono" and not self.AudioPipeline.validate_paras({"getMono": input_wav_info}):
+            return {"stages": ["getMono"], "paras": {"getMono": input_wav_info}}
+        return None
+
 
+    def _iter_staged_results(self, audio_path_iter, fill_para):
+        """
+            功能:
+                    * 读取/计算/写出三段重叠执行, 计算线程数为 jobs
+            返回值:
+                    * 生成器 (音频路径, 是否成功, 返回值, 错误信息)
+        """
+        #结构化输出路径依赖 AudioDataStructureGenerator 的内部状态, 只用一个读取线程
+        read_threads = 1 if fill_para["stages"][-1] == "structuredAudio" else 2
+        compute_threads = self.jobs if self.jobs > 0 else (os.cpu_count() or 1)
+        from modules.stagedExecutor import StagedExecutor
+        executor = StagedExecutor(self.AudioPipeline, self.queue_depth, self.memory_budget * 1024 * 1024,
+                                  read_threads, compute_threads, 2, self.logger)
+        tasks = ((audio_path, self.PathProcessing.mirror_path(self.output_root_path, audio_path), fill_para)
+                 for audio_path in audio_path_iter)
+        yield from executor.imap(tasks)
+
+
+    def _iter_process_results(self, audio_path_iter, process_type, input_wav_info):
+        """
+            功能:
+                    * 按输入顺序返回每条音频的处理结果, jobs > 1 时分发到进程池
+            参数:
+                    * audio_path_iter: 音频路径迭代器, 可以是仍在遍历中的生成器
+                    * process_type: 功能名称
+                    * input_wav_info: 功能参数
+            返回值:
+                    * 生成器 (音频路径, 是否成功, 返回值, 错误信息)
+        """
+        if process_type in ["getInfo", "getAllWavDuration", "corpusStats"]:
+            #只读头信息的功能属于 IO 密集, 在主进程内多线程批量解析(可命中元数据缓存), 分批返回以便进度条前进
+            for batch_path_list in self._iter_batches(audio_path_iter):
+                with self.logger.metrics.timer("getWavInfoBatch"):
+                    batch_result_list = self.GetAudioInfo.getWavInfoBatch(batch_path_list, self.io_workers())
+                for audio_path, (info, err) in zip(batch_path_list, batch_result_list):
+                    if err:
+                        yield audio_path, False, None, err
+                    elif process_type == "getInfo":
+                        yield audio_path, True, info, None
+                    else:
+                        #时长以 (数据字节数, 每秒字节数) 返回, 整数累加, 分片合并后与不分片的结果一致
+                        yield audio_path, True, self.GetAudioInfo.duration_bytes(info), None
+            return
+
+        if self.staged:
+            fill_para = self.staged_fill_para(process_type, input_wav_info)
+            if fill_para is not None:
+                yield from self._iter_staged_results(audio_path_iter, fill_para)
+                return
+            self.logger.log(f"[AudioProcessSet]: 警告! {process_type} {input_wav_info} 不支持 --staged，按逐条处理", "warning")
+
+        if self.jobs == 1 and process_type == "structuredAudio":
+            #先多线程并发计算一批文件的 MD5, 逐条处理时直接命中; 没有 LAB 的文件会被跳过, 不计算
+            for batch_path_list in self._iter_batches(audio_path_iter):
+                self.AudioDataStructureGenerator.prefetch_file_md5(
+                    [audio_path for audio_path in batch_path_list if self.AudioDataStructureGenerator.find_lab(audio_path)],
+                    self.io_workers())
+                for audio_path in batch_path_list:
+                    try:
+                        yield audio_path, True, self.process_single(audio_path, process_type, input_wav_info), None
+                    except Exception as e:
+                        yield audio_path, False, None, f"{type(e).__name__}: {e}"
+            return
+
+        if self.jobs == 1:
+            for audio_path in audio_path_iter:
+                try:
+                    yield audio_path, True, self.process_single(audio_path, process_type, input_wav_info), None
+                except Exception as e:
+                    yield audio_path, False, None, f"{type(e).__name__}: {e}"
+            return
+
+        submitted_path_queue = collections.deque()
+        def iter_args():
+            for audio_path in audio_path_iter:
+                submitted_path_queue.append(audio_path)
+                yield audio_path, process_type, input_wav_info
+
+        from modules.workerPool import WorkerPool
+        with WorkerPool(AudioProcessSet, self.worker_kwargs(), self.jobs, self.logger) as pool:
+            for ok, res, err in pool.imap("process_single", iter_args()):
+                yield submitted_path_queue.popleft(), ok, res, err
 
 
     def audio_basic_process(self, input_path, process_type="norm", input_wav_info=None):
         """
             功能:
                     * 音频基础操作处理
+                    * 边遍历边处理, 不必等待整个目录树遍历完成
             参数:
-                    *
+                    * input_path: 输入音频路径, 支持文件/目录
+                    * process_type: 功能名称
+                    * input_wav_info: 功能参数
             返回值:
                     * /
         """
-        fun_obj_dict = {"audioNorm": self.AudioBasicProcessing.wavNorm,
-                        "getInfo": self.GetAudioInfo.getWavInfor,
-                        "getMono": self.AudioBasicProcessing.getMono,
-                        "mp3ToWav": self.AudioBasicProcessing.mp3ToWav,
-                        "wavHeadRepair": self.AudioBasicProcessing.wavHeadRepair,
-                        "pcmToWav": self.AudioBasicProcessing.pcmToWav,
-                        "getFileSize": self.AudioBasicProcessing.getFileSize,
-                        "getAllWavDuration": self.GetAudioInfo.getWavFileDuration,
-                        "structuredAudio": self.AudioDataStructureGenerator.StartStructuredAudio,
-                        }
-
-        if process_type == "pcmToWav":
-            audio_path_list = self.PathProcessing.get_file_list(input_path, ".pcm$")
+        if process_type == "pipeline":
+            lock_regular = self.AudioPipeline.input_regular(input_wav_info["stages"])
+        elif process_type == "pcmToWav":
+            lock_regular = ".pcm$"
         elif process_type == "mp3ToWav":
-            audio_path_list = self.PathProcessing.get_file_list(input_path, ".mp3$")
+            lock_regular = ".mp3$"
         else:
-            audio_path_list = self.PathProcessing.get_file_list(input_path, ".wav$")
-
+            lock_regular = ".wav$"
+
+        corpus_stats = None
+        if process_type == "corpusStats":
+            from modules.corpusStats import CorpusStats
+            corpus_stats = CorpusStats(input_wav_info, self.logger)
+
+        manifest = None
+        if self.incremental:
+            signature = self.incremental_signature(process_type, input_wav_info)
+            if signature is None:
+                self.logger.log(f"[AudioProcessSet]: 警告! {process_type} 不支持增量处理，全部重新处理", "warning")
+            else:
+                from modules.buildManifest import BuildManifest
+                manifest_path = os.path.join(self.output_root_path, BuildManifest.MANIFEST_FILE_NAME)
+                if self.ShardPlan is None:
+                    manifest = BuildManifest(manifest_path, self.logger)
+                else:
+                    #分片写各自的处理记录, 以前不分片(或已合并)的总记录作为只读后备
+                    manifest = BuildManifest(self.ShardPlan.shard_path(manifest_path), self.logger, fallback_path=manifest_path)
+
+        audio_path_list = []
+        #增量处理时 音频路径 -> 输出路径列表, 处理成功后写入处理记录
+        output_path_dict = {}
+        def iter_audio_path():
+            for audio_path in self._iter_walk_ahead(input_path, lock_regular, progress):
+                audio_path_list.append(audio_path)
+                if manifest is not None:
+                    try:
+                        output_path_list = self.expected_outputs(audio_path, process_type, input_wav_info)
+                    except Exception:
+                        #无法确定输出(如文件已损坏)时照常处理, 由处理函数报告错误
+                        output_path_list = None
+                    if output_path_list and manifest.isUpToDate(audio_path, process_type, signature, output_path_list):
+                        progress.update()
+                        continue
+                    output_path_dict[audio_path] = output_path_list
+                yield audio_path
+
+        from tqdm import tqdm
+        if not hasattr(tqdm, "_lock"):
+            #进度条只在主进程中刷新, 线程锁即可, 避免 tqdm 默认创建进程锁而导入 multiprocessing
+            import threading
+            tqdm.set_lock(threading.RLock())
+        from modules.getAudioInfo import DurationSum
+        total_Duration = DurationSum()
+        error_list = []
+        #总数随后台遍历增加, 遍历完成后为准确值, 增量处理跳过的音频也计入进度
+        progress = tqdm(desc=f"\033[0;36;33m音频 {process_type} 处理\033[0m", ncols=150, unit="条")
+        results = self._iter_process_results(iter_audio_path(), process_type, input_wav_info)
+        try:
+            for audio_path, ok, res, err in results:
+                progress.update()
+                output_path_list = output_path_dict.pop(audio_path, None)
+                if not ok:
+                    error_list.append((audio_path, err))
+                    continue
+                self.logger.metrics.count(f"{process_type}.ok" if res is not False else f"{process_type}.failed")
+                if manifest is not None and res is True and output_path_list:
+                    manifest.putOutputs(audio_path, process_type, signature, output_path_list)
+                if process_type == "getInfo":
+                    self.logger.log(res, "info")
+                if process_type == "getAllWavDuration":
+                    total_Duration.add(*res)
+                if corpus_stats is not None:
+                    corpus_stats.add(audio_path, *res)
+        finally:
+            progress.close()
+            #中断(Ctrl-C)或异常时也提交已完成的处理记录, 下次增量处理从中断处继续
+            if manifest is not None:
+                manifest.close()
+
+        self.logger.metrics.count(f"{process_type}.files", len(audio_path_list))
+        self.logger.metrics.count(f"{process_type}.error", len(error_list))
         if not audio_path_list:
             self.logger.log(f"[AudioProcessSet]: 警告! 当前输入路径下，音频数量为: 0", "warning")
-
-        total_Duration = 0
-        for audio_path in tqdm(audio_path_list, desc=f"\033[0;36;33m音频 {process_type} 处理\033[0m", ncols=150, unit="条"):
-            ouput_path = self.output_root_path
-            if process_type in  ["audioNorm", "getMono", "mp3ToWav", "wavHeadRepair", "pcmToWav"]:
-                ouput_path = os.path.join(self.output_root_path, audio_path)
-                os.makedirs(os.path.dirname(ouput_path), exist_ok=True)
-            res = fun_obj_dict[process_type](audio_path, ouput_path, input_wav_info)
-            if process_type == "getInfo":
-                self.logger.log(res, "info")
-            if process_type == "getAllWavDuration":
-                total_Duration += res
+        if manifest is not None:
+            self.logger.log(f"[AudioProcessSet]: 提示! 增量处理跳过输出已是最新的音频 {manifest.skip_count} 条", "info")
+            self.logger.metrics.count(f"{process_type}.skipped", manifest.skip_count)
+        if process_type == "structuredAudio" and self.jobs == 1:
+            self.AudioDataStructureGenerator.log_cache_stats()
+        shard_result = {"input_path": input_path, "files": len(audio_path_list), "errors": len(error_list)}
+        if corpus_stats is not None:
+            shard_result["groupBy"] = input_wav_info
+            shard_result["corpusStats"] = corpus_stats.partial()
+            #分片时各分片只写中间结果, 由 --mergeShards 合并后统一输出报告
+            if self.ShardPlan is None:
+                corpus_stats.report(self.output_root_path, shard_result["corpusStats"])
+            self.logger.metrics.count("corpusStats.unparsed", corpus_stats.unparsed_num)
         if process_type == "getAllWavDuration":
-            self.logger.log(f"当前输入 {input_path} 目录下，wav 总数: {len(audio_path_list)} 总时长 {total_Duration} 秒", "info")
-
-
+            shard_result["duration"] = total_Duration.to_dict()
+            self.logger.log(f"当前输入 {input_path} 目录下，wav 总数: {len(audio_path_list)} 总时长 {total_Duration.seconds()} 秒", "info")
+        if self.ShardPlan is not None:
+            self.ShardPlan.write_result(self.output_root_path, process_type, shard_result)
+        if self.MetadataCache is not None:
+            if os.path.isdir(input_path) and lock_regular == ".wav$":
+                self.MetadataCache.evictMissing(input_path, audio_path_list)
+            self.logger.log("[AudioProcessSet]: 调试! 元数据缓存命中 %s 未命中 %s", "debug",
+                            self.MetadataCache.hit_count, self.MetadataCache.miss_count)
+            self.logger.metrics.count("metadataCache.hit", self.MetadataCache.hit_count)
+            self.logger.metrics.count("metadataCache.miss", self.MetadataCache.miss_count)
+            self.MetadataCache.close()
+        for audio_path, err in error_list:
+            self.logger.log(f"[AudioProcessSet]: 错误! {audio_path} {process_type} 处理异常: {err}", "error")
+        if error_list:
+            self.logger.log(f"[AudioProcessSet]: 错误! 共 {len(error_list)} 条音频 {process_type} 处理异常", "error")
+
+
+    def merge_shards(self, process_type):
+        """
+            功能:
+                    * 合并各分片(--shard K/N)的结果: 音频数、总时长、corpusStats 报告及增量处理记录
+                    * 时长与统计按整数字节数合并, 结果与不分片运行一致
+            参数:
+                    * process_type: 功能名称
+            返回值:
+                    * bool 是否合并成功
+        """
+        from modules.shardPlan import ShardPlan
+        result_list = ShardPlan.load_results(self.output_root_path, process_type, self.logger)
+        if not result_list:
+            return False
+        input_path = result_list[0]["input_path"]
+        file_num = sum(result["files"] for result in result_list)
+        error_num = sum(result["errors"] for result in result_list)
+        self.logger.log(f"[AudioProcessSet]: 提示! 已合并 {len(result_list)}/{result_list[0]['shard'][1]} 个分片，"
+                        f"共 {file_num} 条音频，处理异常 {error_num} 条", "info")
 
-def func_BasicMode(args):
+        if process_type == "getAllWavDuration":
+            from modules.getAudioInfo import DurationSum
+            total_Duration = DurationSum()
+            for result in result_list:
+                total_Duration.merge(result["duration"])
+            self.logger.log(f"当前输入 {input_path} 目录下，wav 总数: {file_num} 总时长 {total_Duration.seconds()} 秒", "info")
+
+        if process_type == "corpusStats":
+            from modules.corpusStats import CorpusStats
+            group_by_set = {result["groupBy"] for result in result_list}
+            if len(group_by_set) != 1:
+                self.logger.log(f"[AudioProcessSet]: 错误! 各分片的 --groupBy 不一致 {sorted(group_by_set)}，无法合并", "error")
+                return False
+            CorpusStats(group_by_set.pop(), self.logger).report(
+                self.output_root_path, CorpusStats.merge_partials([result["corpusStats"] for result in result_list]))
+
+        from modules.buildManifest import BuildManifest
+        manifest_path = os.path.join(self.output_root_path, BuildManifest.MANIFEST_FILE_NAME)
+        shard_manifest_list = ShardPlan.shard_files(manifest_path)
+        if shard_manifest_list:
+            with BuildManifest(manifest_path, self.logger) as manifest:
+                manifest.merge(shard_manifest_list)
+        return True
+
+
+
+def get_function_para(function, args):
     """
     功能:
-            * 音频归一化操作入口
+            * 获取单个功能的参数, 命令行未给出时交互输入
     参数:
+            * function: 功能名称
             * args: 命令行参数
     返回值:
-            * None
+            * 功能参数
     """
-    print(f"\033[0;36;33m[BasicMode]: 提示! 开始音频 {args.function} 处理\033[0m")
-    if not args.inputPath:
-        print(f"\033[0;36;31m[BasicMode]: 错误! 没有设置音频输入路径 -i/--inputPath\033[0m")
-        return False
-
     input_wav_info = None
-    if args.function in ["pcmToWav", "wavHeadRepair"]:
+    if function in ["pcmToWav", "wavHeadRepair"]:
+        #命令行已给出的参数不再交互输入, 方便无人值守批量转换
         input_wav_info = {}
-        input_wav_info["Framerate"] = input("请输入音频采样率:")
-        input_wav_info["channels"] = input("请输入音频通道数:")
-        input_wav_info["SampleEncoding"] = input("请输入编码位数:")
+        input_wav_info["Framerate"] = args.framerate if args.framerate else input("请输入音频采样率:")
+        input_wav_info["channels"] = args.channels if args.channels else input("请输入音频通道数:")
+        input_wav_info["SampleEncoding"] = args.sampleEncoding if args.sampleEncoding else input("请输入编码位数:")
 
-    if args.function in ["getMono"]:
+    if function in ["getMono"]:
         while True:
-            input_wav_info = input("请输入需要提取音频的通道(从0开始):")
+            input_wav_info = input("请输入需要提取音频的通道(从0开始, 多个通道用逗号分隔, all 为全部通道, "
+                                   "mean 为平均混合, mix=权重:权重:... 为加权混合):")
             try:
-                input_wav_info = int(input_wav_info)
+                from modules.audioBasicProcessing import AudioBasicProcessing
+                AudioBasicProcessing.parse_mono_spec(input_wav_info)
                 break
-            except:
-                print(f"\033[0;36;31m[BasicMode]: 错误! 当前提取通道值 {input_wav_info} 类型错误，当前只能是数字\033[0m")
+            except ValueError as e:
+                print(f"\033[0;36;31m[BasicMode]: 错误! 当前提取通道值 {input_wav_info} 错误，{e}\033[0m")
 
-    if args.function in ["audioNorm"]:
+    if function in ["audioNorm"]:
         while True:
             input_wav_info = input("请输入音频归一化幅度值(0~1)支持浮点:")
             try:
@@ -132,7 +604,10 @@ def func_BasicMode(args):
             except:
                 print(f"\033[0;36;31m[BasicMode]: 错误! 当前输入的归一化值 {input_wav_info} 类型错误，当前只能是数字\033[0m")
 
-    if args.function == "structuredAudio":
+    if function == "corpusStats":
+        input_wav_info = args.groupBy
+
+    if function == "structuredAudio":
         while True:
             input_wav_info = input("请选择音频结构化操作[预览/执行][1/2]:")
             try:
@@ -142,10 +617,83 @@ def func_BasicMode(args):
                 print(f"\033[0;36;31m[BasicMode]: 错误! 请准确选择音频结构化操作 1 -> 预览 2 -> 执行\033[0m")
             except:
                 print(f"\033[0;36;31m[BasicMode]: 错误! 请准确选择音频结构化操作 {input_wav_info} 类型错误，当前只能是数字\033[0m")
-            
+    return input_wav_info
 
-    aps = AudioProcessSet(args.output, args.debug)
-    aps.audio_basic_process(args.inputPath, process_type=args.function, input_wav_info=input_wav_info)
+
+def func_BasicMode(args):
+    """
+    功能:
+            * 音频归一化操作入口
+            * -f 以逗号串联多个功能时(如 wavHeadRepair,getMono,audioNorm,structuredAudio)按流水线处理,
+              每个文件只读一次、只写一次
+    参数:
+            * args: 命令行参数
+    返回值:
+            * None
+    """
+    print(f"\033[0;36;33m[BasicMode]: 提示! 开始音频 {args.function} 处理\033[0m")
+    if args.mergeShards:
+        if not args.function:
+            print(f"\033[0;36;31m[BasicMode]: 错误! 合并分片结果需设置与分片运行相同的功能 -f/--function\033[0m")
+            return False
+        process_type = "pipeline" if "," in args.function else args.function
+        aps = AudioProcessSet(args.output, args.debug)
+        return aps.merge_shards(process_type)
+
+    if args.shard:
+        from modules.shardPlan import ShardPlan
+        try:
+            ShardPlan(args.shard)
+        except ValueError as e:
+            print(f"\033[0;36;31m[BasicMode]: 错误! 分片参数 --shard 无效: {e}\033[0m")
+            return False
+
+    if not args.inputPath:
+        print(f"\033[0;36;31m[BasicMode]: 错误! 没有设置音频输入路径 -i/--inputPath\033[0m")
+        return False
+
+    if not args.function:
+        print(f"\033[0;36;31m[BasicMode]: 错误! 没有设置功能 -f/--function\033[0m")
+        return False
+
+    if args.channel.lower() != "mean" and not args.channel.isdigit():
+        print(f"\033[0;36;31m[BasicMode]: 错误! 通道参数 --channel {args.channel} 错误，只能是从0开始的数字或 mean\033[0m")
+        return False
+
+    stage_list = args.function.split(",")
+    if len(stage_list) > 1:
+        from modules.audioPipeline import AudioPipeline
+        error_info = AudioPipeline.validate(stage_list)
+        if error_info:
+            print(f"\033[0;36;31m[BasicMode]: 错误! 流水线 {args.function} 无效: {error_info}\033[0m")
+            return False
+        #流水线内 structuredAudio 只决定输出路径, 不需要选择预览/执行
+        para_dict = {stage: get_function_para(stage, args) for stage in stage_list if stage != "structuredAudio"}
+        error_info = AudioPipeline.validate_paras(para_dict)
+        if error_info:
+            print(f"\033[0;36;31m[BasicMode]: 错误! 流水线 {args.function} 参数无效: {error_info}\033[0m")
+            return False
+        process_type = "pipeline"
+        input_wav_info = {"stages": stage_list, "paras": para_dict}
+    else:
+        process_type = args.function
+        input_wav_info = get_function_para(args.function, args)
+
+    if process_type == "corpusStats":
+        from modules.corpusStats import CorpusStats
+        try:
+            CorpusStats.parse_group_by(input_wav_info)
+        except ValueError as e:
+            print(f"\033[0;36;31m[BasicMode]: 错误! 统计分组 --groupBy {input_wav_info} 无效: {e}\033[0m")
+            return False
+
+    aps = AudioProcessSet(args.output, args.debug, args.jobs, args.blockSize, args.cache, args.walkThreads, args.inPlace,
+                          args.keywordsConfig, args.channel, args.subtype, args.staged, args.queueDepth, args.memoryBudget,
+                          args.incremental, args.shard)
+    with aps.logger.metrics.timer("run"):
+        aps.audio_basic_process(args.inputPath, process_type=process_type, input_wav_info=input_wav_info)
+    if args.metrics:
+        aps.logger.metrics.emit(args.metrics, subcommand="BasicMode", function=args.function, jobs=args.jobs, shard=args.shard)
 
 
 def func_GetTestSetMode(args):
@@ -159,7 +707,17 @@ def func_GetTestSetMode(args):
             * None
     """
     print(f"\033[0;36;33m[GetTestSetMode]: 提示! 开始获取参与转录测试集音频，并归一化处理\033[0m")
-
+    from modules.getTestSetAndNorm import GetTestSetAndNorm
+    if args.mergeShards:
+        return GetTestSetAndNorm(args.output, args.debug).merge_shards()
+
+    if args.shard:
+        from modules.shardPlan import ShardPlan
+        try:
+            ShardPlan(args.shard)
+        except ValueError as e:
+            print(f"\033[0;36;31m[GetTestSetMode]: 错误! 分片参数 --shard 无效: {e}\033[0m")
+            return False
 
     if not args.inputPath:
         print(f"\033[0;36;31m[GetTestSetMode]: 错误! 没有设置音频输入路径 -i/--inputPath\033[0m")
@@ -169,8 +727,17 @@ def func_GetTestSetMode(args):
         print(f"\033[0;36;31m[GetTestSetMode]: 错误! 没有设置指令词列表文件路径 -c/--cmdFilePath\033[0m")
         return False
 
-    gtsan = GetTestSetAndNorm(args.output, args.debug)
-    gtsan.getTestSetAndNorm(args.inputPath, args.cmdFilePath, args.number)
+    if args.channel.lower() != "mean" and not args.channel.isdigit():
+        print(f"\033[0;36;31m[GetTestSetMode]: 错误! 通道参数 --channel {args.channel} 错误，只能是从0开始的数字或 mean\033[0m")
+        return False
+
+    gtsan = GetTestSetAndNorm(args.output, args.debug, norm_channel=args.channel, only_set_list=args.only,
+                              non_set_list=args.exclude, seed=args.seed, rebuild_index=args.rebuildIndex, jobs=args.jobs,
+                              incremental=args.incremental, shard=args.shard)
+    with gtsan.logger.metrics.timer("run"):
+        gtsan.getTestSetAndNorm(args.inputPath, args.cmdFilePath, args.number)
+    if args.metrics:
+        gtsan.logger.metrics.emit(args.metrics, subcommand="GetTestSetMode", number=args.number, jobs=args.jobs, shard=args.shard)
 
 
 
@@ -187,8 +754,9 @@ def main():
 
     # 添加参数并进行验证
     def validate_function(value):
-        if value not in list(Basic_functions_info.keys()):
-            raise argparse.ArgumentTypeError(f"\033[0;36;31m无效的功能选择: {value} 可用功能: {', '.join(Basic_functions.keys())}\033[0m")
+        for function in value.split(","):
+            if function not in list(Basic_functions_info.keys()):
+                raise argparse.ArgumentTypeError(f"\033[0;36;31m无效的功能选择: {function} 可用功能: {', '.join(Basic_functions_info.keys())}\033[0m")
         return value
 
     def print_function_help():
@@ -206,9 +774,52 @@ def main():
     cmd_BasicMode.add_argument('-o', '--output', type=str, default="OUTPUT",
                                help='处理后音频输出路径，默认路径 OUTPUT')
     cmd_BasicMode.add_argument('-f', '--function', type=validate_function,
-                               help='功能选择: \n' + print_function_help())
+                               help='功能选择: \n' + print_function_help()
+                                    + '  以逗号串联多个功能按流水线处理(每个文件只读写一次)，例如:\n'
+                                    + '  wavHeadRepair,getMono,audioNorm,structuredAudio\n')
     cmd_BasicMode.add_argument('-d', '--debug', action="store_true", default=False,
                                help="使能调试模式，默认不打开、主要调整打印等级为 debug, 输出详细打印，用于调试")
+    cmd_BasicMode.add_argument('-j', '--jobs', type=int, default=1,
+                               help="并行处理的进程数，默认 1 单进程，0 表示使用全部 CPU 核")
+    cmd_BasicMode.add_argument('-b', '--blockSize', type=int, default=0,
+                               help="audioNorm 流式处理每块的帧数，默认 0 整文件读入，超长录音建议 65536")
+    cmd_BasicMode.add_argument('--cache', action="store_true", default=False,
+                               help="使用输出目录下的元数据缓存(按 路径+大小+修改时间 校验)，未变化的文件不再重复解析")
+    cmd_BasicMode.add_argument('--walkThreads', type=int, default=0,
+                               help="并行遍历输入目录的线程数，默认 0 单线程顺序遍历，网络存储上的超大目录树可调大")
+    cmd_BasicMode.add_argument('--framerate', type=int, default=None,
+                               help="pcmToWav/wavHeadRepair 的音频采样率，不设置则交互输入")
+    cmd_BasicMode.add_argument('--channels', type=int, default=None,
+                               help="pcmToWav/wavHeadRepair 的音频通道数，不设置则交互输入")
+    cmd_BasicMode.add_argument('--sampleEncoding', type=int, default=None,
+                               help="pcmToWav/wavHeadRepair 的编码位数(8/16/24/32)，不设置则交互输入")
+    cmd_BasicMode.add_argument('--inPlace', action="store_true", default=False,
+                               help="wavHeadRepair 直接修复输入文件的头部，不拷贝音频数据")
+    cmd_BasicMode.add_argument('--keywordsConfig', type=str, default=None,
+                               help="structuredAudio 的扩展关键字配置文件(json)，包含 info_keywords/area_keywords")
+    cmd_BasicMode.add_argument('--channel', type=str, default="0",
+                               help="audioNorm 时多通道音频选取的通道(从0开始)，mean 表示各通道平均混合，默认 0")
+    cmd_BasicMode.add_argument('--subtype', type=str.upper, default=None,
+                               choices=["PCM_U8", "PCM_16", "PCM_24", "PCM_32", "FLOAT", "DOUBLE"],
+                               help="getMono/audioNorm/流水线输出的编码，不设置则与输入音频一致")
+    cmd_BasicMode.add_argument('--staged', action="store_true", default=False,
+                               help="audioNorm/getMono/流水线按 读取/计算/写出 三段重叠执行(整文件处理，计算线程数为 -j)，适合网络存储")
+    cmd_BasicMode.add_argument('--queueDepth', type=int, default=4,
+                               help="--staged 时各段之间队列的长度，默认 4")
+    cmd_BasicMode.add_argument('--memoryBudget', type=int, default=1024,
+                               help="--staged 时同时在内存中的音频数据上限(MB)，默认 1024")
+    cmd_BasicMode.add_argument('--incremental', action="store_true", default=False,
+                               help="增量处理: 输出已存在、不早于输入且参数未变时跳过，记录保存在输出目录下")
+    cmd_BasicMode.add_argument('--groupBy', type=str, default="command,speaker,gender,age,distance,source",
+                               help="corpusStats 的分组，逗号分隔多个分组，组内多个字段用 + 连接，默认 command,speaker,gender,age,distance,source\n"
+                                    "  可选字段: region/accent/speed/distance/gender/age/speaker/command/source，例如 command+gender")
+    cmd_BasicMode.add_argument('--metrics', type=str, default=None,
+                               help="运行结束时把各操作的计数和耗时以 json 行追加写入该文件")
+    cmd_BasicMode.add_argument('--shard', type=str, default=None,
+                               help="多机分片运行: K/N 只处理按相对输入目录的路径哈希属于第 K 个(从1开始)分片的音频，\n"
+                                    "  各分片的结果写在输出目录下，全部完成后用 --mergeShards 合并")
+    cmd_BasicMode.add_argument('--mergeShards', action="store_true", default=False,
+                               help="合并输出目录下各分片的结果(音频数、总时长、corpusStats 报告、增量处理记录)，-f 需与分片运行一致")
     cmd_BasicMode.set_defaults(func=func_BasicMode)
 
 
@@ -236,6 +847,26 @@ def main():
                                help='每条指令可以获取最大的测试集音频数量，默认100')
     cmd_GetTestSetMode.add_argument('-d', '--debug', action="store_true", default=False,
                                help="使能调试模式，默认不打开、主要调整打印等级为 debug, 输出详细打印，用于调试")
+    cmd_GetTestSetMode.add_argument('--channel', type=str, default="0",
+                               help="归一化时多通道音频选取的通道(从0开始)，mean 表示各通道平均混合，默认 0")
+    cmd_GetTestSetMode.add_argument('-j', '--jobs', type=int, default=1,
+                               help="并行归一化的进程数，默认 1 单进程，0 表示使用全部 CPU 核")
+    cmd_GetTestSetMode.add_argument('--only', type=str, action="append", default=[],
+                               help="仅选定路径匹配该正则的音频，可多次设置(需全部匹配)，例如 --only _Man_")
+    cmd_GetTestSetMode.add_argument('--exclude', type=str, action="append", default=[],
+                               help="排除路径匹配该正则的音频，可多次设置(匹配任一即排除)")
+    cmd_GetTestSetMode.add_argument('--seed', type=int, default=0,
+                               help="选取测试集的随机种子，相同语料和种子的选取结果一致，默认 0")
+    cmd_GetTestSetMode.add_argument('--rebuildIndex', action="store_true", default=False,
+                               help="忽略输出目录下已有的语料索引，重新遍历输入目录(语料目录有变化时会自动重新遍历)")
+    cmd_GetTestSetMode.add_argument('--incremental', action="store_true", default=False,
+                               help="增量刷新: 保留以前选中且源文件未变的音频，只按同样的轮询规则补足到 -n 条并归一化新选中的音频")
+    cmd_GetTestSetMode.add_argument('--metrics', type=str, default=None,
+                               help="运行结束时把各操作的计数和耗时以 json 行追加写入该文件")
+    cmd_GetTestSetMode.add_argument('--shard', type=str, default=None,
+                               help="多机分片运行: K/N 只处理按指令名哈希属于第 K 个(从1开始)分片的指令，全部完成后用 --mergeShards 合并")
+    cmd_GetTestSetMode.add_argument('--mergeShards', action="store_true", default=False,
+                               help="合并输出目录下各分片的结果，按指令列表顺序报告缺失的测试集")
     cmd_GetTestSetMode.set_defaults(func=func_GetTestSetMode)
 
 
@@ -253,4 +884,8 @@ def main():
         args.func(args)
 
 if __name__ == "__main__":
+    #只有 PyInstaller 打包的程序需要 freeze_support, 源码运行时不导入 multiprocessing
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
     main()
@@ -0,0 +1,163 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+"""
+    基准测试用的合成语料生成器, 不依赖外部数据, 相同参数生成的语料完全一致
+        * short:   大量 16k int16 单声道短音频, 带不同编码的 .lab 标注, 目录含 来源/人编号, 供结构化等功能使用
+        * long:    少量长时多通道音频
+        * broken:  wav 头被清零的音频(16k 单声道 16bit), 供 wavHeadRepair 使用
+        * pcm:     无头的原始 PCM(16k 单声道 16bit), 供 pcmToWav 使用
+        * mp3:     mp3 音频, 仅在有 ffmpeg 时生成
+        * testset: 按 指令/人编号/结构化文件名 组织的测试集语料及指令列表, 供 GetTestSetAndNorm 使用
+    用法:
+        python benchmarks/corpusGenerator.py -o bench_corpus [--scale 1.0] [--seed 0]
+"""
+
+import argparse, json, os, shutil, sys
+
+__version__="1.0.0"
+
+#语料描述文件, 记录各子集的文件数、音频总时长与字节数
+CORPUS_INFO_NAME = "corpus.json"
+SAMPLE_RATE = 16000
+#标注文件轮流使用的编码
+LAB_ENCODING_LIST = ["utf-8", "gbk", "utf-8-sig", "utf-16"]
+#标注内容, 含中文与英文指令
+COMMAND_LIST = ["打开空调", "关闭灯光", "播放音乐", "暂停播放", "Alexa", "hello world"]
+#测试集指令目录名
+TESTSET_COMMAND_LIST = ["DaKaiKongTiao", "GuanBiDengGuang", "BoFangYinYue", "ZanTingBoFang"]
+
+
+def _signal(rng, frames, channels):
+    """
+        功能:
+                * 生成带噪声的正弦信号, 各通道频率不同, 峰值随机
+    """
+    import numpy as np
+    t = np.arange(frames, dtype=np.float32) / SAMPLE_RATE
+    freq = rng.uniform(100, 1000, size=channels).astype(np.float32)
+    sig = np.sin(2 * np.pi * t[:, np.newaxis] * freq) * rng.uniform(0.1, 0.8, size=channels).astype(np.float32)
+    sig += rng.standard_normal((frames, channels)).astype(np.float32) * 0.01
+    return np.clip(sig, -1, 1)
+
+
+def _add_info(info_dict, subset, path, frames, channels, sampwidth=2):
+    subset_info = info_dict.setdefault(subset, {"files": 0, "audio_seconds": 0.0, "bytes": 0})
+    subset_info["files"] += 1
+    subset_info["audio_seconds"] += frames / SAMPLE_RATE
+    subset_info["bytes"] += os.path.getsize(path)
+
+
+def generate(output_dir, scale=1.0, seed=0):
+    """
+        功能:
+                * 生成全部子集并写出语料描述文件
+        参数:
+                * output_dir: 语料输出目录, 已存在时先删除
+                * scale: 规模系数, 1.0 约为 2000 条短音频
+                * seed: 随机种子
+        返回值:
+                * dict 语料描述
+    """
+    #numpy/soundfile 在生成时才导入, 只读取语料描述的基准主进程不加载它们
+    import numpy as np
+    import soundfile as sf
+    rng = np.random.default_rng(seed)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+    info_dict = {}
+
+    #short: 短音频 + 标注
+    short_num = max(1, int(2000 * scale))
+    for index in range(short_num):
+        spk_dir = os.path.join(output_dir, "short", "来源Bench", f"spk{index % 20:02d}")
+        os.makedirs(spk_dir, exist_ok=True)
+        wav_path = os.path.join(spk_dir, f"{index}_男_fast.wav")
+        frames = int(rng.uniform(1.0, 3.0) * SAMPLE_RATE)
+        sf.write(wav_path, _signal(rng, frames, 1), SAMPLE_RATE, subtype="PCM_16")
+        encoding = LAB_ENCODING_LIST[index % len(LAB_ENCODING_LIST)]
+        with open(os.path.splitext(wav_path)[0] + ".lab", "w", encoding=encoding) as f:
+            f.write(COMMAND_LIST[index % len(COMMAND_LIST)])
+        _add_info(info_dict, "short", wav_path, frames, 1)
+
+    #long: 长时多通道
+    long_num = max(1, int(4 * scale))
+    os.makedirs(os.path.join(output_dir, "long"), exist_ok=True)
+    for index in range(long_num):
+        wav_path = os.path.join(output_dir, "long", f"array_{index}.wav")
+        frames = 120 * SAMPLE_RATE
+        sf.write(wav_path, _signal(rng, frames, 8), SAMPLE_RATE, subtype="PCM_16")
+        _add_info(info_dict, "long", wav_path, frames, 8)
+
+    #broken/pcm: 损坏的头与原始 PCM
+    raw_num = max(1, int(200 * scale))
+    os.makedirs(os.path.join(output_dir, "broken"), exist_ok=True)
+    os.makedirs(os.path.join(output_dir, "pcm"), exist_ok=True)
+    for index in range(raw_num):
+        frames = int(rng.uniform(1.0, 5.0) * SAMPLE_RATE)
+        data = (_signal(rng, frames, 1)[:, 0] * 32767).astype("<i2").tobytes()
+        wav_path = os.path.join(output_dir, "broken", f"{index}.wav")
+        with open(wav_path, "wb") as f:
+            f.write(b"\x00" * 44 + data)
+        _add_info(info_dict, "broken", wav_path, frames, 1)
+        pcm_path = os.path.join(output_dir, "pcm", f"{index}.pcm")
+        with open(pcm_path, "wb") as f:
+            f.write(data)
+        _add_info(info_dict, "pcm", pcm_path, frames, 1)
+
+    #mp3: 需要 ffmpeg 编码
+    if shutil.which("ffmpeg"):
+        from pydub import AudioSegment
+        os.makedirs(os.path.join(output_dir, "mp3"), exist_ok=True)
+        for index in range(max(1, int(50 * scale))):
+            frames = int(rng.uniform(1.0, 5.0) * SAMPLE_RATE)
+            data = (_signal(rng, frames, 1)[:, 0] * 32767).astype("<i2").tobytes()
+            mp3_path = os.path.join(output_dir, "mp3", f"{index}.mp3")
+            AudioSegment(data, sample_width=2, frame_rate=SAMPLE_RATE, channels=1).export(mp3_path, format="mp3")
+            _add_info(info_dict, "mp3", mp3_path, frames, 1)
+
+    #testset: 指令/人编号/结构化文件名, 文件名倒数第三段为人编号
+    testset_num = max(1, int(50 * scale))
+    for command in TESTSET_COMMAND_LIST:
+        for index in range(testset_num):
+            spk = f"Spk{index % 10:02d}"
+            spk_dir = os.path.join(output_dir, "testset", command, spk)
+            os.makedirs(spk_dir, exist_ok=True)
+            frames = int(rng.uniform(1.0, 2.0) * SAMPLE_RATE)
+            wav_path = os.path.join(spk_dir, f"zhongguo_putonghua_normal_1m_Man_Youth_{spk}_{command}_01+MD5+{index:032x}.wav")
+            sf.write(wav_path, _signal(rng, frames, 1), SAMPLE_RATE, subtype="PCM_16")
+            _add_info(info_dict, "testset", wav_path, frames, 1)
+    with open(os.path.join(output_dir, "testset_commands.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(TESTSET_COMMAND_LIST) + "\n")
+
+    corpus_info = {"scale": scale, "seed": seed, "subsets": info_dict}
+    with open(os.path.join(output_dir, CORPUS_INFO_NAME), "w", encoding="utf-8") as f:
+        json.dump(corpus_info, f, ensure_ascii=False, indent=2)
+    return corpus_info
+
+
+def load_corpus_info(corpus_dir):
+    """
+        功能:
+                * 读取语料描述文件, 不存在返回 None
+    """
+    info_path = os.path.join(corpus_dir, CORPUS_INFO_NAME)
+    if not os.path.isfile(info_path):
+        return None
+    with open(info_path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成语料")
+    parser.add_argument("-o", "--output", type=str, default="bench_corpus", help="语料输出目录，默认 bench_corpus")
+    parser.add_argument("--scale", type=float, default=1.0, help="规模系数，1.0 约为 2000 条短音频，默认 1.0")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子，默认 0")
+    args = parser.parse_args()
+    corpus_info = generate(args.output, args.scale, args.seed)
+    for subset, subset_info in corpus_info["subsets"].items():
+        print(f"{subset:<10} {subset_info['files']:>6} 条 {subset_info['audio_seconds']:>10.1f} 秒 {subset_info['bytes'] / 1e6:>10.1f} MB")
+
+
+if __name__=="__main__":
+    main()
@@ -0,0 +1,212 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+"""
+    audioForgeXS 功能基准
+        * 在合成语料(见 corpusGenerator.py)上逐个测试 AudioProcessSet 各功能与 GetTestSetAndNorm
+        * 每个用例在独立子进程中运行, 统计 条/秒、音频秒/秒、MB/秒 与峰值内存
+        * 结果写为 json, 指定 --baseline 时与以前的结果比较, 吞吐下降或内存增长超过 --threshold 时返回非 0
+    用法:
+        python benchmarks/functionBenchmark.py --corpus bench_corpus [--scale 0.2] [-j 1] [--repeat 3]
+                                               [--json result.json] [--baseline old.json] [--threshold 0.15]
+"""
+
+import argparse, json, os, platform, shutil, subprocess, sys, tempfile, time
+
+__version__="1.0.0"
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+#pcmToWav/wavHeadRepair 的音频参数, 与 corpusGenerator 生成的数据一致
+RAW_WAV_PARA = {"Framerate": 16000, "channels": 1, "SampleEncoding": 16}
+
+#用例名称 -> 语料子集、功能及参数
+#   kwargs: AudioProcessSet 的额外构造参数; copy_input: 功能会移动输入文件, 先拷贝一份再计时
+CASE_DICT = {
+    "getInfo": {"subset": "short", "process_type": "getInfo"},
+    "getAllWavDuration": {"subset": "short", "process_type": "getAllWavDuration"},
+    "getFileSize": {"subset": "short", "process_type": "getFileSize"},
+    "audioNorm": {"subset": "short", "process_type": "audioNorm", "para": 1.0},
+    "audioNormStaged": {"subset": "short", "process_type": "audioNorm", "para": 1.0, "kwargs": {"staged": True}},
+    "audioNormLongBlocks": {"subset": "long", "process_type": "audioNorm", "para": 1.0, "kwargs": {"block_size": 65536}},
+    "getMonoSplit": {"subset": "long", "process_type": "getMono", "para": "all"},
+    "wavHeadRepair": {"subset": "broken", "process_type": "wavHeadRepair", "para": RAW_WAV_PARA},
+    "pcmToWav": {"subset": "pcm", "process_type": "pcmToWav", "para": RAW_WAV_PARA},
+    "mp3ToWav": {"subset": "mp3", "process_type": "mp3ToWav"},
+    "structuredAudio": {"subset": "short", "process_type": "structuredAudio", "para": 2, "copy_input": True},
+    "pipeline": {"subset": "short", "process_type": "pipeline",
+                 "para": {"stages": ["getMono", "audioNorm"], "paras": {"getMono": "0", "audioNorm": 1.0}}},
+    "getTestSetAndNorm": {"subset": "testset", "runner": "testset", "para": 20},
+}
+
+
+def peak_rss_mb():
+    """
+        功能:
+                * 当前进程及已结束子进程(工作进程)中最大的峰值内存(MB), 不支持的平台返回 None
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    #linux 单位为 KB, macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def run_case(case_name, corpus_dir, jobs):
+    """
+        功能:
+                * 在子进程中运行单个用例并计时
+                * 输入使用相对路径(输出位置为 输出目录/输入路径), 避免覆盖语料
+        返回值:
+                * dict 耗时与峰值内存
+    """
+    sys.path.insert(0, ROOT_DIR)
+    case = CASE_DICT[case_name]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        output_dir = os.path.join(temp_dir, "output")
+        work_dir = corpus_dir
+        if case.get("copy_input"):
+            work_dir = os.path.join(temp_dir, "input")
+            shutil.copytree(os.path.join(corpus_dir, case["subset"]), os.path.join(work_dir, case["subset"]))
+        os.chdir(work_dir)
+
+        if case.get("runner") == "testset":
+            from modules.getTestSetAndNorm import GetTestSetAndNorm
+            gtsan = GetTestSetAndNorm(output_dir, False)
+            start = time.perf_counter()
+            gtsan.getTestSetAndNorm(case["subset"], "testset_commands.txt", case["para"])
+        else:
+            from audioForgeXS import AudioProcessSet
+            aps = AudioProcessSet(output_dir, False, jobs, **case.get("kwargs", {}))
+            start = time.perf_counter()
+            aps.audio_basic_process(case["subset"], process_type=case["process_type"], input_wav_info=case.get("para"))
+        wall = time.perf_counter() - start
+    return {"wall_s": wall, "peak_rss_mb": peak_rss_mb()}
+
+
+def measure(case_name, corpus_dir, subset_info, jobs, repeat):
+    """
+        功能:
+                * 多次运行用例, 取最快的一次计算吞吐
+    """
+    wall_list = []
+    rss_list = []
+    for _ in range(repeat):
+        result = subprocess.run([sys.executable, os.path.abspath(__file__), "--runCase", case_name,
+                                 "--corpus", corpus_dir, "-j", str(jobs)],
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+        if result.returncode:
+            return {"error": f"用例运行失败, 返回值 {result.returncode}"}
+        case_result = json.loads(result.stdout.strip().splitlines()[-1])
+        wall_list.append(case_result["wall_s"])
+        rss_list.append(case_result["peak_rss_mb"])
+    wall = min(wall_list)
+    return {"wall_s": round(wall, 4),
+            "files_per_s": round(subset_info["files"] / wall, 2),
+            "audio_s_per_s": round(subset_info["audio_seconds"] / wall, 2),
+            "mb_per_s": round(subset_info["bytes"] / 1e6 / wall, 2),
+            "peak_rss_mb": max(rss_list) if None not in rss_list else None}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "-C", ROOT_DIR, "rev-parse", "--short", "HEAD"], stdout=subprocess.PIPE,
+                              stderr=subprocess.DEVNULL, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(result_dict, baseline_dict, threshold):
+    """
+        功能:
+                * 与基线比较, 吞吐下降或峰值内存增长超过阈值的记为退化
+                * 基线有结果而本次运行出错的用例也记为退化
+        返回值:
+                * list 退化说明
+    """
+    regression_list = []
+    for case_name, case_result in result_dict.items():
+        base = baseline_dict.get(case_name)
+        if not base or "error" in base:
+            continue
+        if "error" in case_result:
+            regression_list.append(f"{case_name}: 基线 {base['files_per_s']} 条/秒，本次运行出错 {case_result['error']}")
+            continue
+        if case_result["files_per_s"] < base["files_per_s"] * (1 - threshold):
+            regression_list.append(f"{case_name}: 吞吐 {base['files_per_s']} -> {case_result['files_per_s']} 条/秒")
+        if base.get("peak_rss_mb") and case_result.get("peak_rss_mb") \
+                and case_result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + threshold):
+            regression_list.append(f"{case_name}: 峰值内存 {base['peak_rss_mb']} -> {case_result['peak_rss_mb']} MB")
+    return regression_list
+
+
+def main():
+    parser = argparse.ArgumentParser(description="audioForgeXS 功能基准")
+    parser.add_argument("--corpus", type=str, default="bench_corpus", help="语料目录，不存在时自动生成，默认 bench_corpus")
+    parser.add_argument("--scale", type=float, default=0.2, help="自动生成语料的规模系数，默认 0.2")
+    parser.add_argument("--cases", type=str, default=None, help=f"只运行指定用例，逗号分隔，可选: {', '.join(CASE_DICT)}")
+    parser.add_argument("-j", "--jobs", type=int, default=1, help="AudioProcessSet 的进程数，默认 1")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例运行次数，取最快一次，默认 3")
+    parser.add_argument("--json", type=str, default=None, help="结果另存为 json 文件")
+    parser.add_argument("--baseline", type=str, default=None, help="用于比较的基线结果 json 文件")
+    parser.add_argument("--threshold", type=float, default=0.15, help="判定退化的相对阈值，默认 0.15")
+    parser.add_argument("--runCase", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    corpus_dir = os.path.abspath(args.corpus)
+    if args.runCase:
+        print(json.dumps(run_case(args.runCase, corpus_dir, args.jobs)))
+        return 0
+
+    sys.path.insert(0, BENCH_DIR)
+    from corpusGenerator import load_corpus_info
+    corpus_info = load_corpus_info(corpus_dir)
+    if corpus_info is None:
+        #在子进程中生成, 主进程保持很小的内存占用(linux 上子进程的峰值内存统计含 fork 时父进程的峰值)
+        print(f"生成语料 {corpus_dir} 规模 {args.scale} ...")
+        subprocess.run([sys.executable, os.path.join(BENCH_DIR, "corpusGenerator.py"), "-o", corpus_dir,
+                        "--scale", str(args.scale)], check=True)
+        corpus_info = load_corpus_info(corpus_dir)
+
+    case_list = args.cases.split(",") if args.cases else list(CASE_DICT)
+    result_dict = {}
+    for case_name in case_list:
+        if case_name not in CASE_DICT:
+            print(f"未知用例 {case_name}，可选: {', '.join(CASE_DICT)}")
+            return 2
+        subset_info = corpus_info["subsets"].get(CASE_DICT[case_name]["subset"])
+        if not subset_info:
+            print(f"{case_name:<22} 跳过: 语料中没有 {CASE_DICT[case_name]['subset']} 子集")
+            continue
+        result_dict[case_name] = measure(case_name, corpus_dir, subset_info, args.jobs, args.repeat)
+        case_result = result_dict[case_name]
+        if "error" in case_result:
+            print(f"{case_name:<22} {case_result['error']}")
+            continue
+        print(f"{case_name:<22} {case_result['files_per_s']:>10.1f} 条/秒 {case_result['audio_s_per_s']:>10.1f} 音频秒/秒 "
+              f"{case_result['mb_per_s']:>8.1f} MB/秒  峰值内存 {case_result['peak_rss_mb']} MB")
+
+    report = {"meta": {"commit": git_commit(), "python": platform.python_version(), "platform": platform.platform(),
+                       "time": time.strftime("%Y-%m-%d %H:%M:%S"), "jobs": args.jobs, "repeat": args.repeat,
+                       "corpus": {"scale": corpus_info["scale"], "seed": corpus_info["seed"]}},
+              "results": result_dict}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regression_list = compare(result_dict, baseline.get("results", {}), args.threshold)
+        for regression in regression_list:
+            print(f"退化! {regression}")
+        if regression_list:
+            return 1
+        print(f"与基线 {args.baseline} 相比无超过 {args.threshold:.0%} 的退化")
+    return 0
+
+
+if __name__=="__main__":
+    sys.exit(main())
@@ -0,0 +1,112 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+"""
+    audioForgeXS 启动耗时基准
+        * 多次运行轻量命令(-v/--help/getFileSize/getInfo), 统计冷启动耗时
+        * 用 python -X importtime 记录各模块的导入耗时
+    用法:
+        python benchmarks/startupBenchmark.py [-n 10] [--top 15] [--json startup.json]
+"""
+
+import argparse, json, os, statistics, struct, subprocess, sys, tempfile, time
+
+__version__="1.0.0"
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "audioForgeXS.py")
+
+
+def make_corpus(corpus_dir, file_num=4):
+    """
+        功能:
+                * 生成几条 16k 16bit 单声道的短 wav, 供 getFileSize/getInfo 使用
+    """
+    os.makedirs(corpus_dir, exist_ok=True)
+    data = b"\x00\x00" * 1600
+    for index in range(file_num):
+        with open(os.path.join(corpus_dir, f"{index}.wav"), "wb") as f:
+            f.write(b"RIFF" + struct.pack("<I", 36 + len(data)) + b"WAVEfmt "
+                    + struct.pack("<IHHIIHH", 16, 1, 1, 16000, 32000, 2, 16)
+                    + b"data" + struct.pack("<I", len(data)) + data)
+
+
+def command_dict(corpus_dir, output_dir):
+    """
+        功能:
+                * 需要测试的命令, 名称 -> 命令行参数
+    """
+    return {"version": ["-v"],
+            "help": ["BasicMode", "-h"],
+            "getFileSize": ["BasicMode", "-i", corpus_dir, "-o", output_dir, "-f", "getFileSize"],
+            "getInfo": ["BasicMode", "-i", corpus_dir, "-o", output_dir, "-f", "getInfo"]}
+
+
+def time_command(python, argv, run_num):
+    """
+        功能:
+                * 多次运行命令, 返回每次的耗时(毫秒)
+    """
+    cost_list = []
+    for _ in range(run_num):
+        start = time.perf_counter()
+        subprocess.run([python, SCRIPT_PATH] + argv, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        cost_list.append((time.perf_counter() - start) * 1000)
+    return cost_list
+
+
+def import_cost(python, argv):
+    """
+        功能:
+                * 用 -X importtime 运行一次命令, 解析各顶层模块的导入耗时
+        返回值:
+                * dict 模块名 -> 累计导入耗时(毫秒)
+    """
+    result = subprocess.run([python, "-X", "importtime", SCRIPT_PATH] + argv,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    cost_dict = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3 or not fields[1].strip().isdigit():
+            continue
+        name = fields[2].rstrip()
+        #只统计顶层导入(名称前只有一个空格), 子模块已计入其累计耗时
+        if name.startswith("  "):
+            continue
+        cost_dict[name.strip()] = cost_dict.get(name.strip(), 0) + int(fields[1]) / 1000
+    return cost_dict
+
+
+def main():
+    parser = argparse.ArgumentParser(description="audioForgeXS 启动耗时基准")
+    parser.add_argument("-n", "--runs", type=int, default=10, help="每条命令的运行次数，默认 10")
+    parser.add_argument("--top", type=int, default=15, help="列出导入耗时最多的前 N 个模块，默认 15")
+    parser.add_argument("--python", type=str, default=sys.executable, help="运行 audioForgeXS 的 python 解释器")
+    parser.add_argument("--json", type=str, default=None, help="结果另存为 json 文件")
+    args = parser.parse_args()
+
+    report = {"python": args.python, "runs": args.runs, "commands": {}}
+    with tempfile.TemporaryDirectory() as temp_dir:
+        corpus_dir = os.path.join(temp_dir, "corpus")
+        make_corpus(corpus_dir)
+        for name, argv in command_dict(corpus_dir, os.path.join(temp_dir, "output")).items():
+            cost_list = time_command(args.python, argv, args.runs)
+            cost_dict = import_cost(args.python, argv)
+            top_list = sorted(cost_dict.items(), key=lambda item: item[1], reverse=True)[:args.top]
+            report["commands"][name] = {"argv": argv, "median_ms": round(statistics.median(cost_list), 2),
+                                        "min_ms": round(min(cost_list), 2),
+                                        "import_ms": round(sum(cost_dict.values()), 2),
+                                        "top_imports": [{"module": module, "ms": round(ms, 2)} for module, ms in top_list]}
+
+    for name, info in report["commands"].items():
+        print(f"{name:<12} 中位数 {info['median_ms']:>8.1f} ms  最小 {info['min_ms']:>8.1f} ms  导入合计 {info['import_ms']:>8.1f} ms")
+        for item in info["top_imports"]:
+            print(f"    {item['module']:<40} {item['ms']:>8.1f} ms")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__=="__main__":
+    main()
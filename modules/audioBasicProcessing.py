@@ -1,10 +1,6 @@
 #!/usr/bin/python3
 #-*- coding:utf-8 -*-
-import os
-import wave
-import soundfile as sf
-from pydub import AudioSegment
-import numpy as np
+import os, sys, struct, contextlib
 
 
 try:
@@ -20,77 +16,442 @@ except ImportError:
 class AudioBasicProcessing:
 
     """ 这是一个处理路径相关的类"""
-    def __init__(self, logger=None):
+
+    #分块拷贝音频数据时每块的字节数
+    COPY_CHUNK_SIZE = 8 * 1024 * 1024
+    #soundfile 编码 -> 处理时使用的原生数据类型, 未列出的编码按 float32 处理
+    NATIVE_DTYPE_DICT = {"PCM_S8": "int16", "PCM_U8": "int16", "PCM_16": "int16",
+                         "PCM_24": "int32", "PCM_32": "int32", "FLOAT": "float32", "DOUBLE": "float64"}
+    #整数缩放时每次转换的采样点数, 限制浮点临时数组的大小
+    SCALE_CHUNK_SIZE = 1 << 20
+    #未设置 block_size 时流式提取通道每块的帧数
+    MONO_BLOCK_SIZE = 65536
+
+    def __init__(self, logger=None, block_size=0, norm_channel=0, subtype=None):
+        """
+            参数:
+                    * logger: 日志记录器
+                    * block_size: 流式处理每块的帧数, 0 表示整文件读入内存处理
+                    * norm_channel: 归一化时多通道音频选取的通道索引或 "mean"
+                    * subtype: 输出编码(如 PCM_16/PCM_24/FLOAT), None 表示与输入一致
+        """
         self.logger = logger
         if not self.logger:
             self.logger = DebugLogger()
         self.GetAudioInfo = GetAudioInfo(self.logger)
+        self.block_size = block_size
+        self.norm_channel = norm_channel
+        self.subtype = subtype
+        #可选的 MetadataCache 元数据缓存, 用于复用单通道音频的峰值
+        self.cache = None
+
+    @contextlib.contextmanager
+    def atomic_output(self, output_audio_path):
+        """
+            功能:
+                    * 原子写出: 先写同目录下的临时文件(保留原扩展名, 以便按扩展名识别格式), 成功后 os.replace 为目标文件
+                    * 失败或中断时删除临时文件, 目标文件要么是旧的完整文件, 要么是新的完整文件
+            参数:
+                    * output_audio_path: 目标路径
+            返回值:
+                    * 上下文中使用的临时文件路径
+        """
+        output_dir, output_name = os.path.split(output_audio_path)
+        temp_path = os.path.join(output_dir, f".{output_name}.{os.getpid()}.tmp{os.path.splitext(output_name)[1]}")
+        try:
+            yield temp_path
+            os.replace(temp_path, output_audio_path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+
+    def wav_output_path(self, output_audio_path):
+        """
+            功能:
+                    * pcm/mp3 转 wav 的输出路径: 替换 .pcm/.mp3 扩展名, 已是 .wav 时不再追加
+        """
+        stem, ext = os.path.splitext(output_audio_path)
+        if ext.lower() == ".wav":
+            return output_audio_path
+        if ext.lower() in [".pcm", ".mp3"]:
+            return stem if stem.lower().endswith(".wav") else stem + ".wav"
+        return output_audio_path + ".wav"
+
+
+    def native_dtype(self, subtype):
+        """
+            功能:
+                    * 按输入编码确定读入内存时的数据类型, 16 位及以下用 int16, 24/32 位用 int32, 浮点保持原精度
+            参数:
+                    * subtype: soundfile 编码名称
+            返回值:
+                    * str numpy 数据类型
+        """
+        return self.NATIVE_DTYPE_DICT.get(subtype, "float32")
+
+
+    def output_subtype(self, subtype):
+        """
+            功能:
+                    * 输出编码, 未指定 self.subtype 时沿用输入编码
+        """
+        return self.subtype or subtype
+
+
+    def _output_data(self, sig, subtype):
+        """
+            功能:
+                    * 按输出编码调整待写出的数据: 整数数据写为 FLOAT/DOUBLE 编码时换算为满幅 1.0 的浮点数
+                    * soundfile 把整数数据写入浮点编码时不做换算, 其余组合由 soundfile 按满幅正确转换
+            参数:
+                    * sig: 原生数据类型的音频数据
+                    * subtype: 输出编码
+            返回值:
+                    * 可直接写出的音频数据
+        """
+        import numpy as np
+        if subtype not in ["FLOAT", "DOUBLE"] or not np.issubdtype(sig.dtype, np.integer):
+            return sig
+        out = sig.astype(np.float64 if subtype == "DOUBLE" else np.float32)
+        out /= 1 << (8 * sig.dtype.itemsize - 1)
+        return out
+
+
+    def _peak(self, sig):
+        """
+            功能:
+                    * 求峰值, 满幅为 1.0(与 soundfile 读为浮点时一致)
+                    * 用 max/min 代替 abs, 不产生与音频等大的临时数组; 整数的 max/min 转为 python int 后再取负, 避免负满幅溢出
+            参数:
+                    * sig: 原生数据类型的音频数据
+            返回值:
+                    * float 峰值
+        """
+        import numpy as np
+        if not sig.size:
+            return 0.0
+        if np.issubdtype(sig.dtype, np.integer):
+            #先转为 python int 再取负, numpy 中 -np.int16(-32768) 仍为 -32768
+            peak = max(int(sig.max()), -int(sig.min()))
+            return float(peak) / (1 << (8 * sig.dtype.itemsize - 1))
+        return float(max(sig.max(), -sig.min()))
+
+
+    def _scale(self, sig, gain):
+        """
+            功能:
+                    * 按增益缩放音频, 保持原生数据类型
+                    * 整数数据在整数域缩放: 分段转为浮点相乘、四舍五入后写回, 超出范围的截到该类型最值(与 soundfile 浮点写出一致)
+            参数:
+                    * sig: 原生数据类型的音频数据
+                    * gain: 以满幅 1.0 计的增益
+            返回值:
+                    * 缩放后的音频数据, 与输入类型相同
+        """
+        import numpy as np
+        if not np.issubdtype(sig.dtype, np.integer):
+            out = sig.astype(sig.dtype, copy=True)
+            out *= gain
+            return out
+        info = np.iinfo(sig.dtype)
+        work_dtype = np.float32 if sig.dtype.itemsize <= 2 else np.float64
+        #满幅 1.0 对应 2**(位数-1), 增益直接作用于整数值
+        int_gain = work_dtype(gain)
+        out = np.empty_like(sig)
+        flat_sig = sig.reshape(-1)
+        flat_out = out.reshape(-1)
+        for index in range(0, flat_sig.size, self.SCALE_CHUNK_SIZE):
+            chunk = np.multiply(flat_sig[index:index + self.SCALE_CHUNK_SIZE], int_gain, dtype=work_dtype)
+            np.rint(chunk, out=chunk)
+            np.clip(chunk, info.min, info.max, out=chunk)
+            flat_out[index:index + self.SCALE_CHUNK_SIZE] = chunk
+        return out
+
+
+    @staticmethod
+    def parse_mono_spec(spec):
+        """
+            功能:
+                    * 解析 getMono 的通道参数, 逗号分隔, 每项为:
+                      通道索引(从0开始) / all(全部通道) / mean(各通道平均混合) / mix=权重:权重:...(按权重混合)
+            参数:
+                    * spec: 通道参数, 如 0 / "0,2" / "all" / "mean" / "all,mix=0.7:0.3"
+            返回值:
+                    * list 输出项, 每项为 int 通道索引 / "all" / "mean" / tuple 权重
+            异常:
+                    * ValueError: 参数不合规范
+        """
+        target_list = []
+        for item in str(spec).replace(" ", "").split(","):
+            lower_item = item.lower()
+            if lower_item in ["all", "mean"]:
+                target_list.append(lower_item)
+            elif lower_item.startswith("mix="):
+                try:
+                    target_list.append(tuple(float(weight) for weight in item[4:].split(":")))
+                except ValueError:
+                    raise ValueError(f"混合权重 {item} 错误, 格式为 mix=权重:权重:...")
+            elif item.isdigit():
+                target_list.append(int(item))
+            else:
+                raise ValueError(f"通道参数 {item} 错误, 只能是从0开始的通道索引、all、mean 或 mix=权重:权重:...")
+        return target_list
+
+
+    def _mono_outputs(self, target_list, channels, output_audio_path):
+        """
+            功能:
+                    * 按实际通道数展开输出项并确定各输出文件路径
+                    * 只有一个输出时写到 output_audio_path, 多个输出时依次命名为 <名称>_ch<索引>/_mean/_mix
+            返回值:
+                    * list (输出项, 输出路径)
+        """
+        expand_list = []
+        for target in target_list:
+            if target == "all":
+                expand_list.extend(range(channels))
+            else:
+                if isinstance(target, int) and target >= channels:
+                    raise ValueError(f"声道索引 {target} 超出范围（总通道数：{channels}）")
+                if isinstance(target, tuple) and len(target) != channels:
+                    raise ValueError(f"混合权重个数 {len(target)} 与通道数 {channels} 不一致")
+                expand_list.append(target)
+        #去重并保持顺序
+        expand_list = list(dict.fromkeys(expand_list))
+        if len(expand_list) == 1:
+            return [(expand_list[0], output_audio_path)]
+        stem, ext = os.path.splitext(output_audio_path)
+        output_list = []
+        for target in expand_list:
+            if target == "mean":
+                suffix = "_mean"
+            elif isinstance(target, tuple):
+                suffix = "_mix"
+            else:
+                suffix = f"_ch{target}"
+            output_list.append((target, f"{stem}{suffix}{ext}"))
+        return output_list
+
+
+    def _downmix(self, sig, weight_tuple):
+        """
+            功能:
+                    * 按权重把二维音频数据混合为单通道, 保持原生数据类型
+        """
+        import numpy as np
+        work_dtype = np.float32 if sig.dtype.itemsize <= 2 else np.float64
+        mix = np.dot(sig, np.asarray(weight_tuple, dtype=work_dtype))
+        if np.issubdtype(sig.dtype, np.integer):
+            info = np.iinfo(sig.dtype)
+            np.rint(mix, out=mix)
+            np.clip(mix, info.min, info.max, out=mix)
+        return mix.astype(sig.dtype, copy=False)
+
+
+    def _mono_block(self, block, target):
+        """
+            功能:
+                    * 从一块二维音频数据中取出某个输出项对应的单通道数据
+        """
+        if isinstance(target, tuple):
+            return self._downmix(block, target)
+        return self._select_channel(block, target)
+
+
+    def mono_output_paths(self, input_audio_path, output_audio_path, get_channel_index=0):
+        """
+            功能:
+                    * getMono 会生成的全部输出路径, 只读输入音频的头部
+            返回值:
+                    * list 输出路径
+        """
+        import soundfile as sf
+        channels = sf.info(input_audio_path).channels
+        target_list = self.parse_mono_spec(get_channel_index)
+        return [path for _, path in self._mono_outputs(target_list, channels, output_audio_path)]
+
 
     def getMono(self, input_audio_path, output_audio_path, get_channel_index=0):
         """
         功能:
             * 支持任意采样率、比特深度和通道数的音频文件，提取指定声道并生成单声道文件
+            * 流式处理: 逐块读取一次, 分发给每个输出通道的写入器, 拆分 N 个通道只读一遍文件, 内存只与块大小有关
+            * 可同时输出平均混合(mean)或按权重混合(mix=权重:...)的单声道文件
+            * 按原生数据类型读写, 输出编码与输入一致(或为 self.subtype)
         参数:
             * input_audio_path: 输入音频路径（支持WAV、FLAC等格式）
-            * output_audio_path: 输出音频路径（自动适配格式）
-            * get_channel_index: 声道索引（从0开始）
+            * output_audio_path: 输出音频路径（自动适配格式）, 多个输出时作为命名前缀
+            * get_channel_index: 声道参数, 见 parse_mono_spec, 如 0 / "0,2" / "all" / "mean"
         返回值:
             * bool: 成功返回True，失败返回False
         """
-        get_channel_index = int(get_channel_index)
-        self.logger.log(f"[AudioBasicProcessing]: 调试！提取 {input_audio_path} 的第 {get_channel_index} 音轨", "debug")
+        import soundfile as sf
+        self.logger.log("[AudioBasicProcessing]: 调试！提取 %s 的 %s 音轨", "debug", input_audio_path, get_channel_index)
+        output_list = []
         try:
-            # 使用soundfile读取音频数据及元信息（保留原始格式）
-            sig, samplerate = sf.read(input_audio_path, always_2d=True)
-            channels = sig.shape[1]
-
-            # 校验声道索引有效性
-            if get_channel_index >= channels:
-                self.logger.log(f"[AudioBasicProcessing]: 错误！声道索引 {get_channel_index} 超出范围（总通道数：{channels}）", "error")
-                return False
+            target_list = self.parse_mono_spec(get_channel_index)
+            block_size = self.block_size if self.block_size > 0 else self.MONO_BLOCK_SIZE
+            with sf.SoundFile(input_audio_path) as fin:
+                try:
+                    output_list = self._mono_outputs(target_list, fin.channels, output_audio_path)
+                except ValueError as e:
+                    self.logger.log(f"[AudioBasicProcessing]: 错误！{input_audio_path} {e}", "error")
+                    return False
+                subtype = self.output_subtype(fin.subtype)
+                with contextlib.ExitStack() as stack:
+                    #全部输出写完后才依次替换为目标文件
+                    temp_path_list = [stack.enter_context(self.atomic_output(path)) for _, path in output_list]
+                    writer_list = [(target, stack.enter_context(sf.SoundFile(temp_path, "w", fin.samplerate, 1, subtype=subtype)))
+                                   for (target, _), temp_path in zip(output_list, temp_path_list)]
+                    for block in fin.blocks(blocksize=block_size, dtype=self.native_dtype(fin.subtype), always_2d=True):
+                        for target, fout in writer_list:
+                            fout.write(self._output_data(self._mono_block(block, target), subtype))
 
-            # 提取目标声道数据
-            mono_data = sig[:, get_channel_index]
-
-            # 直接使用soundfile写入输出文件（自动处理格式和参数）
-            sf.write(output_audio_path, mono_data, samplerate)
-
-            self.logger.log(f"[AudioBasicProcessing]: 调试！成功提取音轨到 {output_audio_path}", "debug")
+            if self.logger.isEnabledFor("debug"):
+                self.logger.log("[AudioBasicProcessing]: 调试！成功提取音轨到 %s", "debug", ", ".join(path for _, path in output_list))
             return True
         except Exception as e:
-            self.logger.log(f"[AudioBasicProcessing]: 错误！提取失败：{str(e)}", "error")
+            self.logger.log(f"[AudioBasicProcessing]: 错误！{input_audio_path} 提取失败：{str(e)}", "error")
             return False
 
 
 
-    def wavNorm(self, input_audio_path, output_audio_path, norm_number=1):
+    def parse_channel(self, channel):
+        """
+            功能:
+                    * 解析通道选择参数
+            参数:
+                    * channel: 通道索引(从0开始, 支持数字字符串) 或 "mean"(各通道取平均混合)
+            返回值:
+                    * int 通道索引 或 str "mean"
+            异常:
+                    * ValueError: 参数不合规范
+        """
+        if isinstance(channel, str) and channel.strip().lower() == "mean":
+            return "mean"
+        try:
+            channel = int(channel)
+        except (TypeError, ValueError):
+            raise ValueError(f"通道参数 {channel} 错误, 只能是从0开始的通道索引或 mean")
+        if channel < 0:
+            raise ValueError(f"通道参数 {channel} 错误, 只能是从0开始的通道索引或 mean")
+        return channel
+
+
+    def _select_channel(self, sig, channel):
+        """
+            功能:
+                    * 在内存中从二维音频数据(帧数 x 通道数)里选取单个通道或混合为单通道
+            参数:
+                    * sig: 二维音频数据
+                    * channel: parse_channel 的返回值
+            返回值:
+                    * 一维音频数据
+        """
+        import numpy as np
+        if channel == "mean":
+            if sig.shape[1] == 1:
+                return sig[:, 0]
+            if np.issubdtype(sig.dtype, np.integer):
+                #整数数据求平均后取整, 保持原生数据类型
+                work_dtype = np.float32 if sig.dtype.itemsize <= 2 else np.float64
+                return np.rint(sig.mean(axis=1, dtype=work_dtype)).astype(sig.dtype)
+            return sig.mean(axis=1, dtype=sig.dtype)
+        if channel >= sig.shape[1]:
+            raise ValueError(f"声道索引 {channel} 超出范围（总通道数：{sig.shape[1]}）")
+        return sig[:, channel]
+
+
+    def wavNorm(self, input_audio_path, output_audio_path, norm_number=1, channel=None):
         """
             功能:
                     * wav归一化, 把音频振幅最大值拉到1
+                    * 多通道音频一次读入, 在内存中选取通道(默认第0通道)后直接归一化, 不产生临时文件
+                    * 按原生数据类型处理(16 位为 int16), 整数域缩放, 输出编码与输入一致(或为 self.subtype)
             参数:
                     * input_audio_path: 原始路径
                     * output_audio_path: 新路径
                     * norm_number 归一化数值, 范围 (0~1) 支持浮点
+                    * channel: 多通道音频选取的通道索引或 "mean", 默认使用 self.norm_channel
             返回值:
                     * bool True/False
         """
-        wav_infor_dict = {}
+        import soundfile as sf
+        if channel is None:
+            channel = self.norm_channel
+        if self.block_size > 0:
+            return self.wavNormBlocks(input_audio_path, output_audio_path, norm_number, self.block_size, channel)
+
         try:
-            wav_infor_dict = self.GetAudioInfo.getWavInfor(input_audio_path)
-            if wav_infor_dict['Channels'] > 1:
-                #self.getMono(input_audio_path, "temp.wav", 1)
-                self.getMono(input_audio_path, "temp.wav", 0)
-                input_audio_path = "temp.wav"
-            sig = None
-            sig, fs = sf.read(input_audio_path)
-            sig = sig / max(abs(sig)) * norm_number
-            sf.write(output_audio_path, sig, fs)
-            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} 归一化到 {norm_number} 成功，新文件 {output_audio_path}", "debug")
+            channel = self.parse_channel(channel)
+            with sf.SoundFile(input_audio_path) as fin:
+                fs = fin.samplerate
+                subtype = fin.subtype
+                sig = fin.read(dtype=self.native_dtype(subtype), always_2d=True)
+            sig = self._select_channel(sig, channel)
+            peak = self._peak(sig)
+            if not peak:
+                self.logger.log(f"[AudioBasicProcessing]: 错误! {input_audio_path} 为静音音频, 无法归一化", "error")
+                return False
+            sig = self._scale(sig, norm_number / peak)
+            subtype = self.output_subtype(subtype)
+            with self.atomic_output(output_audio_path) as temp_path:
+                sf.write(temp_path, self._output_data(sig, subtype), fs, subtype=subtype)
+            self.logger.log("[AudioBasicProcessing]: %s 归一化到 %s 成功，新文件 %s", "debug", input_audio_path, norm_number, output_audio_path)
             return True
         except Exception as e:
             self.logger.log(f"[AudioBasicProcessing]: 错误! {input_audio_path} 归一化到 {norm_number} 失败，因 {e}", "error")
             return False
 
+
+    def wavNormBlocks(self, input_audio_path, output_audio_path, norm_number=1, block_size=65536, channel=0):
+        """
+            功能:
+                    * 流式 wav 归一化, 内存占用只与块大小有关, 与音频时长无关
+                    * 第一遍逐块求峰值, 第二遍逐块缩放并写出
+                    * 设置了元数据缓存时, 单通道音频的峰值命中缓存可跳过第一遍
+                    * 多通道音频与 wavNorm 一致, 逐块选取通道或混合; 数据类型与输出编码也与 wavNorm 一致
+            参数:
+                    * input_audio_path: 原始路径
+                    * output_audio_path: 新路径
+                    * norm_number 归一化数值, 范围 (0~1) 支持浮点
+                    * block_size: 每块的帧数
+                    * channel: 多通道音频选取的通道索引或 "mean"
+            返回值:
+                    * bool True/False
+        """
+        import soundfile as sf
+        try:
+            channel = self.parse_channel(channel)
+            with sf.SoundFile(input_audio_path) as fin:
+                dtype = self.native_dtype(fin.subtype)
+                peak = None
+                if self.cache is not None and fin.channels == 1:
+                    peak = self.cache.getPeak(input_audio_path)
+                if peak is None:
+                    peak = 0.0
+                    for block in fin.blocks(blocksize=block_size, dtype=dtype, always_2d=True):
+                        peak = max(peak, self._peak(self._select_channel(block, channel)))
+                    if self.cache is not None and fin.channels == 1:
+                        self.cache.putPeak(input_audio_path, peak)
+                    fin.seek(0)
+                if not peak:
+                    self.logger.log(f"[AudioBasicProcessing]: 错误! {input_audio_path} 为静音音频, 无法归一化", "error")
+                    return False
+
+                gain = norm_number / peak
+                subtype = self.output_subtype(fin.subtype)
+                with self.atomic_output(output_audio_path) as temp_path:
+                    with sf.SoundFile(temp_path, "w", fin.samplerate, 1, subtype=subtype) as fout:
+                        for block in fin.blocks(blocksize=block_size, dtype=dtype, always_2d=True):
+                            fout.write(self._output_data(self._scale(self._select_channel(block, channel), gain), subtype))
+            self.logger.log("[AudioBasicProcessing]: %s 流式归一化到 %s 成功，新文件 %s", "debug", input_audio_path, norm_number, output_audio_path)
+            return True
+        except Exception as e:
+            self.logger.log(f"[AudioBasicProcessing]: 错误! {input_audio_path} 流式归一化到 {norm_number} 失败，因 {e}", "error")
+            return False
+
     def mp3ToWav(self, input_audio_path, output_audio_path, fill_para=None):
         """
             功能:
@@ -101,78 +462,203 @@ class AudioBasicProcessing:
             返回值:
                     * bool True/False
         """
+        from pydub import AudioSegment
+        output_audio_path = self.wav_output_path(output_audio_path)
         try:
-            if output_audio_path.endswith(".mp3"):
-                output_audio_path = output_audio_path.split(".mp3")[0] + ".wav"
-            else:
-                output_audio_path = output_audio_path + ".wav"
-
             song = AudioSegment.from_mp3(input_audio_path)
-            song.export(output_audio_path, format="wav")
-            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} MP3->WAV {output_audio_path} 成功", "debug")
+            with self.atomic_output(output_audio_path) as temp_path:
+                song.export(temp_path, format="wav")
+            self.logger.log("[AudioBasicProcessing]: %s MP3->WAV %s 成功", "debug", input_audio_path, output_audio_path)
             return True
         except Exception as e:
             self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} MP3->WAV {output_audio_path} 失败，因 {e}", "error")
             return False
 
 
+    def _copy_payload(self, in_fd, in_offset, out_fd, out_offset, count):
+        """
+            功能:
+                    * 在两个文件之间拷贝一段数据, 内存占用恒定
+                    * 优先使用内核态拷贝 copy_file_range/sendfile, 不支持时退回固定大小分块读写
+            参数:
+                    * in_fd/in_offset: 源文件描述符与起始偏移
+                    * out_fd/out_offset: 目标文件描述符与起始偏移
+                    * count: 拷贝字节数
+            返回值:
+                    * /
+        """
+        copied = 0
+        if hasattr(os, "copy_file_range"):
+            try:
+                while copied < count:
+                    size = os.copy_file_range(in_fd, out_fd, min(count - copied, self.COPY_CHUNK_SIZE),
+                                              in_offset + copied, out_offset + copied)
+                    if not size:
+                        break
+                    copied += size
+            except OSError:
+                #跨文件系统或文件系统不支持时退回其他方式
+                pass
+        if copied < count and hasattr(os, "sendfile"):
+            try:
+                os.lseek(out_fd, out_offset + copied, os.SEEK_SET)
+                while copied < count:
+                    size = os.sendfile(out_fd, in_fd, in_offset + copied, min(count - copied, self.COPY_CHUNK_SIZE))
+                    if not size:
+                        break
+                    copied += size
+            except OSError:
+                pass
+        if copied < count:
+            os.lseek(in_fd, in_offset + copied, os.SEEK_SET)
+            os.lseek(out_fd, out_offset + copied, os.SEEK_SET)
+            while copied < count:
+                chunk = os.read(in_fd, min(count - copied, self.COPY_CHUNK_SIZE))
+                if not chunk:
+                    break
+                os.write(out_fd, chunk)
+                copied += len(chunk)
+        if copied < count:
+            raise IOError(f"数据拷贝不完整 {copied}/{count} 字节")
+
+
+    def _parse_wav_para(self, input_wav_info):
+        """
+            功能:
+                    * 解析 pcmToWav/wavHeadRepair 的音频参数
+            参数:
+                    * dict 音频参数 input_wav_info, 包含 channels/Framerate/SampleEncoding
+            返回值:
+                    * tuple (通道数, 采样率, 位宽(字节))
+            异常:
+                    * ValueError: 参数缺失或不合规范
+        """
+        try:
+            channels = int(input_wav_info["channels"])
+            framerate = int(input_wav_info["Framerate"])
+            sample_encoding = int(input_wav_info["SampleEncoding"])
+        except (TypeError, KeyError, ValueError):
+            raise ValueError(f"音频参数 {input_wav_info} 不完整或不是数字")
+        if channels <= 0 or framerate <= 0 or sample_encoding <= 0 or sample_encoding % 8 != 0:
+            raise ValueError(f"音频参数 {input_wav_info} 不合规范")
+        return channels, framerate, sample_encoding // 8
+
+
     def pcmToWav(self, input_audio_path, output_audio_path, fill_para=None):
         """
             功能:
                     * pcm 转 wav
+                    * 写入 wav 头后, 音频数据由内核态拷贝或分块拷贝, 内存占用与文件大小无关
             参数：
                     * input_audio_path: 原始路径
                     * output_audio_path: 新路径
+                    * fill_para: 音频参数 dict, 包含 channels/Framerate/SampleEncoding
             返回值:
                     * bool True/False
         """
-        input_wav_info = fill_para
-
-        if self.SampleEncoding % 8 != 0:
-            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} PCM->WAV {output_audio_path} 失败，因 bits 参数不合规范", "error")
+        output_audio_path = self.wav_output_path(output_audio_path)
+        try:
+            channels, framerate, sampwidth = self._parse_wav_para(fill_para)
+        except ValueError as e:
+            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} PCM->WAV {output_audio_path} 失败，因 {e}", "error")
             return False
 
-        if output_audio_path.find(".wav") >= 0:
-            output_audio_path = output_audio_path.split(".pcm")[0]
-        else:
-            output_audio_path = output_audio_path.split(".pcm")[0] + ".wav"
         try:
-            with open(input_audio_path, "rb") as pcmf:
-                pcm_data = pcmf.read()
-            with wave.open(output_audio_path, 'wb') as wavf:
-                wavf.setnchannels(int(input_wav_info["channels"]))
-                wavf.setsampwidth(int(input_wav_info["SampleEncoding"]) // 8)
-                wavf.setframerate(int(input_wav_info["Framerate"]))
-                wavf.writeframes(pcm_data)
-            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} PCM->WAV {output_audio_path} 成功", "debug")
+            data_size = os.path.getsize(input_audio_path)
+            frame_size = channels * sampwidth
+            if data_size % frame_size:
+                self.logger.log(f"[AudioBasicProcessing]: 警告! {input_audio_path} 数据长度不是整帧, 丢弃末尾 {data_size % frame_size} 字节", "warning")
+                data_size -= data_size % frame_size
+            wav_head = self.GetAudioInfo.buildWavHeader(channels, framerate, sampwidth, data_size)
+            with self.atomic_output(output_audio_path) as temp_path:
+                with open(input_audio_path, "rb") as pcmf, open(temp_path, "wb") as wavf:
+                    wavf.write(wav_head)
+                    wavf.flush()
+                    self._copy_payload(pcmf.fileno(), 0, wavf.fileno(), len(wav_head), data_size)
+                    if data_size & 1:
+                        os.lseek(wavf.fileno(), len(wav_head) + data_size, os.SEEK_SET)
+                        os.write(wavf.fileno(), b"\x00")
+            self.logger.log("[AudioBasicProcessing]: %s PCM->WAV %s 成功", "debug", input_audio_path, output_audio_path)
             return True
-        except ValueError as e:
+        except (OSError, ValueError) as e:
             self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} PCM->WAV {output_audio_path} 失败，因 {e}", "error")
             return False
 
 
+    def repair_head(self, wav_path):
+        """
+            功能:
+                    * wavHeadRepair 使用的头部: 仍可按块解析且 fmt 完整时返回解析结果, 音频数据从 DataOffset 到文件末尾
+                    * 头部已损坏/清零时返回 None, 视前 44 字节为头
+            参数:
+                    * wav_path: wav 文件路径
+            返回值:
+                    * dict readWavHeader 的返回值 或 None
+        """
+        try:
+            head = self.GetAudioInfo.readWavHeader(wav_path)
+        except (ValueError, struct.error):
+            return None
+        return head if head["FmtSize"] >= 16 else None
+
+
+    def _patch_wav_header(self, wav_path, channels, framerate, sampwidth):
+        """
+            功能:
+                    * 原地改写 wav 头部字段
+                    * 头部仍可按块解析(如含 LIST 块)时, 只修正 RIFF 长度、fmt 字段和 data 长度
+                    * 头部已损坏/清零时, 视前 44 字节为头, 重写标准 44 字节头
+        """
+        head = self.repair_head(wav_path)
+        with open(wav_path, "r+b") as fd:
+            file_size = os.fstat(fd.fileno()).st_size
+            if head:
+                data_offset = head["DataOffset"]
+                audio_format = 1 if head["FmtSize"] == 16 else head["AudioFormat"]
+                fd.seek(head["FmtOffset"])
+                fd.write(struct.pack("<HHIIHH", audio_format, channels, framerate,
+                                     framerate * channels * sampwidth, channels * sampwidth, sampwidth * 8))
+            else:
+                data_offset = 44
+                if file_size < data_offset:
+                    raise ValueError(f"文件长度 {file_size} 小于 wav 头长度")
+                fd.write(self.GetAudioInfo.buildWavHeader(channels, framerate, sampwidth, file_size - data_offset))
+            data_size = file_size - data_offset
+            if data_size & 1:
+                #data 块长度为奇数时补齐一个字节
+                fd.seek(file_size)
+                fd.write(b"\x00")
+            fd.seek(4)
+            fd.write(struct.pack("<I", data_offset - 8 + data_size + (data_size & 1)))
+            fd.seek(data_offset - 4)
+            fd.write(struct.pack("<I", data_size))
+
+
     def wavHeadRepair(self, input_audio_path, output_audio_path, fill_para=None):
         """
             功能:
-                    * wav 头修复
+                    * wav 头修复, 只改写头部字段, 耗时与文件大小无关
+                    * 输出路径与输入相同时原地修复; 不同时先整文件拷贝到临时文件(支持的文件系统上为写时复制的 reflink),
+                      修复副本后原子替换为输出文件
+                    * 头部仍可按块解析(如含 LIST 块)时, 只修正 RIFF 长度、fmt 字段和 data 长度
+                    * 头部已损坏/清零时, 与原实现一致视前 44 字节为头, 重写标准 44 字节头
             参数:
                     * input_audio_path: 原始路径
-                    * output_audio_path: 新路径
+                    * output_audio_path: 新路径, 与原始路径相同时原地修复
+                    * fill_para: 音频参数 dict, 包含 channels/Framerate/SampleEncoding
             返回值:
                     * bool True/False
         """
-        input_wav_info = fill_para
         try:
-            wav_data = None
-            with open(input_audio_path, "rb") as fd:
-                fd.seek(44)
-                wav_data = fd.read()
-            with wave.open(output_audio_path, 'wb') as wavf:
-                wavf.setnchannels(int(input_wav_info["channels"]))
-                wavf.setsampwidth(int(input_wav_info["SampleEncoding"]) // 8)
-                wavf.setframerate(int(input_wav_info["Framerate"]))
-                wavf.writeframes(wav_data)
-            self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} WAV头修复 {output_audio_path} 成功", "debug")
+            channels, framerate, sampwidth = self._parse_wav_para(fill_para)
+            if os.path.abspath(input_audio_path) == os.path.abspath(output_audio_path):
+                self._patch_wav_header(output_audio_path, channels, framerate, sampwidth)
+            else:
+                with self.atomic_output(output_audio_path) as temp_path:
+                    with open(input_audio_path, "rb") as fin, open(temp_path, "wb") as fout:
+                        self._copy_payload(fin.fileno(), 0, fout.fileno(), 0, os.fstat(fin.fileno()).st_size)
+                    self._patch_wav_header(temp_path, channels, framerate, sampwidth)
+            self.logger.log("[AudioBasicProcessing]: %s WAV头修复 %s 成功", "debug", input_audio_path, output_audio_path)
             return True
         except Exception as e:
             self.logger.log(f"[AudioBasicProcessing]: {input_audio_path} WAV头修复 {output_audio_path} 失败，因 {e}", "error")
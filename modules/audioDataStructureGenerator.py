@@ -1,8 +1,9 @@
 #!/usr/bin/python3
 #-*- coding:utf-8 -*-
 
-import os, hashlib, re
-import pypinyin, shutil, sys
+import os, hashlib, re, functools, json, collections, codecs
+import shutil, sys
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from modules.debugLogger import DebugLogger
@@ -17,11 +18,78 @@ except ImportError:
 
 class AudioDataStructureGenerator:
     """音频资料结构生成器"""
+
+    #计算 MD5 时每次读取的字节数
+    MD5_CHUNK_SIZE = 1024 * 1024
+    #拼音/命名转换缓存的最大条目数
+    NAME_CACHE_SIZE = 65536
+    #LAB 目录索引保留的目录数
+    LAB_INDEX_DIR_NUM = 256
+
+    LAB_SUFFIX_VARIANTS = [
+        ".lab", ".txt", ".list",
+        ".wav.lab", ".wav.txt", ".wav.list",
+        "_lab", "_label", "_annotation"
+    ]
+
+    ENCODING_CANDIDATES = [
+        # 带BOM的编码优先检测
+        'utf-8-sig', 'utf-16', 'utf-16le', 'utf-16be',
+        'utf-32', 'utf-32le', 'utf-32be',
+
+        # 常见编码
+        'utf-8', 'ascii', 'latin-1',
+
+        # 中文编码
+        'gb18030', 'gbk', 'gb2312', 'big5', 'hz',
+
+        # 日文编码
+        'shift_jis', 'euc-jp',
+
+        # 韩文编码
+        'euc-kr',
+
+        # 国际编码
+        'iso-8859-1', 'iso-8859-2', 'iso-8859-5'
+    ]
+
+    #几乎任何字节序列都能解码成功的编码, 不作为语料来源的编码记录
+    AMBIGUOUS_ENCODINGS = {'utf-16', 'utf-16le', 'utf-16be', 'utf-32', 'utf-32le', 'utf-32be',
+                           'latin-1', 'iso-8859-1', 'iso-8859-2', 'iso-8859-5'}
+
+    BOM_ENCODINGS = {
+        b'\xff\xfe\x00\x00': 'utf-32le',
+        b'\x00\x00\xfe\xff': 'utf-32be',
+        b'\xff\xfe': 'utf-16le',
+        b'\xfe\xff': 'utf-16be',
+        b'\xef\xbb\xbf': 'utf-8-sig'
+    }
+
     def __init__(self, logger=None):
         self.logger = logger
         if not self.logger:
             self.logger = DebugLogger()
 
+        #可选的 MetadataCache 元数据缓存, 用于跨次运行复用 MD5
+        self.cache = None
+        #(路径, 大小, 修改时间, inode) -> MD5
+        self.md5_memo_dict = {}
+
+        #是否输出 LAB 读取错误
+        self.enable_log_flag = True
+        #目录 -> 文件名集合, LAB 查找只依赖一次目录列举
+        self.lab_dir_index = collections.OrderedDict()
+        #语料来源目录 -> LAB 编码
+        self.lab_encoding_dict = {}
+
+        #pypinyin 词典较大, 第一次转换时才加载
+        self.pypinyin = None
+        #语料中不同的转录文本、字段值很少, 转换结果按 LRU 缓存
+        self.pinyin_cache = functools.lru_cache(maxsize=self.NAME_CACHE_SIZE)(self._chinese_characters_to_pinyin)
+        self.camel_cache = functools.lru_cache(maxsize=self.NAME_CACHE_SIZE)(self._to_large_camel)
+        self.command_name_cache = functools.lru_cache(maxsize=self.NAME_CACHE_SIZE)(self._command_name)
+        self.field_cache = functools.lru_cache(maxsize=self.NAME_CACHE_SIZE)(self._normalize_field)
+
         #地区关键字
         self.area_keywords_dict = {}
 
@@ -43,19 +111,135 @@ class AudioDataStructureGenerator:
                                         "middleAge": ["adults","中年", "middleAge","成年"],
                                         "oldＡge":["老年人","oldＡge", "大爷", "大妈"],},
                                 }
+        #编译后的关键字匹配器, 修改关键字表后需调用 compile_keywords 重新编译
+        self.keyword_pattern_list = []
+        self.compile_keywords()
+
+
+
+    def _trie_pattern(self, word_list):
+        """
+            功能:
+                    * 把关键字列表构造成前缀树形式的正则, 公共前缀只匹配一次, 同一位置优先匹配最长关键字
+            参数:
+                    * list 关键字列表 word_list
+            返回值:
+                    * str 正则表达式
+        """
+        trie = {}
+        for word in word_list:
+            node = trie
+            for char in word:
+                node = node.setdefault(char, {})
+            node[""] = {}
+
+        def build(node):
+            branch_list = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+            if not branch_list:
+                return ""
+            body = branch_list[0] if len(branch_list) == 1 else "(?:" + "|".join(branch_list) + ")"
+            if "" in node:
+                body = "(?:" + body + ")?"
+            return body
+
+        return build(trie)
+
+
+    def compile_keywords(self):
+        """
+            功能:
+                    * 把 info_keywords_dict 与 area_keywords_dict(类别 "地区") 按类别各编译成一个匹配器
+                    * 匹配代价与关键字数量基本无关; 类别之间互不影响, 一个类别的长关键字(如 粤语)
+                      不会遮住另一类别在同一位置的短关键字(如 粤)
+            返回值:
+                    * /
+        """
+        category_dict = dict(self.info_keywords_dict)
+        if self.area_keywords_dict:
+            category_dict["地区"] = self.area_keywords_dict
+        #[(类别, 正则, 关键字 -> 取值)], 同一关键字属于多个取值时以后出现的为准
+        self.keyword_pattern_list = []
+        for category, key_dict in category_dict.items():
+            target_dict = {}
+            for key, keyword_list in key_dict.items():
+                for keyword in keyword_list:
+                    if keyword:
+                        target_dict[keyword.lower()] = key
+            if target_dict:
+                self.keyword_pattern_list.append((category, re.compile(self._trie_pattern(list(target_dict))), target_dict))
+
+
+    def load_keywords_config(self, config_path):
+        """
+            功能:
+                    * 从 json 配置文件加载扩展关键字表, 与内置表合并后重新编译, 配置格式如下:
+                      {"info_keywords": {"性别": {"man": ["男生"]}, "口音": {"sichuan": ["川普"]}},
+                       "area_keywords": {"guangdong": ["广东", "粤"]}}
+            参数:
+                    * str 配置文件路径 config_path
+            返回值:
+                    * bool True/False
+        """
+        try:
+            with open(config_path, "r", encoding="utf-8") as f:
+                config = json.load(f)
+            for category, key_dict in config.get("info_keywords", {}).items():
+                category_dict = self.info_keywords_dict.setdefault(category, {})
+                for key, keyword_list in key_dict.items():
+                    category_dict.setdefault(key, []).extend(keyword_list)
+            for key, keyword_list in config.get("area_keywords", {}).items():
+                self.area_keywords_dict.setdefault(key, []).extend(keyword_list)
+        except (OSError, ValueError, AttributeError, TypeError) as e:
+            self.logger.log(f"[AudioDataStructureGenerator]: 错误！ 关键字配置 {config_path} 加载失败: {e}", "error")
+            return False
+        self.compile_keywords()
+        self.logger.log(f"[AudioDataStructureGenerator]: 调试！ 已加载关键字配置 {config_path}, 共 {sum(len(target_dict) for _, _, target_dict in self.keyword_pattern_list)} 个关键字", "debug")
+        return True
 
 
+    def classify_path(self, input_audio_path):
+        """
+            功能:
+                    * 每个类别一次扫描路径(不区分大小写), 得到全部类别的关键字信息
+                    * 优先级: 同一类别有多处匹配时, 越靠近文件名(越靠后)的匹配生效;
+                      同一位置以最长的关键字为准, 例如 woman 不会被识别为 man
+            参数:
+                    * str 音频文件路径 input_audio_path
+            返回值:
+                    * dict 类别 -> 关键字所属的取值
+        """
+        classify_dict = {}
+        input_audio_path = input_audio_path.lower()
+        for category, pattern, target_dict in self.keyword_pattern_list:
+            match = None
+            for match in pattern.finditer(input_audio_path):
+                pass
+            if match is not None:
+                classify_dict[category] = target_dict[match.group()]
+        return classify_dict
+
 
     def chinese_characters_to_pinyin(self, word):
         """
         ┆   功能:
-                    * 汉字转拼音(不带声调)
+                    * 汉字转拼音(不带声调), 结果按 LRU 缓存
         ┆   参数:
                     * word 汉字字符串
         ┆   返回值:
                     * str: 对应拼音(不带声调)
         """
-        word = str(word)
+        return self.pinyin_cache(str(word))
+
+
+    def _chinese_characters_to_pinyin(self, word):
+        """
+        ┆   功能:
+                    * 汉字转拼音(不带声调), 不经过缓存
+        """
+        if self.pypinyin is None:
+            import pypinyin
+            self.pypinyin = pypinyin
+        pypinyin = self.pypinyin
         pinyin = ""
         for i in pypinyin.pinyin(word, style=pypinyin.NORMAL):
             pinyin += ''.join(i)
@@ -78,12 +262,38 @@ class AudioDataStructureGenerator:
     def ToLargeCamel(self, name: str) -> str:
         """
             功能:
-                    * 下划线或小驼峰 转 大驼峰
+                    * 下划线或小驼峰 转 大驼峰, 结果按 LRU 缓存
             参数:
                     * str 需要处理的字符串名称 name
             返回值:
                     * str 下划线转驼峰后的字符串
         """
+        return self.camel_cache(name)
+
+
+    def _command_name(self, lab_text):
+        """ 功能: 转录文本 -> 拼音 -> 大驼峰指令词"""
+        return self.ToLargeCamel(self.chinese_characters_to_pinyin(lab_text))
+
+
+    def _normalize_field(self, value):
+        """ 功能: 结构化文件名字段归一化, 大驼峰并去除下划线"""
+        return self.ToLargeCamel(value).replace("_", "")
+
+
+    def log_cache_stats(self):
+        """
+            功能:
+                    * 调试输出拼音/命名转换缓存的命中情况
+        """
+        for cache_name, cache in [("拼音", self.pinyin_cache), ("大驼峰", self.camel_cache),
+                                  ("指令词", self.command_name_cache), ("字段归一化", self.field_cache)]:
+            info = cache.cache_info()
+            self.logger.log(f"[AudioDataStructureGenerator]: 调试! {cache_name}缓存 命中 {info.hits} 未命中 {info.misses} 条目 {info.currsize}/{info.maxsize}", "debug")
+
+
+    def _to_large_camel(self, name: str) -> str:
+        """ 功能: 下划线或小驼峰 转 大驼峰, 不经过缓存"""
         if "_" in name:
             name = name.title()
             return re.sub(r'(_[a-zA-Z])', lambda x: x.group(1)[1].upper(), name)
@@ -97,6 +307,80 @@ class AudioDataStructureGenerator:
 
 
 
+    def _get_dir_name_set(self, dir_path):
+        """
+            功能:
+                    * 获取目录下的文件名集合, 每个目录只 scandir 一次, 按 LRU 保留最近的目录
+            参数:
+                    * str 目录路径 dir_path
+            返回值:
+                    * set 文件名集合
+        """
+        name_set = self.lab_dir_index.get(dir_path)
+        if name_set is not None:
+            self.lab_dir_index.move_to_end(dir_path)
+            return name_set
+        name_set = set()
+        try:
+            with os.scandir(dir_path or ".") as entry_iter:
+                for entry in entry_iter:
+                    if not entry.is_dir():
+                        name_set.add(entry.name)
+        except OSError as e:
+            self.logger.log(f"[AudioDataStructureGenerator]: 警告 无法读取目录 {dir_path}: {e}", "warning")
+        self.lab_dir_index[dir_path] = name_set
+        if len(self.lab_dir_index) > self.LAB_INDEX_DIR_NUM:
+            self.lab_dir_index.popitem(last=False)
+        return name_set
+
+
+    def find_lab(self, wav_path):
+        """
+            功能:
+                    * 在目录索引中查找 wav 关联的 LAB 文件, 不产生额外的文件系统调用
+            参数:
+                    * wav 音频文件路径 wav_path
+            返回值:
+                    * str LAB 文件路径, 未找到返回 None
+        """
+        base_path = wav_path.rsplit('.wav', 1)[0] if wav_path.endswith('.wav') else wav_path
+        dir_path, base_name = os.path.split(base_path)
+        name_set = self._get_dir_name_set(dir_path)
+        for suffix in self.LAB_SUFFIX_VARIANTS:
+            if base_name + suffix in name_set:
+                return os.path.join(dir_path, base_name + suffix)
+        return None
+
+
+    def _corpus_source_dir(self, lab_path):
+        """
+            功能:
+                    * LAB 编码缓存的键: 路径中最后一个含 "来源" 的目录, 没有时为 LAB 所在目录
+        """
+        dir_path = os.path.dirname(lab_path)
+        path_info = dir_path.split("/")
+        for index in range(len(path_info) - 1, -1, -1):
+            if "来源" in path_info[index]:
+                return "/".join(path_info[:index + 1])
+        return dir_path
+
+
+    def _decode_lab(self, raw_data, encoding):
+        """
+            功能:
+                    * 按指定编码严格解码, 并检查是否存在异常控制字符
+            返回值:
+                    * str 解码结果, 失败返回 None
+        """
+        try:
+            decoded = raw_data.decode(encoding, errors='strict')
+        except (UnicodeDecodeError, LookupError):
+            return None
+        if any(0x0 <= ord(c) < 0x20 and ord(c) not in (0x09, 0x0A, 0x0D) for c in decoded):
+            return None
+        return decoded
+
+
     def readLab(self, wav_path):
         """
             功能:
@@ -107,48 +391,15 @@ class AudioDataStructureGenerator:
                             3. 添加字节序检测
                             4. 支持带BOM的UTF编码
                             5. 使用更高效的编码检测策略
+                            6. LAB 文件通过目录索引查找, 不再逐个后缀判断文件是否存在
+                            7. 同一语料来源目录下检测出的编码会被记录, 之后的文件校验通过时直接使用
             参数:
                     * wav 音频文件路径 wav_path
             返回值:
                     * 解析的 lab 内容
         """
-        # 配置参数
-        ENCODING_CANDIDATES = [
-            # 带BOM的编码优先检测
-            'utf-8-sig', 'utf-16', 'utf-16le', 'utf-16be',
-            'utf-32', 'utf-32le', 'utf-32be',
-
-            # 常见编码
-            'utf-8', 'ascii', 'latin-1',
-
-            # 中文编码
-            'gb18030', 'gbk', 'gb2312', 'big5', 'hz',
-
-            # 日文编码
-            'shift_jis', 'euc-jp',
-
-            # 韩文编码
-            'euc-kr',
-
-            # 国际编码
-            'iso-8859-1', 'iso-8859-2', 'iso-8859-5'
-        ]
-
-        LAB_SUFFIX_VARIANTS = [
-            ".lab", ".txt", ".list",
-            ".wav.lab", ".wav.txt", ".wav.list",
-            "_lab", "_label", "_annotation"
-        ]
-
-        # 生成候选路径
-        base_path = wav_path.rsplit('.wav', 1)[0] if wav_path.endswith('.wav') else wav_path
-        candidate_paths = (
-            f"{base_path}{suffix}"
-            for suffix in LAB_SUFFIX_VARIANTS
-        )
-
         # 查找有效LAB文件
-        lab_path = next((p for p in candidate_paths if os.path.isfile(p)), None)
+        lab_path = self.find_lab(wav_path)
 
         if not lab_path:
             if self.enable_log_flag:
@@ -161,41 +412,40 @@ class AudioDataStructureGenerator:
             with open(lab_path, 'rb') as f:
                 raw_data = f.read(4096)  # 读取前4KB用于编码检测
 
-                # 第一阶段：检测BOM
-                bom_encodings = {
-                    b'\xff\xfe\x00\x00': 'utf-32le',
-                    b'\x00\x00\xfe\xff': 'utf-32be',
-                    b'\xff\xfe': 'utf-16le',
-                    b'\xfe\xff': 'utf-16be',
-                    b'\xef\xbb\xbf': 'utf-8-sig'
-                }
-                for bom, encoding in bom_encodings.items():
-                    if raw_data.startswith(bom):
-                        return raw_data.decode(encoding).strip(), lab_path
-
-                # 第二阶段：使用chardet检测（需要安装）
-                try:
-                    import chardet
-                    detection = chardet.detect(raw_data)
-                    if detection['confidence'] > 0.9:
-                        decoded = raw_data.decode(detection['encoding'])
-                        return decoded.strip(), lab_path
-                except ImportError:
-                    pass
-
-                # 第三阶段：遍历候选编码
-                for encoding in ENCODING_CANDIDATES:
-                    try:
-                        decoded = raw_data.decode(encoding, errors='strict')
-                        # 验证有效性：检查是否存在异常控制字符
-                        if any(0x0 <= ord(c) < 0x20 and ord(c) not in (0x09, 0x0A, 0x0D) for c in decoded):
-                            continue
-                        return decoded.strip(), lab_path
-                    except UnicodeDecodeError:
-                        continue
-
-                # 最终回退策略
-                return raw_data.decode('utf-8', errors='replace').strip(), lab_path
+            # 第一阶段：检测BOM
+            for bom, encoding in self.BOM_ENCODINGS.items():
+                if raw_data.startswith(bom):
+                    return raw_data.decode(encoding).strip(), lab_path
+
+            # 第二阶段：同一语料来源已检测出的编码, 重新校验, 与当前文件不符时丢弃并重新检测
+            source_dir = self._corpus_source_dir(lab_path)
+            cached_encoding = self.lab_encoding_dict.get(source_dir)
+            if cached_encoding:
+                decoded = self._validate_cached_encoding(raw_data, cached_encoding)
+                if decoded is not None:
+                    return decoded.strip(), lab_path
+                self.lab_encoding_dict.pop(source_dir, None)
+
+            # 第三阶段：使用chardet检测（需要安装）
+            try:
+                import chardet
+                detection = chardet.detect(raw_data)
+                if detection['confidence'] > 0.9:
+                    decoded = raw_data.decode(detection['encoding'])
+                    self._remember_lab_encoding(source_dir, detection['encoding'])
+                    return decoded.strip(), lab_path
+            except ImportError:
+                pass
+
+            # 第四阶段：遍历候选编码
+            for encoding in self.ENCODING_CANDIDATES:
+                decoded = self._decode_lab(raw_data, encoding)
+                if decoded is not None:
+                    self._remember_lab_encoding(source_dir, encoding)
+                    return decoded.strip(), lab_path
+
+            # 最终回退策略
+            return raw_data.decode('utf-8', errors='replace').strip(), lab_path
 
         except Exception as e:
             if self.enable_log_flag:
@@ -203,11 +453,97 @@ class AudioDataStructureGenerator:
             return "", lab_path
 
 
+    def _validate_cached_encoding(self, raw_data, encoding):
+        """
+            功能:
+                    * 校验记录的编码是否适用于当前文件: 严格解码且重新编码后与原始字节一致;
+                      非 UTF-8 的记录遇到可按 UTF-8 解码的非 ASCII 内容时视为不符(同一来源混有 UTF-8 文件)
+            参数:
+                    * raw_data: LAB 文件开头的字节
+                    * encoding: 记录的编码
+            返回值:
+                    * str 解码结果, 不符返回 None
+        """
+        decoded = self._decode_lab(raw_data, encoding)
+        if decoded is None or decoded.encode(encoding) != raw_data:
+            return None
+        if codecs.lookup(encoding).name not in ("utf-8", "utf-8-sig") and not raw_data.isascii() \
+                and self._decode_lab(raw_data, "utf-8") is not None:
+            return None
+        return decoded
+
+
+    def _remember_lab_encoding(self, source_dir, encoding):
+        """
+            功能:
+                    * 记录语料来源目录的 LAB 编码; 几乎任何字节都能解码成功的编码不记录, 避免误用到后续文件
+        """
+        if encoding and encoding.lower() not in self.AMBIGUOUS_ENCODINGS:
+            self.lab_encoding_dict[source_dir] = encoding
+
+
     
-    def get_file_md5(self, file_path, chunk_size=4096):
+    def _compute_file_md5(self, file_path, chunk_size=None):
+        """
+            功能:
+                    * 大块读取计算文件的 MD5, 复用同一块缓冲区
+                    * hashlib 处理大块数据时会释放 GIL, 可以多线程并发
+            参数:
+                    * file_path (str): 待计算的文件路径
+                    * chunk_size (int): 每次读取的文件块大小 (单位: 字节)
+            返回:
+                    * str: 16进制格式的MD5字符串 (全小写)
+        """
+        md5_hash = hashlib.md5()
+        buf = bytearray(chunk_size or self.MD5_CHUNK_SIZE)
+        view = memoryview(buf)
+        try:
+            with open(file_path, "rb", buffering=0) as f:
+                while True:
+                    size = f.readinto(buf)
+                    if not size:
+                        break
+                    md5_hash.update(view[:size])
+        except IOError as e:
+            raise IOError(f"无法读取文件: {file_path} ({str(e)})")
+        return md5_hash.hexdigest()
+
+
+    def _md5_memo_key(self, file_path, st):
+        return (os.path.abspath(file_path), st.st_size, st.st_mtime_ns, st.st_ino)
+
+
+    def _lookup_md5(self, file_path):
+        """
+            功能:
+                    * 依次查询内存记录与元数据缓存
+            返回:
+                    * tuple (记录键, os.stat 结果, MD5/None)
+        """
+        if not os.path.isfile(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        st = os.stat(file_path)
+        memo_key = self._md5_memo_key(file_path, st)
+        md5 = self.md5_memo_dict.get(memo_key)
+        if md5 is None and self.cache is not None:
+            md5 = self.cache.getMd5(file_path, st)
+            if md5 is not None:
+                self.md5_memo_dict[memo_key] = md5
+        return memo_key, st, md5
+
+
+    def _save_md5(self, file_path, memo_key, st, md5):
+        self.md5_memo_dict[memo_key] = md5
+        if self.cache is not None:
+            self.cache.putMd5(file_path, md5, st)
+
+
+    def get_file_md5(self, file_path, chunk_size=None):
         """
             功能:
                     * 计算文件的 MD5 哈希值
+                    * 按 (路径, 大小, 修改时间, inode) 记录结果, 同一文件只计算一次;
+                      设置了元数据缓存(self.cache)时跨次运行复用, 例如先预览再执行
             
             参数:
                     * file_path (str): 待计算的文件路径
@@ -220,34 +556,52 @@ class AudioDataStructureGenerator:
                 FileNotFoundError: 当文件不存在时抛出
                 IOError: 当文件读取失败时抛出
         """
-        # 校验文件是否存在
-        if not os.path.isfile(file_path):
-            raise FileNotFoundError(f"文件不存在: {file_path}")
-        
-        # 初始化MD5对象
-        md5_hash = hashlib.md5()
-        
-        try:
-            # 以二进制模式打开文件
-            with open(file_path, "rb") as f:
-                # 分块读取文件内容并更新哈希值
-                while chunk := f.read(chunk_size):
-                    md5_hash.update(chunk)
-        except IOError as e:
-            raise IOError(f"无法读取文件: {file_path} ({str(e)})")
-        
-        # 返回16进制字符串
-        return md5_hash.hexdigest()
+        memo_key, st, md5 = self._lookup_md5(file_path)
+        if md5 is None:
+            md5 = self._compute_file_md5(file_path, chunk_size)
+            self._save_md5(file_path, memo_key, st, md5)
+        return md5
 
 
+    def prefetch_file_md5(self, file_path_list, max_workers=8):
+        """
+            功能:
+                    * 多线程并发计算一批文件的 MD5, 结果写入记录, 之后 get_file_md5 直接命中
+            参数:
+                    * file_path_list: 文件路径列表
+                    * max_workers: 并发线程数
+            返回:
+                    * /
+        """
+        miss_list = []
+        for file_path in file_path_list:
+            try:
+                memo_key, st, md5 = self._lookup_md5(file_path)
+            except (OSError, IOError):
+                #不存在/无法读取的文件留给 get_file_md5 报错
+                continue
+            if md5 is None:
+                miss_list.append((file_path, memo_key, st))
+        if not miss_list:
+            return
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            future_list = [executor.submit(self._compute_file_md5, file_path) for file_path, _, _ in miss_list]
+            for (file_path, memo_key, st), future in zip(miss_list, future_list):
+                try:
+                    self._save_md5(file_path, memo_key, st, future.result())
+                except IOError as e:
+                    self.logger.log(f"[AudioDataStructureGenerator]: 警告！ {e}", "warning")
 
 
-    def get_keywords_info(self, input_audio_path, output_audio_path):
+
+
+    def get_keywords_info(self, input_audio_path, output_audio_path, file_md5=None):
         """
             功能：
                     * 获取必须得关键字信息
             参数:
                     * wav 音频文件路径 input_audio_path,
+                    * 文件 MD5 file_md5, None 为计算输入文件的 MD5(流水线输出的是处理后的音频, 由调用方给出)
             返回值:
                     * 关键字信息 keywords_info_dict
         """
@@ -288,10 +642,10 @@ class AudioDataStructureGenerator:
             self.logger.log(f"[AudioDataStructureGenerator]: 错误！ 未找 {input_audio_path} 文件的指令信息，跳过", "error")
             return False
 
-        keywords_info_dict["指令词"] = self.ToLargeCamel(self.chinese_characters_to_pinyin(lab_content[0]))
+        keywords_info_dict["指令词"] = self.command_name_cache(lab_content[0])
 
         #2、获取文件MD5
-        keywords_info_dict["MD5"] = self.get_file_md5(input_audio_path)
+        keywords_info_dict["MD5"] = file_md5 or self.get_file_md5(input_audio_path)
 
         #3、获取语料来源
         try:
@@ -307,23 +661,15 @@ class AudioDataStructureGenerator:
         #4、猜测地区
         if not self.is_chinese_present(lab_content[0]):
             #不包含中文(可以定义非中国)
-            output_dir = os.path.join(output_audio_path, self.ToLargeCamel(lab_content[0]).replace("_", ""), keywords_info_dict["语料来源"], "欧美")
+            output_dir = os.path.join(output_audio_path, self.field_cache(lab_content[0]), keywords_info_dict["语料来源"], "欧美")
             keywords_info_dict["地区"] = "yingguo"
             keywords_info_dict["口音"] = "English"
         else:
-            output_dir = os.path.join(output_audio_path, self.ToLargeCamel(lab_content[0]).replace("_", ""), keywords_info_dict["语料来源"], "中国")
+            output_dir = os.path.join(output_audio_path, self.field_cache(lab_content[0]), keywords_info_dict["语料来源"], "中国")
 
 
-        #5、其他信息
-        for info_content in self.info_keywords_dict:
-            try:
-                for key in self.info_keywords_dict[info_content]:
-                    for keyword in self.info_keywords_dict[info_content][key]:
-                        if re.findall(keyword, input_audio_path, re.I):
-                            keywords_info_dict[info_content] = key
-                            break
-            except:
-                self.logger.log(f"[AudioDataStructureGenerator]: 警告！ 未找到 {input_audio_path} 文件的 {info_content} 信息", "warning")
+        #5、其他信息(含地区关键字), 单次扫描完成全部类别的匹配
+        keywords_info_dict.update(self.classify_path(input_audio_path))
 
         #获取人员编号
         try:
@@ -333,7 +679,7 @@ class AudioDataStructureGenerator:
 
         for key in keywords_info_dict:
             #去除下划线
-            keywords_info_dict[key] = self.ToLargeCamel(keywords_info_dict[key]).replace("_", "")
+            keywords_info_dict[key] = self.field_cache(keywords_info_dict[key])
 
 
         filename = f'{keywords_info_dict["地区"]}_{keywords_info_dict["口音"]}_{keywords_info_dict["语速"]}'
@@ -342,8 +688,8 @@ class AudioDataStructureGenerator:
         if len(filename.split("_")) != 9:
             self.logger.log(f"[AudioDataStructureGenerator]: 错误！ {input_audio_path} 文件的结构化后 {filename} 格式错误", "error")
         new_audio_path = os.path.join(output_dir, filename)
-        self.logger.log(f"[AudioDataStructureGenerator]: 路径信息解析成功: {keywords_info_dict}", "debug")
-        self.logger.log(f"[AudioDataStructureGenerator]: 新路径信息: {new_audio_path}", "debug")
+        self.logger.log("[AudioDataStructureGenerator]: 路径信息解析成功: %s", "debug", keywords_info_dict)
+        self.logger.log("[AudioDataStructureGenerator]: 新路径信息: %s", "debug", new_audio_path)
         return new_audio_path
 
 
@@ -365,13 +711,17 @@ class AudioDataStructureGenerator:
             self.logger.log(f"[AudioDataStructureGenerator]: 预览! 处理前: {input_audio_path}", "info")
             self.logger.log(f"[AudioDataStructureGenerator]: 预览! 处理后: {new_audio_path}", "info")
         else:
-            self.logger.log(f"[AudioDataStructureGenerator]: 执行! 处理前: {input_audio_path}", "debug")
-            self.logger.log(f"[AudioDataStructureGenerator]: 执行! 处理后: {new_audio_path}", "debug")
+            self.logger.log("[AudioDataStructureGenerator]: 执行! 处理前: %s", "debug", input_audio_path)
+            self.logger.log("[AudioDataStructureGenerator]: 执行! 处理后: %s", "debug", new_audio_path)
             os.makedirs(os.path.dirname(new_audio_path), exist_ok=True)
             try:
                 #整理文件
+                md5 = self.get_file_md5(input_audio_path)
                 shutil.move(input_audio_path, new_audio_path)
-                self.logger.log(f"[AudioDataStructureGenerator]: 执行! {input_audio_path} 移动到 {new_audio_path} 成功", "debug")
+                if self.cache is not None:
+                    #移动不改变内容与修改时间, 新路径直接记录 MD5, 再次入库时无需重算
+                    self.cache.putMd5(new_audio_path, md5)
+                self.logger.log("[AudioDataStructureGenerator]: 执行! %s 移动到 %s 成功", "debug", input_audio_path, new_audio_path)
             except:
                 self.logger.log(f"[AudioDataStructureGenerator]: 错误! 执行! {input_audio_path} 移动到 {new_audio_path} 成功", "error")
                 return False
@@ -0,0 +1,294 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, threading
+import numpy as np
+import soundfile as sf
+
+try:
+    from modules.debugLogger import DebugLogger
+    from modules.audioBasicProcessing import AudioBasicProcessing
+    from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+    from modules.audioBasicProcessing import AudioBasicProcessing
+    from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+
+__version__="1.0.0"
+
+
+class _OffsetFile:
+    """ 从 offset 开始的只读文件视图, 供 soundfile 读取无头的原始数据"""
+    def __init__(self, f, offset):
+        self.f = f
+        self.offset = offset
+        f.seek(offset)
+
+    def seek(self, pos, whence=os.SEEK_SET):
+        if whence == os.SEEK_SET:
+            pos += self.offset
+        return self.f.seek(pos, whence) - self.offset
+
+    def tell(self):
+        return self.f.tell() - self.offset
+
+    def read(self, size=-1):
+        return self.f.read(size)
+
+    def readinto(self, buf):
+        return self.f.readinto(buf)
+
+
+class AudioPipeline:
+    """ 这是一个多步骤处理流水线: 每个文件只读一次, 各步骤在内存中依次处理, 最后只写一次"""
+
+    #读取类步骤, 只能作为第一步
+    SOURCE_STAGES = ["wavHeadRepair", "pcmToWav", "mp3ToWav"]
+    #内存处理步骤
+    TRANSFORM_STAGES = ["getMono", "audioNorm"]
+    #决定输出位置的步骤, 只能作为最后一步
+    SINK_STAGES = ["structuredAudio"]
+    #原始数据位宽(bit) -> soundfile 编码, 8bit wav 为无符号数
+    RAW_SUBTYPE_DICT = {8: "PCM_U8", 16: "PCM_16", 24: "PCM_24", 32: "PCM_32"}
+    #估算 mp3 解码后大小时的膨胀倍数(128kbps -> 44.1kHz 16bit 双声道约 11 倍)
+    MP3_EXPAND_RATIO = 12
+    #结构化输出的文件名含输出音频的 MD5, 写出前先以占位符代替
+    PENDING_MD5 = "md5pending"
+
+    def __init__(self, output_root_path, logger=None, basic_processing=None, structure_generator=None):
+        """
+            参数:
+                    * output_root_path: 处理结果输出目录
+                    * logger: 日志记录器
+                    * basic_processing: 复用调用方已创建的 AudioBasicProcessing
+                    * structure_generator: 复用调用方已创建的 AudioDataStructureGenerator
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        self.output_root_path = output_root_path
+        self.AudioBasicProcessing = basic_processing or AudioBasicProcessing(self.logger)
+        self.AudioDataStructureGenerator = structure_generator or AudioDataStructureGenerator(self.logger)
+
+    @classmethod
+    def validate(cls, stage_list):
+        """
+            功能:
+                    * 检查步骤组合是否可以串联
+            参数:
+                    * list 步骤列表 stage_list
+            返回值:
+                    * str 错误信息, 合法时返回 None
+        """
+        chain_stage_list = cls.SOURCE_STAGES + cls.TRANSFORM_STAGES + cls.SINK_STAGES
+        for index, stage in enumerate(stage_list):
+            if stage not in chain_stage_list:
+                return f"{stage} 不支持串联，可串联功能: {', '.join(chain_stage_list)}"
+            if stage in cls.SOURCE_STAGES and index != 0:
+                return f"{stage} 只能作为第一步"
+            if stage in cls.SINK_STAGES and index != len(stage_list) - 1:
+                return f"{stage} 只能作为最后一步"
+        if len(set(stage_list)) != len(stage_list):
+            return "同一功能不能重复出现"
+        return None
+
+    @classmethod
+    def validate_paras(cls, para_dict):
+        """
+            功能:
+                    * 检查各步骤参数, 流水线每个文件只有一个输出
+            参数:
+                    * dict 步骤 -> 参数 para_dict
+            返回值:
+                    * str 错误信息, 合法时返回 None
+        """
+        if "getMono" in para_dict:
+            try:
+                target_list = AudioBasicProcessing.parse_mono_spec(para_dict["getMono"])
+            except ValueError as e:
+                return str(e)
+            if len(target_list) != 1 or target_list[0] == "all":
+                return "流水线中 getMono 只能输出一个通道(通道索引、mean 或 mix=权重:...)"
+        return None
+
+    def input_regular(self, stage_list):
+        """
+            功能:
+                    * 根据第一步确定输入文件的匹配规则
+        """
+        if stage_list[0] == "pcmToWav":
+            return ".pcm$"
+        if stage_list[0] == "mp3ToWav":
+            return ".mp3$"
+        return ".wav$"
+
+    def _read_raw(self, input_audio_path, offset, wav_para):
+        """
+            功能:
+                    * 按给定参数读取无头的原始 PCM 数据
+        """
+        channels, framerate, sampwidth = self.AudioBasicProcessing._parse_wav_para(wav_para)
+        frame_size = channels * sampwidth
+        subtype = self.RAW_SUBTYPE_DICT[sampwidth * 8]
+        with open(input_audio_path, "rb") as f:
+            data_size = os.fstat(f.fileno()).st_size - offset
+            #soundfile 按文件对象的起点定位, 用从 offset 开始的视图打开, 音频数据直接读入结果数组
+            with sf.SoundFile(_OffsetFile(f, offset), "r", format="RAW", samplerate=framerate, channels=channels,
+                              subtype=subtype, endian="LITTLE") as fin:
+                sig = fin.read(frames=data_size // frame_size, dtype=self.AudioBasicProcessing.native_dtype(subtype),
+                               always_2d=True)
+        return sig, framerate, subtype
+
+    def estimate_size(self, input_audio_path, stage_list, para_dict):
+        """
+            功能:
+                    * 估算输入音频读入内存后的字节数, 只读头部
+            返回值:
+                    * int 字节数
+        """
+        first_stage = stage_list[0]
+        if first_stage in ["wavHeadRepair", "pcmToWav"]:
+            #8bit 原始数据读为 int16, 最多膨胀一倍
+            return 2 * os.path.getsize(input_audio_path)
+        if first_stage == "mp3ToWav":
+            return self.MP3_EXPAND_RATIO * os.path.getsize(input_audio_path)
+        with sf.SoundFile(input_audio_path) as fin:
+            itemsize = np.dtype(self.AudioBasicProcessing.native_dtype(fin.subtype)).itemsize
+            return fin.frames * fin.channels * itemsize
+
+    def read(self, input_audio_path, stage_list, para_dict):
+        """
+            功能:
+                    * 按原生数据类型读取输入音频为二维数据(帧数 x 通道数)
+            参数:
+                    * input_audio_path: 输入音频路径
+                    * stage_list: 步骤列表
+                    * para_dict: 步骤 -> 参数
+            返回值:
+                    * tuple (音频数据, 采样率, 输入编码)
+        """
+        first_stage = stage_list[0]
+        if first_stage == "wavHeadRepair":
+            #与 wavHeadRepair 一致, 头部可解析时从 data 块读到文件末尾, 已损坏/清零时前 44 字节视为头
+            head = self.AudioBasicProcessing.repair_head(input_audio_path)
+            return self._read_raw(input_audio_path, head["DataOffset"] if head else 44, para_dict.get(first_stage))
+        if first_stage == "pcmToWav":
+            return self._read_raw(input_audio_path, 0, para_dict.get(first_stage))
+        if first_stage == "mp3ToWav":
+            from pydub import AudioSegment
+            song = AudioSegment.from_mp3(input_audio_path)
+            subtype = self.RAW_SUBTYPE_DICT[song.sample_width * 8]
+            sig = np.array(song.get_array_of_samples()).reshape(-1, song.channels)
+            return sig.astype(self.AudioBasicProcessing.native_dtype(subtype), copy=False), song.frame_rate, subtype
+        with sf.SoundFile(input_audio_path) as fin:
+            sig = fin.read(dtype=self.AudioBasicProcessing.native_dtype(fin.subtype), always_2d=True)
+            return sig, fin.samplerate, fin.subtype
+
+    def transform(self, sig, stage_list, para_dict):
+        """
+            功能:
+                    * 在内存中依次执行 getMono/audioNorm 等步骤
+            参数:
+                    * sig: 二维音频数据
+                    * stage_list: 步骤列表
+                    * para_dict: 步骤 -> 参数
+            返回值:
+                    * 二维音频数据
+        """
+        for stage in stage_list:
+            if stage == "getMono":
+                target = self.AudioBasicProcessing.parse_mono_spec(para_dict.get(stage, 0))[0]
+                if isinstance(target, tuple) and len(target) != sig.shape[1]:
+                    raise ValueError(f"混合权重个数 {len(target)} 与通道数 {sig.shape[1]} 不一致")
+                sig = self.AudioBasicProcessing._mono_block(sig, target)[:, np.newaxis]
+            elif stage == "audioNorm":
+                channel = self.AudioBasicProcessing.parse_channel(self.AudioBasicProcessing.norm_channel)
+                sig = self.AudioBasicProcessing._select_channel(sig, channel)[:, np.newaxis]
+                peak = self.AudioBasicProcessing._peak(sig)
+                if not peak:
+                    raise ValueError("静音音频, 无法归一化")
+                sig = self.AudioBasicProcessing._scale(sig, float(para_dict.get(stage, 1)) / peak)
+        return sig
+
+    def output_path(self, input_audio_path, output_audio_path, stage_list):
+        """
+            功能:
+                    * 确定最终输出路径, 含 structuredAudio 时为结构化后的路径
+            返回值:
+                    * str 输出路径, 无法确定时返回 None
+        """
+        if stage_list[-1] == "structuredAudio":
+            #文件名中的 MD5 在 write 中按处理后的音频计算, 与分步执行 structuredAudio 的结果一致
+            return self.AudioDataStructureGenerator.get_keywords_info(input_audio_path, self.output_root_path,
+                                                                      self.PENDING_MD5) or None
+        if stage_list[0] in ["pcmToWav", "mp3ToWav"]:
+            output_audio_path = self.AudioBasicProcessing.wav_output_path(output_audio_path)
+        return output_audio_path
+
+    def write(self, sig, fs, subtype, final_output_path):
+        """
+            功能:
+                    * 原子写出处理结果, 编码与输入一致(或为指定编码)
+                    * 结构化输出先写临时文件, 按其内容计算 MD5 后再改名为最终文件名
+            参数:
+                    * sig: 二维音频数据
+                    * fs: 采样率
+                    * subtype: 输入编码
+                    * final_output_path: 输出路径, 由 output_path 得到
+            返回值:
+                    * str 实际输出路径
+        """
+        output_dir, output_name = os.path.split(final_output_path)
+        os.makedirs(output_dir or ".", exist_ok=True)
+        pending_md5 = self.AudioDataStructureGenerator.field_cache(self.PENDING_MD5)
+        if pending_md5 in output_name:
+            temp_path = os.path.join(output_dir, f".{pending_md5}.{os.getpid()}.{threading.get_ident()}.tmp.wav")
+            try:
+                self._write_file(temp_path, sig, fs, subtype)
+                md5 = self.AudioDataStructureGenerator._compute_file_md5(temp_path)
+                final_output_path = os.path.join(output_dir, output_name.replace(
+                    pending_md5, self.AudioDataStructureGenerator.field_cache(md5)))
+                os.replace(temp_path, final_output_path)
+            finally:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+            return final_output_path
+        with self.AudioBasicProcessing.atomic_output(final_output_path) as temp_path:
+            self._write_file(temp_path, sig, fs, subtype)
+        return final_output_path
+
+    def _write_file(self, file_path, sig, fs, subtype):
+        subtype = self.AudioBasicProcessing.output_subtype(subtype)
+        sig = self.AudioBasicProcessing._output_data(sig[:, 0] if sig.shape[1] == 1 else sig, subtype)
+        sf.write(file_path, sig, fs, subtype=subtype)
+
+    def run(self, input_audio_path, output_audio_path, fill_para=None):
+        """
+            功能:
+                    * 对单个文件执行整条流水线
+            参数:
+                    * input_audio_path: 输入音频路径
+                    * output_audio_path: 镜像输出路径(输出目录/输入路径)
+                    * fill_para: dict {"stages": 步骤列表, "paras": 步骤 -> 参数}
+            返回值:
+                    * bool True/False
+        """
+        stage_list = fill_para["stages"]
+        para_dict = fill_para.get("paras", {})
+        stage_str = ",".join(stage_list)
+        try:
+            final_output_path = self.output_path(input_audio_path, output_audio_path, stage_list)
+            if not final_output_path:
+                return False
+            sig, fs, subtype = self.read(input_audio_path, stage_list, para_dict)
+            sig = self.transform(sig, stage_list, para_dict)
+            final_output_path = self.write(sig, fs, subtype, final_output_path)
+            self.logger.log("[AudioPipeline]: %s %s 处理成功，新文件 %s", "debug", input_audio_path, stage_str, final_output_path)
+            return True
+        except Exception as e:
+            self.logger.log(f"[AudioPipeline]: 错误! {input_audio_path} {stage_str} 处理失败，因 {e}", "error")
+            return False
+
+if __name__=="__main__":
+    pass
@@ -0,0 +1,167 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, sqlite3, threading, json, hashlib, time
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+class BuildManifest:
+    """ 这是一个输出目录的处理记录, 用于增量处理时跳过已是最新的输出"""
+
+    #默认记录文件名, 放在输出目录下
+    MANIFEST_FILE_NAME = ".audioForgeXS_manifest.sqlite"
+    #每写入多少条记录提交一次, 中断后已提交的记录仍然有效
+    COMMIT_INTERVAL = 256
+    #距上次提交超过该秒数时也提交, 处理较慢时被强制结束也只丢失最近几秒的记录
+    COMMIT_SECONDS = 5
+
+    def __init__(self, manifest_path, logger=None, fallback_path=None):
+        """
+            功能:
+                    * 打开(不存在则创建)处理记录
+            参数:
+                    * manifest_path: 记录文件路径, 为目录时使用目录下的默认文件名
+                    * logger: 日志记录器
+                    * fallback_path: 只读的后备记录(如分片运行时的总记录), 本记录中没有的输入再到后备记录中查找
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        if os.path.isdir(manifest_path):
+            manifest_path = os.path.join(manifest_path, self.MANIFEST_FILE_NAME)
+        manifest_dir = os.path.dirname(manifest_path)
+        if manifest_dir:
+            os.makedirs(manifest_dir, exist_ok=True)
+        self.manifest_path = manifest_path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(manifest_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS outputs (
+                                input_path TEXT, process_type TEXT, input_size INTEGER, input_mtime_ns INTEGER,
+                                signature TEXT, output_list TEXT, PRIMARY KEY (input_path, process_type))""")
+        self.conn.commit()
+        self.has_fallback = False
+        if fallback_path and os.path.isfile(fallback_path):
+            self.conn.execute("ATTACH DATABASE ? AS fallback", (fallback_path,))
+            self.has_fallback = True
+        self.pending_num = 0
+        self.commit_time = time.monotonic()
+        self.skip_count = 0
+        self.logger.log(f"[BuildManifest]: 调试! 打开处理记录 {manifest_path}", "debug")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+    @staticmethod
+    def signature(*para_list):
+        """
+            功能:
+                    * 计算处理参数的签名, 参数变化时签名变化
+            参数:
+                    * para_list: 功能名称、功能参数及影响输出的设置
+            返回值:
+                    * str 签名
+        """
+        para_str = json.dumps(para_list, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.md5(para_str.encode("utf-8")).hexdigest()
+
+    def isUpToDate(self, input_path, process_type, signature, output_path_list):
+        """
+            功能:
+                    * 判断输出是否已是最新: 有记录、输入大小/修改时间未变、参数签名一致、全部输出存在且不早于输入
+            参数:
+                    * input_path: 输入文件路径
+                    * process_type: 功能名称
+                    * signature: 参数签名
+                    * output_path_list: 输出文件路径列表
+            返回值:
+                    * bool True/False
+        """
+        try:
+            st = os.stat(input_path)
+        except OSError:
+            return False
+        with self.lock:
+            row = None
+            for table in ["outputs", "fallback.outputs"] if self.has_fallback else ["outputs"]:
+                row = self.conn.execute(f"""SELECT input_size, input_mtime_ns, signature, output_list FROM {table}
+                                            WHERE input_path = ? AND process_type = ?""",
+                                        (os.path.abspath(input_path), process_type)).fetchone()
+                if row is not None:
+                    break
+        if row is None or row[0] != st.st_size or row[1] != st.st_mtime_ns or row[2] != signature:
+            return False
+        if json.loads(row[3]) != [os.path.abspath(path) for path in output_path_list]:
+            return False
+        for output_path in output_path_list:
+            try:
+                if os.stat(output_path).st_mtime_ns < st.st_mtime_ns:
+                    return False
+            except OSError:
+                return False
+        self.skip_count += 1
+        return True
+
+    def putOutputs(self, input_path, process_type, signature, output_path_list):
+        """
+            功能:
+                    * 记录一次成功的处理
+            参数:
+                    * 同 isUpToDate
+        """
+        st = os.stat(input_path)
+        output_str = json.dumps([os.path.abspath(path) for path in output_path_list], ensure_ascii=False)
+        with self.lock:
+            self.conn.execute("INSERT OR REPLACE INTO outputs VALUES (?, ?, ?, ?, ?, ?)",
+                              (os.path.abspath(input_path), process_type, st.st_size, st.st_mtime_ns, signature, output_str))
+            self.pending_num += 1
+            if self.pending_num >= self.COMMIT_INTERVAL or time.monotonic() - self.commit_time >= self.COMMIT_SECONDS:
+                self.conn.commit()
+                self.pending_num = 0
+                self.commit_time = time.monotonic()
+
+    def merge(self, manifest_path_list):
+        """
+            功能:
+                    * 把其他处理记录(如各分片的记录)并入本记录, 同一输入以后并入的为准
+            参数:
+                    * manifest_path_list: 记录文件路径列表
+            返回值:
+                    * int 并入的记录数
+        """
+        merge_num = 0
+        with self.lock:
+            self.conn.commit()
+            for manifest_path in manifest_path_list:
+                self.conn.execute("ATTACH DATABASE ? AS other", (manifest_path,))
+                try:
+                    cursor = self.conn.execute("INSERT OR REPLACE INTO outputs SELECT * FROM other.outputs")
+                    merge_num += cursor.rowcount
+                    self.conn.commit()
+                finally:
+                    self.conn.execute("DETACH DATABASE other")
+        self.logger.log(f"[BuildManifest]: 提示! 已并入 {len(manifest_path_list)} 个处理记录共 {merge_num} 条", "info")
+        return merge_num
+
+
+if __name__=="__main__":
+    pass
@@ -0,0 +1,224 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, re, json, random
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+class CorpusIndex:
+    """ 这是一个测试集语料的索引, 一次遍历得到 指令 -> 人编号 -> 音频 及性别/年龄段/采集距离"""
+
+    #默认索引文件名, 放在输出目录下
+    INDEX_FILE_NAME = ".audioForgeXS_corpus_index.json"
+    INDEX_VERSION = 1
+    WAV_PATTERN = re.compile(r"\.wav$", re.I)
+    SWP_PATTERN = re.compile(r"\.swp$")
+    #结构化文件名 地区_口音_语速_采集距离_性别_年龄段_人编号_指令词_01+MD5+<md5> 中属性字段的位置
+    NAME_FIELD_NUM = 9
+    DISTANCE_FIELD_INDEX = 3
+    GENDER_FIELD_INDEX = 4
+    AGE_FIELD_INDEX = 5
+    #文件名中人编号为倒数第三段
+    SPEAKER_FIELD_INDEX = -3
+    NULL_VALUE = "NULL"
+
+    def __init__(self, logger=None):
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        self.root_path = None
+        #相对目录 -> 修改时间(ns), 用于判断索引是否过期
+        self.dir_mtime_dict = {}
+        #指令 -> 人编号 -> [[相对指令目录的路径, 性别, 年龄段, 采集距离], ...]
+        self.command_dict = {}
+
+    @classmethod
+    def parse_name(cls, file_name):
+        """
+            功能:
+                    * 从文件名解析人编号、性别、年龄段、采集距离, 非结构化文件名的属性为 NULL
+            返回值:
+                    * tuple (人编号, 性别, 年龄段, 采集距离)
+        """
+        field_list = os.path.splitext(file_name)[0].split("_")
+        speaker = field_list[cls.SPEAKER_FIELD_INDEX] if len(field_list) >= 3 else cls.NULL_VALUE
+        if len(field_list) != cls.NAME_FIELD_NUM:
+            return speaker, cls.NULL_VALUE, cls.NULL_VALUE, cls.NULL_VALUE
+        return (speaker, field_list[cls.GENDER_FIELD_INDEX], field_list[cls.AGE_FIELD_INDEX],
+                field_list[cls.DISTANCE_FIELD_INDEX])
+
+    def build(self, root_path, command_filter=None):
+        """
+            功能:
+                    * 遍历一次语料根目录建立索引, 根目录下的一级目录为指令
+            参数:
+                    * root_path: 语料根目录
+                    * command_filter: 指令名 -> bool, 只遍历返回 True 的指令目录(分片运行时使用), None 为全部
+            返回值:
+                    * int 音频总数
+        """
+        self.root_path = os.path.abspath(root_path)
+        self.dir_mtime_dict = {}
+        self.command_dict = {}
+        file_num = 0
+        #(绝对路径, 相对根目录的路径)
+        dir_stack = [(self.root_path, "")]
+        while dir_stack:
+            dir_path, rel_dir = dir_stack.pop()
+            try:
+                self.dir_mtime_dict[rel_dir] = os.stat(dir_path).st_mtime_ns
+                entry_list = sorted(os.scandir(dir_path), key=lambda entry: entry.name)
+            except OSError as e:
+                self.logger.log(f"[CorpusIndex]: 警告! 无法读取目录 {dir_path}, 因 {e}", "warning")
+                continue
+            for entry in entry_list:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir():
+                    if rel_dir or command_filter is None or command_filter(entry.name):
+                        dir_stack.append((entry.path, rel_path))
+                    continue
+                #根目录下的文件不属于任何指令
+                if not rel_dir or not self.WAV_PATTERN.search(entry.name) or self.SWP_PATTERN.search(entry.name):
+                    continue
+                command, command_rel_path = rel_path.split("/", 1)
+                speaker, gender, age, distance = self.parse_name(entry.name)
+                speaker_dict = self.command_dict.setdefault(command, {})
+                speaker_dict.setdefault(speaker, []).append([command_rel_path, gender, age, distance])
+                file_num += 1
+        self.logger.log(f"[CorpusIndex]: 提示! 已索引 {root_path} 下 {len(self.command_dict)} 条指令 {file_num} 条音频", "info")
+        return file_num
+
+    def save(self, index_path):
+        index_dir = os.path.dirname(index_path)
+        if index_dir:
+            os.makedirs(index_dir, exist_ok=True)
+        temp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": self.INDEX_VERSION, "root": self.root_path, "dirs": self.dir_mtime_dict,
+                       "commands": self.command_dict}, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(temp_path, index_path)
+
+    def load(self, index_path, root_path):
+        """
+            功能:
+                    * 读取索引, 根目录不同、版本不同或任一目录有变化(新增/删除文件或子目录)时视为过期
+            返回值:
+                    * bool 是否读取到有效索引
+        """
+        try:
+            with open(index_path, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get("version") != self.INDEX_VERSION or index.get("root") != os.path.abspath(root_path):
+            return False
+        for rel_dir, mtime_ns in index["dirs"].items():
+            try:
+                if os.stat(os.path.join(index["root"], rel_dir)).st_mtime_ns != mtime_ns:
+                    return False
+            except OSError:
+                return False
+        self.root_path = index["root"]
+        self.dir_mtime_dict = index["dirs"]
+        self.command_dict = index["commands"]
+        return True
+
+    def load_or_build(self, root_path, index_path, rebuild=False, command_filter=None):
+        """
+            功能:
+                    * 有效索引直接读取, 否则重新遍历并保存
+            参数:
+                    * root_path: 语料根目录
+                    * index_path: 索引文件路径(使用 command_filter 时每种过滤需各自的文件)
+                    * rebuild: 是否强制重新遍历
+                    * command_filter: 见 build
+        """
+        if not rebuild and self.load(index_path, root_path):
+            self.logger.log(f"[CorpusIndex]: 提示! 使用已有索引 {index_path}，共 {len(self.command_dict)} 条指令", "info")
+            return
+        self.build(root_path, command_filter)
+        try:
+            self.save(index_path)
+        except OSError as e:
+            self.logger.log(f"[CorpusIndex]: 警告! 索引 {index_path} 保存失败: {e}", "warning")
+
+    @staticmethod
+    def compile_patterns(pattern_list):
+        """
+            功能:
+                    * 编译 仅选定/排除 的正则表达式
+            异常:
+                    * re.error: 正则表达式错误
+        """
+        return [re.compile(pattern) for pattern in pattern_list or []]
+
+    def select(self, command, command_path, seed=0, only_pattern_list=None, non_pattern_list=None, kept_path_set=None):
+        """
+            功能:
+                    * 按人编号分层轮询, 返回该指令全部候选音频的选取顺序
+                    * 人编号按 性别/年龄段/采集距离 分层后交替排列, 每轮从每个人取一条
+                    * 每个人、每层各自按种子打乱, 语料新增人或音频时已有人的顺序不变
+            参数:
+                    * command: 指令目录名
+                    * command_path: 指令目录路径(与遍历该目录得到的路径前缀一致)
+                    * seed: 随机种子
+                    * only_pattern_list: 仅选定, 路径需匹配全部正则
+                    * non_pattern_list: 排除, 路径匹配任一正则即排除
+                    * kept_path_set: 已选中的音频, 不再返回, 并计入其所属人已取的轮数(增量补足时使用)
+            返回值:
+                    * tuple (候选音频路径列表, 被排除的音频路径列表)
+        """
+        only_pattern_list = only_pattern_list or []
+        non_pattern_list = non_pattern_list or []
+        kept_path_set = kept_path_set or set()
+        stratum_dict = {}
+        excluded_list = []
+        for speaker in sorted(self.command_dict.get(command, {})):
+            path_list = []
+            kept_num = 0
+            for command_rel_path, gender, age, distance in self.command_dict[command][speaker]:
+                path = os.path.join(command_path, *command_rel_path.split("/"))
+                if not all(pattern.search(path) for pattern in only_pattern_list):
+                    continue
+                if any(pattern.search(path) for pattern in non_pattern_list):
+                    excluded_list.append(path)
+                    continue
+                if path in kept_path_set:
+                    kept_num += 1
+                    continue
+                path_list.append(path)
+            if not path_list and not kept_num:
+                continue
+            path_list.sort()
+            random.Random(f"{seed}:{command}:{speaker}").shuffle(path_list)
+            #人的分层属性取其第一条音频
+            stratum = tuple(self.command_dict[command][speaker][0][1:])
+            stratum_dict.setdefault(stratum, []).append((speaker, kept_num, path_list))
+
+        #各层内人的顺序随机, 再在各层之间交替
+        speaker_order_list = []
+        stratum_list = []
+        for stratum in sorted(stratum_dict):
+            speaker_list = sorted(stratum_dict[stratum], key=lambda item: item[0])
+            random.Random(f"{seed}:{command}:{'/'.join(stratum)}").shuffle(speaker_list)
+            stratum_list.append(speaker_list)
+        for index in range(max((len(speaker_list) for speaker_list in stratum_list), default=0)):
+            speaker_order_list.extend(speaker_list[index] for speaker_list in stratum_list if index < len(speaker_list))
+
+        #第 k 轮取每个人的第 k 条, 已选中的音频占用该人前面的轮次
+        rank_list = []
+        for speaker_index, (_, kept_num, path_list) in enumerate(speaker_order_list):
+            rank_list.extend((kept_num + path_index, speaker_index, path) for path_index, path in enumerate(path_list))
+        rank_list.sort()
+        return [path for _, _, path in rank_list], excluded_list
+
+
+if __name__=="__main__":
+    pass
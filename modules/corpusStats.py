@@ -0,0 +1,291 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, csv, json
+from array import array
+
+try:
+    from modules.debugLogger import DebugLogger
+    from modules.getAudioInfo import DurationSum
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+    from modules.getAudioInfo import DurationSum
+
+__version__="1.0.0"
+
+
+class CorpusStats:
+    """ 这是一个按结构化文件名统计语料条数与时长的类, 字段按类别编码后以列存储"""
+
+    #结构化文件名的字段, 见 AudioDataStructureGenerator.get_keywords_info
+    #   地区_口音_语速_采集距离_性别_年龄段_人编号_指令词_01+MD5+<md5>.wav
+    NAME_FIELD_LIST = ["地区", "口音", "语速", "采集距离", "性别", "年龄段", "人编号", "指令词"]
+    NAME_FIELD_NUM = 9
+    #语料来源取自路径中含 "来源" 的目录
+    SOURCE_FIELD = "语料来源"
+    UNKNOWN_SOURCE = "未知来源"
+    FIELD_LIST = NAME_FIELD_LIST + [SOURCE_FIELD]
+    #命令行使用的字段别名
+    FIELD_ALIAS_DICT = {"region": "地区", "accent": "口音", "speed": "语速", "distance": "采集距离",
+                        "gender": "性别", "age": "年龄段", "speaker": "人编号", "command": "指令词",
+                        "source": "语料来源"}
+    DEFAULT_GROUP_BY = "command,speaker,gender,age,distance,source"
+    REPORT_FILE_NAME = "corpusStats.json"
+
+    def __init__(self, group_by=None, logger=None):
+        """
+            功能:
+                    * 初始化统计列
+            参数:
+                    * group_by: 分组方式, 逗号分隔多个分组, 一个分组内多个字段用 + 连接, 如 "command,command+gender"
+                    * logger: 日志记录器
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        self.group_list = self.parse_group_by(group_by or self.DEFAULT_GROUP_BY)
+        #每个字段一列类别编码, 字段值 -> 编码
+        self.code_column_list = [array("i") for _ in self.FIELD_LIST]
+        self.code_dict_list = [{} for _ in self.FIELD_LIST]
+        #时长以 数据字节数 + 每秒字节数编码 存储, 分组求和为整数, 与处理顺序、分片无关
+        self.size_column = array("q")
+        self.rate_column = array("i")
+        self.rate_code_dict = {}
+        #目录 -> 语料来源编码, 同一目录下的文件只解析一次
+        self.dir_source_dict = {}
+        self.unparsed_num = 0
+        self.unparsed_duration = DurationSum()
+
+    @classmethod
+    def parse_group_by(cls, group_by):
+        """
+            功能:
+                    * 解析分组方式
+            参数:
+                    * group_by: 见 __init__, 字段可用中文名或别名
+            返回值:
+                    * list 每个分组的字段名元组
+            异常:
+                    * ValueError: 字段不存在
+        """
+        group_list = []
+        for group in group_by.split(","):
+            field_list = []
+            for field in group.split("+"):
+                field = cls.FIELD_ALIAS_DICT.get(field.strip(), field.strip())
+                if field not in cls.FIELD_LIST:
+                    raise ValueError(f"统计字段 {field} 不存在，可选: {', '.join(cls.FIELD_ALIAS_DICT)}")
+                field_list.append(field)
+            if tuple(field_list) not in group_list:
+                group_list.append(tuple(field_list))
+        return group_list
+
+    def _code(self, field_index, value):
+        code_dict = self.code_dict_list[field_index]
+        code = code_dict.get(value)
+        if code is None:
+            code = code_dict[value] = len(code_dict)
+        return code
+
+    def _source_code(self, dir_path):
+        code = self.dir_source_dict.get(dir_path)
+        if code is None:
+            source = self.UNKNOWN_SOURCE
+            for dir_name in dir_path.replace("\\", "/").split("/")[::-1]:
+                if "来源" in dir_name:
+                    source = dir_name.strip()
+                    break
+            code = self.dir_source_dict[dir_path] = self._code(len(self.NAME_FIELD_LIST), source)
+        return code
+
+    def add(self, audio_path, data_size, byte_rate):
+        """
+            功能:
+                    * 加入一条音频
+            参数:
+                    * audio_path: 结构化后的音频路径
+                    * data_size: 音频数据字节数
+                    * byte_rate: 每秒字节数, 时长 = data_size / byte_rate
+            返回值:
+                    * bool 文件名是否符合结构化格式, 不符合的只计入总数
+        """
+        dir_path, file_name = os.path.split(audio_path)
+        field_list = os.path.splitext(file_name)[0].split("_")
+        if len(field_list) != self.NAME_FIELD_NUM:
+            self.unparsed_num += 1
+            self.unparsed_duration.add(data_size, byte_rate)
+            return False
+        for field_index in range(len(self.NAME_FIELD_LIST)):
+            self.code_column_list[field_index].append(self._code(field_index, field_list[field_index]))
+        self.code_column_list[-1].append(self._source_code(dir_path))
+        rate_code = self.rate_code_dict.get(byte_rate)
+        if rate_code is None:
+            rate_code = self.rate_code_dict[byte_rate] = len(self.rate_code_dict)
+        self.size_column.append(data_size)
+        self.rate_column.append(rate_code)
+        return True
+
+    def columns(self):
+        """
+            功能:
+                    * 以 numpy 数组返回各列(不拷贝)
+            返回值:
+                    * dict 字段名 -> int32 编码数组, "字节数" -> int64 数组, "每秒字节数" -> int32 编码数组
+        """
+        import numpy as np
+        def to_numpy(column, dtype):
+            return np.frombuffer(column, dtype=dtype) if len(column) else np.zeros(0, dtype)
+        column_dict = {field: to_numpy(column, np.int32) for field, column in zip(self.FIELD_LIST, self.code_column_list)}
+        column_dict["字节数"] = to_numpy(self.size_column, np.int64)
+        column_dict["每秒字节数"] = to_numpy(self.rate_column, np.int32)
+        return column_dict
+
+    def aggregate(self, field_tuple, column_dict=None):
+        """
+            功能:
+                    * 按字段组合分组, 统计每组的条数与各每秒字节数下的数据字节数
+            参数:
+                    * field_tuple: 分组字段
+                    * column_dict: columns 的返回值, 多次分组时复用
+            返回值:
+                    * list [(字段值元组, 条数, DurationSum)], 按字段值排序
+        """
+        import numpy as np
+        column_dict = column_dict or self.columns()
+        field_index_list = [self.FIELD_LIST.index(field) for field in field_tuple]
+        dim_list = [max(1, len(self.code_dict_list[index])) for index in field_index_list]
+        if len(field_tuple) == 1:
+            key = column_dict[field_tuple[0]]
+        else:
+            #多个字段的编码合成一个键, 只对出现过的组合计数
+            key = np.ravel_multi_index([column_dict[field] for field in field_tuple], dim_list).astype(np.int64)
+        key_list, inverse = np.unique(key, return_inverse=True)
+        file_num = np.bincount(inverse, minlength=len(key_list))
+        #(组, 每秒字节数) 二维求和, 字节数之和远小于 2**53, float64 累加是精确的
+        rate_num = max(1, len(self.rate_code_dict))
+        size_sum = np.bincount(inverse.astype(np.int64) * rate_num + column_dict["每秒字节数"],
+                               weights=column_dict["字节数"], minlength=len(key_list) * rate_num).reshape(-1, rate_num)
+        rate_list = [None] * len(self.rate_code_dict)
+        for byte_rate, code in self.rate_code_dict.items():
+            rate_list[code] = byte_rate
+
+        value_list_list = []
+        for index in field_index_list:
+            value_list = [None] * len(self.code_dict_list[index])
+            for value, code in self.code_dict_list[index].items():
+                value_list[code] = value
+            value_list_list.append(value_list)
+        code_array_list = np.unravel_index(key_list, dim_list)
+        row_list = []
+        for row_index in range(len(key_list)):
+            value_tuple = tuple(value_list[int(code_array[row_index])]
+                                for value_list, code_array in zip(value_list_list, code_array_list))
+            duration = DurationSum({byte_rate: int(size_sum[row_index, code])
+                                    for code, byte_rate in enumerate(rate_list) if size_sum[row_index, code]})
+            row_list.append((value_tuple, int(file_num[row_index]), duration))
+        row_list.sort(key=lambda row: row[0])
+        return row_list
+
+    def group_name(self, field_tuple):
+        alias_dict = {field: alias for alias, field in self.FIELD_ALIAS_DICT.items()}
+        return "+".join(alias_dict[field] for field in field_tuple)
+
+    def partial(self):
+        """
+            功能:
+                    * 可合并的中间结果(各分组每组的条数与整数字节数), 用于分片运行后合并
+            返回值:
+                    * dict 可写入 json
+        """
+        column_dict = self.columns()
+        total_duration = DurationSum()
+        result = {"groups": {}, "total": None, "unparsed": [self.unparsed_num, self.unparsed_duration.to_dict()]}
+        for byte_rate, code in self.rate_code_dict.items():
+            total_duration.add(int(column_dict["字节数"][column_dict["每秒字节数"] == code].sum()), byte_rate)
+        result["total"] = [len(self.size_column), total_duration.to_dict()]
+        for field_tuple in self.group_list:
+            result["groups"][self.group_name(field_tuple)] = [[list(value_tuple), file_num, duration.to_dict()]
+                                                              for value_tuple, file_num, duration
+                                                              in self.aggregate(field_tuple, column_dict)]
+        return result
+
+    @staticmethod
+    def merge_partials(partial_list):
+        """
+            功能:
+                    * 合并多个分片的中间结果, 结果与不分片运行完全一致
+            参数:
+                    * partial_list: partial 的返回值列表
+            返回值:
+                    * dict 合并后的中间结果
+        """
+        def merge_pair(pair_list):
+            duration = DurationSum()
+            for _, bytes_dict in pair_list:
+                duration.merge(bytes_dict)
+            return [sum(file_num for file_num, _ in pair_list), duration.to_dict()]
+
+        group_dict = {}
+        for partial in partial_list:
+            for group_name, row_list in partial["groups"].items():
+                row_dict = group_dict.setdefault(group_name, {})
+                for value_list, file_num, bytes_dict in row_list:
+                    row_dict.setdefault(tuple(value_list), []).append((file_num, bytes_dict))
+        return {"groups": {group_name: [[list(value_tuple), *merge_pair(row_dict[value_tuple])]
+                                        for value_tuple in sorted(row_dict)]
+                           for group_name, row_dict in group_dict.items()},
+                "total": merge_pair([partial["total"] for partial in partial_list]),
+                "unparsed": merge_pair([partial["unparsed"] for partial in partial_list])}
+
+    def report(self, output_dir, partial=None):
+        """
+            功能:
+                    * 输出各分组的 csv 及汇总 json
+            参数:
+                    * output_dir: 报告输出目录
+                    * partial: 中间结果(如合并后的分片结果), None 为本对象的统计
+            返回值:
+                    * dict 汇总结果
+        """
+        partial = partial or self.partial()
+        os.makedirs(output_dir, exist_ok=True)
+        total_duration = DurationSum(partial["total"][1]).seconds()
+        unparsed_num, unparsed_bytes_dict = partial["unparsed"]
+        unparsed_duration = DurationSum(unparsed_bytes_dict).seconds()
+        result = {"files": partial["total"][0] + unparsed_num,
+                  "duration_s": round(total_duration + unparsed_duration, 3),
+                  "unparsed_files": unparsed_num,
+                  "unparsed_duration_s": round(unparsed_duration, 3),
+                  "groups": {}}
+        for group_name, row_list in partial["groups"].items():
+            field_tuple = self.parse_group_by(group_name)[0]
+            row_dict_list = []
+            for value_list, file_num, bytes_dict in row_list:
+                duration = DurationSum(bytes_dict).seconds()
+                row_dict = dict(zip(field_tuple, value_list))
+                row_dict.update({"files": file_num, "duration_s": round(duration, 3),
+                                 "duration_h": round(duration / 3600, 4),
+                                 "mean_s": round(duration / file_num, 3),
+                                 "share": round(duration / total_duration, 6) if total_duration else 0.0})
+                row_dict_list.append(row_dict)
+            result["groups"][group_name] = row_dict_list
+
+            csv_path = os.path.join(output_dir, f"corpusStats_{group_name}.csv")
+            with open(csv_path, "w", encoding="utf-8-sig", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=list(field_tuple) + ["files", "duration_s", "duration_h", "mean_s", "share"])
+                writer.writeheader()
+                writer.writerows(row_dict_list)
+            self.logger.log(f"[CorpusStats]: 提示! 按 {group_name} 统计 {len(row_dict_list)} 组，已写入 {csv_path}", "info")
+
+        json_path = os.path.join(output_dir, self.REPORT_FILE_NAME)
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        self.logger.log(f"[CorpusStats]: 提示! 共 {result['files']} 条 {result['duration_s']} 秒，汇总已写入 {json_path}", "info")
+        if unparsed_num:
+            self.logger.log(f"[CorpusStats]: 警告! {unparsed_num} 条音频文件名不是结构化格式，只计入总数", "warning")
+        return result
+
+
+if __name__=="__main__":
+    pass
@@ -1,15 +1,139 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import logging
+import logging, threading, time, json, os
+from contextlib import contextmanager
 from colorama import init, Fore, Style
-import pprint
 
 # 初始化 colorama 库，用于在控制台输出中添加颜色
 init(autoreset=True)
 
+
+class MetricsSink:
+    """ 这是一个按操作名称累计计数和耗时的指标记录器, 运行结束时以 json 行输出"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        #名称 -> 累计值
+        self.counter_dict = {}
+        #名称 -> [次数, 总耗时(秒), 最大耗时(秒)]
+        self.timer_dict = {}
+
+    def count(self, name, value=1):
+        """
+        累加计数
+
+        Args:
+            name:   计数名称
+            value:  增加的值
+        """
+        with self.lock:
+            self.counter_dict[name] = self.counter_dict.get(name, 0) + value
+
+    def add_time(self, name, seconds, number=1):
+        """
+        累加一次(或多次)操作的耗时
+
+        Args:
+            name:       计时名称
+            seconds:    耗时(秒)
+            number:     操作次数
+        """
+        with self.lock:
+            timer = self.timer_dict.get(name)
+            if timer is None:
+                self.timer_dict[name] = [number, seconds, seconds]
+            else:
+                timer[0] += number
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+
+    @contextmanager
+    def timer(self, name):
+        """
+        计时上下文, 代码块抛出异常时同样计入耗时
+
+        Args:
+            name:   计时名称
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def drain(self):
+        """
+        取出当前全部指标并清零, 供工作进程回传给主进程
+
+        Returns:
+            dict {"counters": {...}, "timers": {...}}
+        """
+        with self.lock:
+            snapshot = {"counters": self.counter_dict, "timers": self.timer_dict}
+            self.counter_dict = {}
+            self.timer_dict = {}
+        return snapshot
+
+    def merge(self, snapshot):
+        """
+        合并其它进程/记录器 drain 得到的指标
+
+        Args:
+            snapshot:   drain 的返回值
+        """
+        if not snapshot:
+            return
+        for name, value in snapshot["counters"].items():
+            self.count(name, value)
+        with self.lock:
+            for name, (number, total, max_time) in snapshot["timers"].items():
+                timer = self.timer_dict.get(name)
+                if timer is None:
+                    self.timer_dict[name] = [number, total, max_time]
+                else:
+                    timer[0] += number
+                    timer[1] += total
+                    timer[2] = max(timer[2], max_time)
+
+    def emit(self, output_path, **run_info):
+        """
+        以 json 行追加写出全部指标, 每个计数/计时一行
+
+        Args:
+            output_path:    输出文件路径
+            run_info:       附加到每行的运行信息(如功能名称)
+        """
+        output_dir = os.path.dirname(output_path)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        timestamp = time.strftime("%Y-%m-%dT%H:%M:%S")
+        with self.lock:
+            line_list = [dict(run_info, time=timestamp, type="counter", name=name, value=value)
+                         for name, value in sorted(self.counter_dict.items())]
+            line_list += [dict(run_info, time=timestamp, type="timer", name=name, count=number,
+                               total_s=round(total, 6), mean_s=round(total / number, 6) if number else 0.0,
+                               max_s=round(max_time, 6))
+                          for name, (number, total, max_time) in sorted(self.timer_dict.items())]
+        with open(output_path, "a", encoding="utf-8") as f:
+            for line in line_list:
+                f.write(json.dumps(line, ensure_ascii=False) + "\n")
+
+
 class DebugLogger:
     """ 这是一个调试、运行记录器、控制打印"""
+
+    LOG_LEVEL_DICT = {"debug":logging.DEBUG, "info":logging.INFO,
+                      "warning":logging.WARNING, "error":logging.ERROR,
+                      "critical":logging.CRITICAL}
+    COLOR_MAP = {logging.DEBUG: Fore.CYAN,
+                 logging.INFO: Fore.GREEN,
+                 logging.WARNING: Fore.YELLOW,
+                 logging.ERROR: Fore.RED,
+                 logging.CRITICAL: Fore.MAGENTA}
+    #共享的控制台处理器只添加一次, 多个 DebugLogger 不会重复输出
+    _handler_lock = threading.Lock()
+
     def __init__(self, set_log_level="info"):
         """
         初始化一些参数
@@ -20,52 +144,58 @@ class DebugLogger:
                 /
         """
         set_log_level = set_log_level.lower()
-        self.log_level_dict = {"debug":logging.DEBUG, "info":logging.INFO,
-                                "warning":logging.WARNING, "error":logging.ERROR,
-                                "critical":logging.CRITICAL}
+        self.log_level_dict = self.LOG_LEVEL_DICT
         if set_log_level not in self.log_level_dict:
             raise ValueError(f"\033[0;36;31m[DebugLogger]: 错误! 设置 {set_log_level} 日志等级不存在!\033[0m")
-
+        #低于该等级的信息在格式化之前直接丢弃
+        self.level = self.log_level_dict[set_log_level]
+        self.metrics = MetricsSink()
 
         self.logger_console = logging.getLogger('console_logger')  # 创建一个名为 console_logger 的打印输出记录器
-        self.logger_console.setLevel(logging.DEBUG)  # 设置日志记录器的默认级别为 DEBUG
-        # 创建控制台处理器
-        console_handler = logging.StreamHandler()
-        console_handler.setLevel(self.log_level_dict[set_log_level])  # 设置控制台处理器的日志级别
-        #formatter = logging.Formatter('%(asctime)s: %(levelname)s: %(message)s')  # 创建日志格式化器
-        formatter = logging.Formatter('%(levelname)s: %(message)s')  # 创建日志格式化器
-        console_handler.setFormatter(formatter)  # 设置控制台处理器的日志格式
+        self.logger_console.setLevel(logging.DEBUG)  # 等级由各 DebugLogger 自己判断, 共享的记录器全部放行
+        with self._handler_lock:
+            if not any(getattr(handler, "_debug_logger", False) for handler in self.logger_console.handlers):
+                # 创建控制台处理器
+                console_handler = logging.StreamHandler()
+                console_handler._debug_logger = True
+                console_handler.setLevel(logging.DEBUG)
+                #formatter = logging.Formatter('%(asctime)s: %(levelname)s: %(message)s')  # 创建日志格式化器
+                formatter = logging.Formatter('%(levelname)s: %(message)s')  # 创建日志格式化器
+                console_handler.setFormatter(formatter)  # 设置控制台处理器的日志格式
+                self.logger_console.addHandler(console_handler)  # 将控制台处理器添加到日志记录器中
 
-        self.logger_console.addHandler(console_handler)  # 将控制台处理器添加到日志记录器中
+    def isEnabledFor(self, level):
+        """
+        判断该等级的信息是否会输出, 用于跳过只为调试打印准备数据的代码
 
-    def log(self, message, level):
+        Args:
+            level:      信息等级
+        Returns:
+            bool
+        """
+        return self.log_level_dict.get(level.lower(), logging.INFO) >= self.level
+
+    def log(self, message, level, *args):
         """
         日志信息输出打印
 
         Args:
-            message:    需要打印输出的信息
+            message:    需要打印输出的信息, 有 args 时按 message % args 格式化
             level:      信息等级
+            args:       格式化参数, 信息不输出时不会格式化
         Returns:
                 /
         """
-        level = level.lower()
-        if level not in self.log_level_dict:
-            level = "info"
-        level = self.log_level_dict[level]
+        level = self.log_level_dict.get(level) or self.log_level_dict.get(level.lower(), logging.INFO)
+        if level < self.level:
+            return
         try:
-            # 记录日志信息的方法，接受两个参数：message 为要记录的消息内容，level 为日志级别
-            color_map = {
-                logging.DEBUG: Fore.CYAN,
-                logging.INFO: Fore.GREEN,
-                logging.WARNING: Fore.YELLOW,
-                logging.ERROR: Fore.RED,
-                logging.CRITICAL: Fore.MAGENTA
-            }
-            if level in color_map:
-                if isinstance(message, dict) or isinstance(message, list):
-                    self.logger_console.log(level, color_map[level] + pprint.pformat(message) + Style.RESET_ALL)
-                else:
-                    self.logger_console.log(level, color_map[level] + str(message) + Style.RESET_ALL)
+            if args:
+                message = message % args
+            if isinstance(message, dict) or isinstance(message, list):
+                import pprint
+                message = pprint.pformat(message)
+            self.logger_console.log(level, self.COLOR_MAP[level] + str(message) + Style.RESET_ALL)
         except Exception as e:
             print(f"\033[0;36;31m[DebugLogger]: 错误! 输出时出错: {e}\033[0m")
 
@@ -82,7 +212,7 @@ if __name__ == "__main__":
     logger.log([0, 2,3 ,4, 5, 6,7 ,8 ,9], "DEBUG")
     logger.log(data, "debug")
     logger.log("调试", "debug")
-    logger.log("信息", "info")
+    logger.log("信息 %s", "info", data)
     logger.log('警告!', "warning")
     logger.log("错误", "error")
     logger.log("严重错误", "critical")
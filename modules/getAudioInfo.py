@@ -1,7 +1,8 @@
 #!/usr/bin/python3
 #-*- coding:utf-8 -*-
 
-import sys, binascii, os
+import sys, os, struct
+from concurrent.futures import ThreadPoolExecutor
 try:
     from modules.debugLogger import DebugLogger
 except:
@@ -12,29 +13,165 @@ __version__="1.0.1"
 
 
 
+class DurationSum:
+    """ 这是一个精确的时长累加器, 按每秒字节数分别累加数据字节数(整数), 累加顺序和分片合并不影响结果"""
+    def __init__(self, bytes_dict=None):
+        #每秒字节数 -> 数据字节数
+        self.bytes_dict = {}
+        if bytes_dict:
+            self.merge(bytes_dict)
+
+    def add(self, data_size, byte_rate):
+        self.bytes_dict[byte_rate] = self.bytes_dict.get(byte_rate, 0) + data_size
+
+    def merge(self, bytes_dict):
+        """
+            功能:
+                    * 合并另一个累加器或 to_dict 的结果
+        """
+        if isinstance(bytes_dict, DurationSum):
+            bytes_dict = bytes_dict.bytes_dict
+        for byte_rate, data_size in bytes_dict.items():
+            self.add(int(data_size), int(byte_rate))
+
+    def seconds(self):
+        """
+            功能:
+                    * 总时长(秒), 各每秒字节数按固定顺序相加
+        """
+        return sum(self.bytes_dict[byte_rate] / byte_rate for byte_rate in sorted(self.bytes_dict))
+
+    def to_dict(self):
+        """
+            功能:
+                    * 可写入 json 的形式, 键为每秒字节数的字符串
+        """
+        return {str(byte_rate): data_size for byte_rate, data_size in sorted(self.bytes_dict.items())}
+
+
 class GetAudioInfo:
     """ 这是一个获取音频头信息的类"""
     def __init__(self, logger=None):
         self.logger = logger
         if not self.logger:
             self.logger = DebugLogger()
+        #可选的 MetadataCache 元数据缓存
+        self.cache = None
 
 
-    def __hex_to_dec(self, input_hex):
+    #单次读取的头部缓冲大小, 普通 wav 头(含 LIST/fact 块)一次即可读完
+    HEAD_READ_SIZE = 4096
+    #WAVE_FORMAT_EXTENSIBLE 格式标记
+    WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+    def readWavHeader(self, input_wav):
         """
             功能:
-                    * 十六进制字符串转换为十进制整数
+                    * 按 RIFF 协议逐块遍历 wav 头, 在任意偏移处查找 fmt 与 data 块
+                    * 支持 LIST/fact 等附加块以及 WAVE_FORMAT_EXTENSIBLE
             参数:
-                    * input_hex: 输入的十六进制字符串
+                    * str wav文件路径 input_wav
             返回值:
-                    * 十进制字符串
+                    * dict 原始头字段, 包含 fmt 字段、FmtOffset、DataOffset、DataSize、FileSize
+            异常:
+                    * ValueError: 不是 RIFF/WAVE 文件或缺少 fmt/data 块
         """
-        input_hex = input_hex.replace("0x", "")
-        input_hex = input_hex.replace("0X", "")
-        input_hex = input_hex.split(" ")
-        input_hex = input_hex[::-1]
-        input_hex = "".join(input_hex)
-        return int(input_hex, base=16)
+        with open(input_wav, "rb") as f:
+            file_size = os.fstat(f.fileno()).st_size
+            buf = f.read(self.HEAD_READ_SIZE)
+            if len(buf) < 12 or buf[:4] not in (b"RIFF", b"RF64") or buf[8:12] != b"WAVE":
+                raise ValueError(f"{input_wav} 不是 RIFF/WAVE 文件")
+
+            head = {"FileSize": file_size}
+            buf_offset = 0  # buf[0] 在文件中的偏移
+            pos = 12
+            while pos + 8 <= file_size:
+                #当前块头或 fmt 内容不在缓冲区内时, 从块起点重新读取
+                if pos + 24 > buf_offset + len(buf):
+                    f.seek(pos)
+                    buf = f.read(self.HEAD_READ_SIZE)
+                    buf_offset = pos
+                    if len(buf) < 8:
+                        break
+                chunk_id, chunk_size = struct.unpack_from("<4sI", buf, pos - buf_offset)
+                body = pos + 8
+                if chunk_id == b"fmt ":
+                    (head["AudioFormat"], head["Channels"], head["Framerate"], head["ByteRate"],
+                        head["BlockAlign"], head["BitsPerSample"]) = struct.unpack_from("<HHIIHH", buf, body - buf_offset)
+                    head["FmtSize"] = chunk_size
+                    head["FmtOffset"] = body
+                    if head["AudioFormat"] == self.WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40 \
+                            and body + 26 <= buf_offset + len(buf):
+                        #扩展格式的真实格式保存在 SubFormat GUID 的前两个字节
+                        head["AudioFormat"] = struct.unpack_from("<H", buf, body + 24 - buf_offset)[0]
+                elif chunk_id == b"data":
+                    head["DataOffset"] = body
+                    head["DataSize"] = chunk_size
+                    break
+                pos = body + chunk_size + (chunk_size & 1)
+
+        if "Channels" not in head:
+            raise ValueError(f"{input_wav} 缺少 fmt 块")
+        if "DataOffset" not in head:
+            raise ValueError(f"{input_wav} 缺少 data 块")
+        #data 块长度未回填(0/0xFFFFFFFF)或文件被截断时, 以实际剩余长度为准
+        remain_size = file_size - head["DataOffset"]
+        if head["DataSize"] in (0, 0xFFFFFFFF) or head["DataSize"] > remain_size:
+            head["DataSize"] = remain_size
+        return head
+
+
+    def buildWavHeader(self, channels, framerate, sampwidth, data_size):
+        """
+            功能:
+                    * 生成标准 44 字节 PCM wav 头
+            参数:
+                    * int 通道数 channels
+                    * int 采样率 framerate
+                    * int 位宽(字节) sampwidth
+                    * int 音频数据字节数 data_size
+            返回值:
+                    * bytes wav 头
+        """
+        block_align = channels * sampwidth
+        #data 块长度为奇数时, RIFF 规定补一个字节对齐
+        riff_size = 36 + data_size + (data_size & 1)
+        return struct.pack("<4sI4s4sIHHIIHH4sI", b"RIFF", riff_size, b"WAVE", b"fmt ", 16, 1,
+                           channels, framerate, framerate * block_align, block_align, sampwidth * 8,
+                           b"data", data_size)
+
+
+    def _head_to_info(self, input_wav, head):
+        """
+            功能:
+                    * 把原始头字段转换为 getWavInfor 的输出格式
+            参数:
+                    * str wav文件路径 input_wav
+                    * dict readWavHeader 的返回值 head
+            返回值:
+                    * dict 头信息内容字典 output_head_infor_dict
+        """
+        if not head["Channels"] or not head["Framerate"]:
+            raise ValueError(f"{input_wav} 通道数或采样率为 0")
+        sampwidth = head["BlockAlign"] // head["Channels"] if head["BlockAlign"] else head["BitsPerSample"] // 8
+        if not sampwidth:
+            raise ValueError(f"{input_wav} 位宽为 0")
+        output_head_infor_dict = {"文件的数据大小": head["FileSize"],
+                                  "区块长度": head["FmtSize"],
+                                  "音频格式(PCM音频数据的值为1)": head["AudioFormat"],
+                                  "Channels": head["Channels"],
+                                  "Framerate": head["Framerate"],
+                                  "每秒的数据字节数": head["ByteRate"],
+                                  "数据快对齐": head["BlockAlign"],
+                                  "SampWidth": sampwidth,
+                                  "DataOffset": head["DataOffset"],
+                                  "DataSize": head["DataSize"]}
+        output_head_infor_dict["FileDuration"] = head["DataSize"] / (head["Channels"] * head["Framerate"] * sampwidth)
+        output_head_infor_dict["SampleTime"] = 1/head["Framerate"]
+        output_head_infor_dict["nFrames"] = head["Framerate"] * output_head_infor_dict["FileDuration"]
+        output_head_infor_dict["文件名"] = input_wav
+        return output_head_infor_dict
 
 
     def getWavInfor(self, input_wav, output_audio_path=None, fill_para=None):
@@ -46,51 +183,117 @@ class GetAudioInfo:
             返回值:
                     * dict 头信息内容字典 output_head_infor_dict
         """
-        data_type_size_dict = {8:1, 16:2, 24:3, 32:4}
-        output_head_infor_dict = {}
-        with open(input_wav, "rb") as f:
-            data = f.read(44)
-            hexstr = binascii.b2a_hex(data)
-            hexstr = str(hexstr, "utf-8")
-        head_infor_interval_dict = {"文件的数据大小":[4, 8],
-                                    "区块长度": [16, 20],
-                                    "音频格式(PCM音频数据的值为1)":[20, 22],
-                                    "Channels":[22, 24],
-                                    "Framerate":[24, 28],
-                                    "每秒的数据字节数":[28, 32],
-                                    "数据快对齐":[32, 34],
-                                    "SampWidth":[34, 36],}
-        hex_data_list = []
-        hexstr_list = list(hexstr)
-        tmep = ""
-        for index in range(len(hexstr_list)):
-            tmep = tmep + hexstr_list[index]
-            if index%2:
-                hex_data_list.append(tmep)
-                tmep = ""
-
-        for key in head_infor_interval_dict:
-            get_data_list = hex_data_list[head_infor_interval_dict[key][0]:head_infor_interval_dict[key][-1]]
-            get_data_str = " ".join(get_data_list)
-            output_head_infor_dict[key] = self.__hex_to_dec(get_data_str)
-        output_head_infor_dict["SampWidth"] = data_type_size_dict[output_head_infor_dict["SampWidth"]]
-
-        data_size = os.path.getsize(input_wav)
-        output_head_infor_dict["文件的数据大小"] = data_size
-        output_head_infor_dict["FileDuration"] = (
-                (output_head_infor_dict["文件的数据大小"] - 44)
-                    /(
-                        output_head_infor_dict["Channels"]
-                        * output_head_infor_dict["Framerate"]
-                        * output_head_infor_dict["SampWidth"])
-            )
-        output_head_infor_dict["SampleTime"] = 1/output_head_infor_dict["Framerate"]
-        output_head_infor_dict["nFrames"] = output_head_infor_dict["Framerate"] * output_head_infor_dict["FileDuration"]
-        output_head_infor_dict["文件名"] = input_wav
-        self.logger.log(f"[GetAudioInfo]: 调试! 音频信息 {output_head_infor_dict}", "debug")
+        output_head_infor_dict = self._head_to_info(input_wav, self.readWavHeader(input_wav))
+        self.logger.log("[GetAudioInfo]: 调试! 音频信息 %s", "debug", output_head_infor_dict)
         return output_head_infor_dict
 
 
+    def _get_wav_info_safe(self, input_wav):
+        """
+            功能:
+                    * 批量解析用, 异常转换为错误信息返回
+            返回值:
+                    * tuple (头信息字典/None, 错误信息/None)
+        """
+        try:
+            return self._head_to_info(input_wav, self.readWavHeader(input_wav)), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+
+    def _read_head_safe(self, input_wav):
+        """
+            功能:
+                    * 批量解析用, 返回原始头字段, 异常转换为错误信息返回
+            返回值:
+                    * tuple (head/None, 错误信息/None)
+        """
+        try:
+            return self.readWavHeader(input_wav), None
+        except Exception as e:
+            return None, f"{type(e).__name__}: {e}"
+
+
+    def _stat_safe(self, input_wav):
+        try:
+            return os.stat(input_wav), None
+        except OSError as e:
+            return None, f"{type(e).__name__}: {e}"
+
+
+    def _map(self, func, item_list, max_workers):
+        """
+            功能:
+                    * 按顺序对每个元素执行 func, 多线程并发以掩盖网络存储的往返延迟
+        """
+        if max_workers <= 1 or len(item_list) < 2:
+            return [func(item) for item in item_list]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(func, item_list))
+
+
+    def getWavInfoBatch(self, input_wav_list, max_workers=8):
+        """
+            功能:
+                    * 批量解析 wav 头, 一次调用处理成千上万个文件
+                    * 设置了元数据缓存(self.cache)时, 未变化的文件直接由缓存返回, 只解析新增/变化的文件
+            参数:
+                    * list wav文件路径列表 input_wav_list
+                    * int 并发线程数 max_workers, 1 为单线程
+            返回值:
+                    * list 与输入顺序一致的 (头信息字典/None, 错误信息/None)
+        """
+        if self.cache is None:
+            return self._map(self._get_wav_info_safe, input_wav_list, max_workers)
+
+        result_list = [None] * len(input_wav_list)
+        stat_index_list, stat_list = [], []
+        for index, (st, err) in enumerate(self._map(self._stat_safe, input_wav_list, max_workers)):
+            if err:
+                result_list[index] = (None, err)
+            else:
+                stat_index_list.append(index)
+                stat_list.append(st)
+
+        head_list = self.cache.getHeads([input_wav_list[index] for index in stat_index_list], stat_list)
+        miss_list = [(index, st) for index, st, head in zip(stat_index_list, stat_list, head_list) if head is None]
+        for index, head in zip(stat_index_list, head_list):
+            if head is not None:
+                result_list[index] = (self._head_to_info(input_wav_list[index], head), None)
+
+        new_path_list, new_stat_list, new_head_list, new_duration_list = [], [], [], []
+        miss_head_list = self._map(self._read_head_safe, [input_wav_list[index] for index, _ in miss_list], max_workers)
+        for (index, st), (head, err) in zip(miss_list, miss_head_list):
+            if err:
+                result_list[index] = (None, err)
+                continue
+            try:
+                info = self._head_to_info(input_wav_list[index], head)
+            except Exception as e:
+                result_list[index] = (None, f"{type(e).__name__}: {e}")
+                continue
+            result_list[index] = (info, None)
+            new_path_list.append(input_wav_list[index])
+            new_stat_list.append(st)
+            new_head_list.append(head)
+            new_duration_list.append(info["FileDuration"])
+        self.cache.putHeads(new_path_list, new_stat_list, new_head_list, new_duration_list)
+        return result_list
+
+
+    @staticmethod
+    def duration_bytes(info):
+        """
+            功能:
+                    * 头信息 -> (数据字节数, 每秒字节数), 供 DurationSum 精确累加
+            参数:
+                    * dict getWavInfor 的返回值 info
+            返回值:
+                    * tuple (int, int)
+        """
+        return info["DataSize"], info["Channels"] * info["Framerate"] * info["SampWidth"]
+
+
     def getWavFileDuration(self, input_wav, output_audio_path=None, fill_para=None):
         """
             功能:
@@ -1,6 +1,6 @@
 #!/usr/bin/python3
 #-*- coding:utf-8 -*-
-import os
+import os, sys, re, shutil, json, glob
 from tqdm import tqdm
 
 try:
@@ -8,12 +8,18 @@ try:
     from modules.getAudioInfo import GetAudioInfo
     from modules.audioBasicProcessing import AudioBasicProcessing
     from modules.pathProcessing import PathProcessing
+    from modules.corpusIndex import CorpusIndex
+    from modules.workerPool import WorkerPool
+    from modules.shardPlan import ShardPlan
 except ImportError:
     sys.path.append("../")
     from modules.debugLogger import DebugLogger
     from modules.getAudioInfo import GetAudioInfo
     from modules.audioBasicProcessing import AudioBasicProcessing
     from modules.pathProcessing import PathProcessing
+    from modules.corpusIndex import CorpusIndex
+    from modules.workerPool import WorkerPool
+    from modules.shardPlan import ShardPlan
 
 
 
@@ -21,114 +27,298 @@ class GetTestSetAndNorm:
 
     """ 这是处理转录测试集相关的类"""
 
-    def __init__(self, output_root_path, debug, logger=None):
+    #选取记录文件名, 放在每个 <指令>_norm_<数量> 目录下
+    MANIFEST_FILE_NAME = ".testset_manifest.json"
+
+    def __init__(self, output_root_path, debug, logger=None, norm_channel=0, only_set_list=None, non_set_list=None,
+                 seed=0, index_path=None, rebuild_index=False, jobs=1, incremental=False, shard=None):
+        """
+            参数:
+                    * output_root_path: 处理结果输出目录
+                    * debug: 是否打开调试打印
+                    * logger: 日志记录器
+                    * norm_channel: 归一化时多通道音频选取的通道索引或 "mean"
+                    * only_set_list: 仅选定, 音频路径需匹配全部正则
+                    * non_set_list: 排除, 音频路径匹配任一正则即排除
+                    * seed: 选取测试集的随机种子, 相同语料和种子的选取结果一致
+                    * index_path: 语料索引文件, 默认为输出目录下的 CorpusIndex.INDEX_FILE_NAME
+                    * rebuild_index: 是否忽略已有索引重新遍历语料
+                    * jobs: 归一化的进程数, 1 为单进程, 0 为使用全部 CPU 核
+                    * incremental: 是否保留以前选中且仍有效的成员, 只补足并归一化新选中的音频
+                    * shard: 分片 "K/N", 只处理按指令名哈希属于第 K 个分片的指令, None 为不分片
+        """
         self.logger = logger
         if not self.logger:
-            self.logger = DebugLogger()
+            self.logger = DebugLogger("debug" if debug else "info")
         self.GetAudioInfo = GetAudioInfo(self.logger)
-        self.AudioBasicProcessing = AudioBasicProcessing(self.logger)
+        self.AudioBasicProcessing = AudioBasicProcessing(self.logger, norm_channel=norm_channel)
         self.PathProcessing = PathProcessing(self.logger)
 
+        self.CorpusIndex = CorpusIndex(self.logger)
+
         #一级，仅选定
-        self.only_set_list = []
+        self.only_set_list = only_set_list or []
         #二级，需排除
-        self.non_set_list = []
+        self.non_set_list = non_set_list or []
+        #编译后的 仅选定/排除 规则
+        self.only_pattern_list = []
+        self.non_pattern_list = []
 
         self.output_root_path = output_root_path
+        self.seed = seed
+        self.ShardPlan = ShardPlan(shard, self.logger) if shard else None
+        self.index_path = index_path or os.path.join(output_root_path, CorpusIndex.INDEX_FILE_NAME)
+        #分片只索引自己的指令目录, 使用各自的索引文件
+        if self.ShardPlan is not None and not index_path:
+            self.index_path = self.ShardPlan.shard_path(self.index_path)
+        self.rebuild_index = rebuild_index
+        self.norm_channel = norm_channel
+        self.jobs = jobs
+        self.incremental = incremental
 
 
-    def __GetTestSetAndNorm(self, input_audio_path, kws_cmd, set_max_num):
+    def _output_path(self, input_path):
         """
             功能:
-                    * 具体操作根据指令/唤醒词列表,选择最大数量不超
-                    * 指定数量的测试集并且归一化该指令下的音频
+                    * 输入路径 -> 输出目录下的对应路径
+                    * 去掉盘符、根目录及开头的 .., 绝对路径的输入不会指回输入目录本身
             参数：
-                    * input_audio_path: 输入总路径，语料均在下面
-                    * kws_cmd_path:   指令/唤醒词列表
-                    * set_max_num:    设置每个指令/唤醒词　最大数量
+                    * input_path: 输入音频或目录路径
+            返回值:
+                    * str 输出路径
+        """
+        return self.PathProcessing.mirror_path(self.output_root_path, input_path)
+
+
+    def _check_output_path(self, path):
+        """
+            功能:
+                    * 删除/移动前检查目标在输出目录下, 防止误删输入语料
+            异常:
+                    * OSError: 目标不在输出目录下
+        """
+        output_root = os.path.realpath(self.output_root_path)
+        real_path = os.path.realpath(path)
+        if real_path == output_root or not real_path.startswith(os.path.join(output_root, "")):
+            raise OSError(f"{path} 不在输出目录 {self.output_root_path} 下, 拒绝删除或移动")
+
+
+    def _find_manifest_dir(self, new_kws_cmd_dir):
+        """
+            功能:
+                    * 查找该指令以前生成的、带选取记录的 <指令>_norm_<数量> 目录, 有多个时取最新的
+            返回值:
+                    * str 目录路径, 没有时返回 None
+        """
+        dir_list = [dir_path for dir_path in glob.glob(f"{glob.escape(new_kws_cmd_dir)}_norm_*")
+                    if os.path.isfile(os.path.join(dir_path, self.MANIFEST_FILE_NAME))]
+        if not dir_list:
+            return None
+        return max(dir_list, key=os.path.getmtime)
+
+
+    def _load_kept_members(self, manifest_dir, input_test_set_path):
+        """
+            功能:
+                    * 读取选取记录, 返回仍然有效的成员: 源文件大小/修改时间未变且归一化结果仍在
+            参数：
+                    * manifest_dir: 带选取记录的目录
+                    * input_test_set_path: 指令输入目录
             返回值:
-                    * /
+                    * list 有效成员的源文件路径, 与记录中的顺序一致
         """
         try:
-            flist = []
-            input_test_set_path = os.path.join(input_audio_path, kws_cmd)
-            flist = self.PathProcessing.get_file_list(input_test_set_path, ".wav")
-            print("\n")
-            self.logger.log(f"[GetTestSetAndNorm]: 提示！已获取测试集音频总数 {len(flist)}", "info")
-
-            if not flist:
-                return False
-
-            wav_path_dict = {}
-            for wav_path in flist:
-                people_number = os.path.basename(wav_path).split("_")[-3]
-                if people_number not in wav_path_dict:
-                    wav_path_dict[people_number] = []
-                wav_path_dict[people_number].append(wav_path)
-
-            test_set_list = []
-            while True:
-                existence_test_set_flag = 0
-                for key in wav_path_dict:
-                    if wav_path_dict[key]:
-                        existence_test_set_flag = 1
-                        test_set_list.append(wav_path_dict[key].pop())
-                if not existence_test_set_flag:
-                    break
-            is_non_set = 0
-            no_only_set = 0
-            is_test_set_num = 0
-            for original_file in test_set_list:
-                if is_test_set_num >= set_max_num:
-                    break
-                #仅选定
-                for only_set in self.only_set_list:
-                    if not re.findall(only_set, original_file):
-                        no_only_set = 1
-                if no_only_set:
-                    no_only_set = 0
+            with open(os.path.join(manifest_dir, self.MANIFEST_FILE_NAME), "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError) as e:
+            self.logger.log(f"[GetTestSetAndNorm]: 警告！{manifest_dir} 选取记录读取失败: {e}", "warning")
+            return []
+        if str(manifest.get("norm_channel")) != str(self.norm_channel):
+            return []
+        kept_list = []
+        for member in manifest.get("members", []):
+            try:
+                st = os.stat(member["path"])
+                if st.st_size != member["size"] or st.st_mtime_ns != member["mtime_ns"]:
                     continue
-
-                #排除
-                for non_set in self.non_set_list:
-                    #if original_file.find(non_set) >= 0:
-                    if re.findall(non_set, original_file):
-                        self.logger.log(f"[GetTestSetAndNorm]: 注意！已设置排除: {original_file}", "warning")
-                        is_non_set = 1
-                if is_non_set:
-                    is_non_set = 0
+                if not os.path.isfile(os.path.join(manifest_dir, os.path.relpath(member["path"], input_test_set_path))):
                     continue
+            except (OSError, KeyError, ValueError):
+                continue
+            kept_list.append(member["path"])
+        return kept_list
 
-                new_file = os.path.join(self.output_root_path, original_file)
-                new_dir = new_file.split(os.path.basename(new_file))[0]
-                if not os.path.isdir(new_dir):
-                    os.makedirs(new_dir)
 
-                if self.AudioBasicProcessing.wavNorm(original_file, new_file, norm_number=1):
-                    is_test_set_num += 1
-                else:
-                    continue
+    def _reuse_members(self, manifest_dir, new_kws_cmd_dir, input_test_set_path, kept_list):
+        """
+            功能:
+                    * 把以前的结果目录改回中间目录, 并删除不再保留的归一化结果
+        """
+        self._check_output_path(manifest_dir)
+        self._check_output_path(new_kws_cmd_dir)
+        os.replace(manifest_dir, new_kws_cmd_dir)
+        kept_output_set = {self._output_path(original_file) for original_file in kept_list}
+        for dir_path, _, file_list in os.walk(new_kws_cmd_dir):
+            for file_name in file_list:
+                file_path = os.path.join(dir_path, file_name)
+                if file_path not in kept_output_set:
+                    self._check_output_path(file_path)
+                    os.remove(file_path)
+
+
+    def _select_command(self, input_audio_path, kws_cmd, set_max_num):
+        """
+            功能:
+                    * 选出单个指令/唤醒词的候选测试集, 并清理上次中断遗留的中间目录
+                    * 增量模式下保留以前选中且仍有效的成员, 只从其余音频中按同样的轮询规则补足
+            参数：
+                    * input_audio_path: 输入总路径，语料均在下面
+                    * kws_cmd:   指令/唤醒词
+                    * set_max_num:    设置每个指令/唤醒词　最大数量
+            返回值:
+                    * dict 指令处理状态, 没有候选音频时返回 None
+        """
+        input_test_set_path = os.path.join(input_audio_path, kws_cmd)
+        new_kws_cmd_dir = self._output_path(input_test_set_path)
+        if os.path.isdir(new_kws_cmd_dir):
+            #成功的处理总会把该目录改名为 _norm_N, 存在说明上次处理中断, 其中的文件不计入本次结果
+            self._check_output_path(new_kws_cmd_dir)
+            self.logger.log(f"[GetTestSetAndNorm]: 注意！{new_kws_cmd_dir} 为上次中断遗留的目录, 删除", "warning")
+            shutil.rmtree(new_kws_cmd_dir)
+
+        kept_list = []
+        manifest_dir = self._find_manifest_dir(new_kws_cmd_dir) if self.incremental else None
+        if manifest_dir:
+            #只保留仍在索引中且符合当前 仅选定/排除 规则的成员, 数量超过 set_max_num 时按轮询顺序保留
+            candidate_list = self.CorpusIndex.select(kws_cmd, input_test_set_path, self.seed,
+                                                     self.only_pattern_list, self.non_pattern_list)[0]
+            position_dict = {original_file: index for index, original_file in enumerate(candidate_list)}
+            kept_list = [original_file for original_file in self._load_kept_members(manifest_dir, input_test_set_path)
+                         if original_file in position_dict]
+            if len(kept_list) > set_max_num:
+                kept_list = sorted(kept_list, key=position_dict.get)[:set_max_num]
+
+        #按人编号分层轮询的候选顺序, 已应用 仅选定/排除 规则
+        test_set_list, excluded_list = self.CorpusIndex.select(kws_cmd, input_test_set_path, self.seed,
+                                                               self.only_pattern_list, self.non_pattern_list, set(kept_list))
+        self.logger.log(f"[GetTestSetAndNorm]: 提示！{kws_cmd} 已获取测试集音频总数 {len(test_set_list) + len(kept_list) + len(excluded_list)}", "info")
+        for original_file in excluded_list:
+            self.logger.log(f"[GetTestSetAndNorm]: 注意！已设置排除: {original_file}", "warning")
+        if not test_set_list and not kept_list:
+            return None
+
+        if kept_list:
+            self._reuse_members(manifest_dir, new_kws_cmd_dir, input_test_set_path, kept_list)
+            self.logger.log(f"[GetTestSetAndNorm]: 提示！{kws_cmd} 保留以前的测试集音频 {len(kept_list)} 条", "info")
+            self.logger.metrics.count("getTestSetAndNorm.kept", len(kept_list))
+        return {"candidates": test_set_list, "next": 0, "ok": len(kept_list), "members": list(kept_list),
+                "dir": new_kws_cmd_dir}
 
-            new_kws_cmd_dir = os.path.join(self.output_root_path, input_test_set_path)
-            new_kws_cmd_norm_dir = f"{new_kws_cmd_dir}_norm_{len(self.PathProcessing.get_file_list(new_kws_cmd_dir, '.wav'))}"
+
+    def _write_manifest(self, kws_cmd, state):
+        """
+            功能:
+                    * 记录本次选中的成员及源文件大小/修改时间, 供增量模式复用
+        """
+        member_list = []
+        for original_file in state["members"]:
+            st = os.stat(original_file)
+            member_list.append({"path": original_file, "size": st.st_size, "mtime_ns": st.st_mtime_ns})
+        manifest = {"command": kws_cmd, "seed": self.seed, "only": self.only_set_list, "exclude": self.non_set_list,
+                    "norm_channel": str(self.norm_channel), "members": member_list}
+        os.makedirs(state["dir"], exist_ok=True)
+        with open(os.path.join(state["dir"], self.MANIFEST_FILE_NAME), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=1)
+
+
+    def _finish_command(self, kws_cmd, state):
+        """
+            功能:
+                    * 写出选取记录, 按实际归一化成功的数量把指令目录改名为 <指令>_norm_<数量>
+            参数：
+                    * kws_cmd: 指令/唤醒词
+                    * state: _select_command 返回的指令处理状态
+            返回值:
+                    * bool True/False
+        """
+        new_kws_cmd_dir = state["dir"]
+        new_kws_cmd_norm_dir = f"{new_kws_cmd_dir}_norm_{state['ok']}"
+        try:
+            self._check_output_path(new_kws_cmd_dir)
+            self._check_output_path(new_kws_cmd_norm_dir)
+            self._write_manifest(kws_cmd, state)
             if os.path.isdir(new_kws_cmd_norm_dir):
                 self.logger.log(f"[GetTestSetAndNorm]: 注意！{new_kws_cmd_norm_dir} 该目录已经存在, 删除以前处理记录", "warning")
-                os.system("rm -r " + str(new_kws_cmd_norm_dir))
-            mvCmd = "mv " + str(new_kws_cmd_dir) + " " + str(new_kws_cmd_norm_dir)
-            if os.system(mvCmd):
-                return False
-            return True
-        except:
+                shutil.rmtree(new_kws_cmd_norm_dir)
+            os.replace(new_kws_cmd_dir, new_kws_cmd_norm_dir)
+        except OSError as e:
+            self.logger.log(f"[GetTestSetAndNorm]: 错误！{new_kws_cmd_dir} 改名为 {new_kws_cmd_norm_dir} 失败: {e}", "error")
             return False
+        return True
 
 
+    def _iter_norm_results(self, task_list, pool):
+        """
+            功能:
+                    * 归一化一批音频, 有进程池时分发到各工作进程
+            参数：
+                    * task_list: [(输入路径, 输出路径), ...]
+                    * pool: WorkerPool 对象, None 为在当前进程内逐条处理
+            返回值:
+                    * 生成器 是否成功, 与 task_list 顺序一致
+        """
+        if pool is None:
+            for original_file, new_file in task_list:
+                yield self.AudioBasicProcessing.wavNorm(original_file, new_file, norm_number=1)
+            return
+        for ok, res, err in pool.imap("wavNorm", ((original_file, new_file, 1) for original_file, new_file in task_list)):
+            if not ok:
+                self.logger.log(f"[GetTestSetAndNorm]: 错误！归一化异常: {err}", "error")
+            yield ok and res
+
+
+    def _norm_commands(self, state_dict, set_max_num, pool):
+        """
+            功能:
+                    * 全部指令的候选音频合并为一批并发归一化, 每个指令取候选顺序中前 set_max_num 条
+                    * 有失败的指令再从后续候选中补足, 直到数量足够或候选用完
+            参数：
+                    * state_dict: 指令 -> 指令处理状态
+                    * set_max_num: 每个指令/唤醒词　最大数量
+                    * pool: WorkerPool 对象或 None
+        """
+        pending_list = list(state_dict)
+        while pending_list:
+            task_list, owner_list = [], []
+            for kws_cmd in pending_list:
+                state = state_dict[kws_cmd]
+                need_num = set_max_num - state["ok"]
+                for original_file in state["candidates"][state["next"]:state["next"] + need_num]:
+                    new_file = self._output_path(original_file)
+                    os.makedirs(os.path.dirname(new_file), exist_ok=True)
+                    task_list.append((original_file, new_file))
+                    owner_list.append((kws_cmd, original_file))
+                state["next"] += need_num
+
+            result_iter = tqdm(self._iter_norm_results(task_list, pool), total=len(task_list), ncols=150, unit="条",
+                               desc=f"\033[0;36;33m测试集音频归一化\033[0m")
+            with self.logger.metrics.timer("getTestSetAndNorm.norm"):
+                for (kws_cmd, original_file), norm_ok in zip(owner_list, result_iter):
+                    if norm_ok:
+                        state_dict[kws_cmd]["ok"] += 1
+                        state_dict[kws_cmd]["members"].append(original_file)
+                        self.logger.metrics.count("getTestSetAndNorm.wavNorm")
+                    else:
+                        self.logger.metrics.count("getTestSetAndNorm.wavNorm.failed")
+            pending_list = [kws_cmd for kws_cmd in pending_list if state_dict[kws_cmd]["ok"] < set_max_num
+                            and state_dict[kws_cmd]["next"] < len(state_dict[kws_cmd]["candidates"])]
 
 
     def getTestSetAndNorm(self, input_audio_path, kws_cmd_path, set_max_num):
         """
             功能:
                     * 根据指令/唤醒词列表,选择最大数量不超指定数量的测试集
-                    * 并且归一化该指令下的音频
+                    * 并且归一化该指令下的音频, jobs 不为 1 时全部指令的音频在进程池中并发归一化
             参数：
                     * input_audio_path: 输入总路径，语料均在下面
                     * kws_cmd_path:   指令/唤醒词列表
@@ -137,6 +327,12 @@ class GetTestSetAndNorm:
                     /
         """
         self.logger.log(f"[GetTestSetAndNorm]: 提示！获取指定数量的测试集并归一化", "info")
+        try:
+            self.only_pattern_list = CorpusIndex.compile_patterns(self.only_set_list)
+            self.non_pattern_list = CorpusIndex.compile_patterns(self.non_set_list)
+        except re.error as e:
+            self.logger.log(f"[GetTestSetAndNorm]: 错误！仅选定/排除 正则表达式错误: {e}", "error")
+            return False
 
         kws_cmd_list = []
         if os.path.isfile(kws_cmd_path):
@@ -145,16 +341,82 @@ class GetTestSetAndNorm:
                 kws_cmd_list = [x.strip() for x in kws_cmd_list]
         else:
             kws_cmd_list.append(kws_cmd_path)
+        all_kws_cmd_list = kws_cmd_list
+        command_filter = None
+        if self.ShardPlan is not None:
+            command_filter = self.ShardPlan.owns
+            kws_cmd_list = [kws_cmd for kws_cmd in kws_cmd_list if command_filter(kws_cmd)]
+            self.logger.log(f"[GetTestSetAndNorm]: 提示！分片 {self.ShardPlan.index}/{self.ShardPlan.count} "
+                            f"处理 {len(set(kws_cmd_list))}/{len(set(all_kws_cmd_list))} 条指令", "info")
+
+        #全部指令共用一次遍历得到的索引
+        with self.logger.metrics.timer("getTestSetAndNorm.index"):
+            self.CorpusIndex.load_or_build(input_audio_path, self.index_path, self.rebuild_index, command_filter)
 
         defect_error_kws_cmd_list = []
-        #for kws_cmd in kws_cmd_list:
-        for kws_cmd in tqdm(kws_cmd_list, desc=f"\033[0;36;33m指令测试集处理\033[0m", ncols=150, unit="条"):
-            if not self.__GetTestSetAndNorm(input_audio_path, kws_cmd, set_max_num):
+        #指令 -> 处理状态, 与指令列表顺序一致, 重复的指令只处理一次
+        state_dict = {}
+        for kws_cmd in kws_cmd_list:
+            if kws_cmd in state_dict:
+                continue
+            try:
+                state = self._select_command(input_audio_path, kws_cmd, set_max_num)
+            except OSError as e:
+                self.logger.log(f"[GetTestSetAndNorm]: 错误！{kws_cmd} 处理失败: {e}", "error")
+                state = None
+            if state is None:
+                defect_error_kws_cmd_list.append(kws_cmd)
+            else:
+                state_dict[kws_cmd] = state
+
+        if self.jobs == 1:
+            self._norm_commands(state_dict, set_max_num, None)
+        else:
+            with WorkerPool(AudioBasicProcessing, {"norm_channel": self.norm_channel}, self.jobs, self.logger) as pool:
+                self._norm_commands(state_dict, set_max_num, pool)
+
+        for kws_cmd, state in state_dict.items():
+            if not self._finish_command(kws_cmd, state):
                 defect_error_kws_cmd_list.append(kws_cmd)
+        #缺失报告保持指令列表中的顺序
+        defect_error_kws_cmd_list.sort(key=kws_cmd_list.index)
+        self.logger.metrics.count("getTestSetAndNorm.commands", len(kws_cmd_list))
+        self.logger.metrics.count("getTestSetAndNorm.missing", len(defect_error_kws_cmd_list))
+        if self.ShardPlan is not None:
+            self.ShardPlan.write_result(self.output_root_path, "getTestSetAndNorm",
+                                        {"input_path": input_audio_path, "commands": all_kws_cmd_list,
+                                         "done": list(state_dict), "missing": defect_error_kws_cmd_list})
         if defect_error_kws_cmd_list:
             self.logger.log(f"[GetTestSetAndNorm]: 错误！{input_audio_path} 路径下缺失如下测试集 {defect_error_kws_cmd_list} 请检查", "error")
 
 
+    def merge_shards(self):
+        """
+            功能:
+                    * 合并各分片(shard)的结果, 按指令列表顺序报告缺失的测试集
+            返回值:
+                    * bool 是否合并成功
+        """
+        result_list = ShardPlan.load_results(self.output_root_path, "getTestSetAndNorm", self.logger)
+        if not result_list:
+            return False
+        kws_cmd_list = result_list[0]["commands"]
+        if any(result["commands"] != kws_cmd_list for result in result_list):
+            self.logger.log(f"[GetTestSetAndNorm]: 错误！各分片使用的指令列表不一致，无法合并", "error")
+            return False
+        done_set = set()
+        defect_error_kws_cmd_list = []
+        for result in result_list:
+            done_set.update(result["done"])
+            defect_error_kws_cmd_list.extend(result["missing"])
+        defect_error_kws_cmd_list.sort(key=kws_cmd_list.index)
+        self.logger.log(f"[GetTestSetAndNorm]: 提示！已合并 {len(result_list)}/{result_list[0]['shard'][1]} 个分片，"
+                        f"完成 {len(done_set)}/{len(set(kws_cmd_list))} 条指令", "info")
+        if defect_error_kws_cmd_list:
+            self.logger.log(f"[GetTestSetAndNorm]: 错误！{result_list[0]['input_path']} 路径下缺失如下测试集 {defect_error_kws_cmd_list} 请检查", "error")
+        return True
+
+
 if __name__=="__main__":
     pass
 
@@ -0,0 +1,245 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, sqlite3, threading
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+class MetadataCache:
+    """ 这是一个持久化的音频元数据缓存, 以 路径+大小+修改时间+inode 判断是否有效"""
+
+    #默认缓存文件名, 放在输出目录下
+    CACHE_FILE_NAME = ".audioForgeXS_cache.sqlite"
+    #wav 头字段, 与 GetAudioInfo.readWavHeader 的返回值对应
+    HEAD_FIELDS = ["AudioFormat", "Channels", "Framerate", "ByteRate", "BlockAlign",
+                   "BitsPerSample", "FmtSize", "DataOffset", "DataSize"]
+    #与 HEAD_FIELDS 一一对应的数据库列名
+    HEAD_COLUMNS = ["audio_format", "channels", "framerate", "byte_rate", "block_align",
+                    "bits_per_sample", "fmt_size", "data_offset", "data_size"]
+    #全部缓存值列
+    VALUE_COLUMNS = HEAD_COLUMNS + ["duration", "peak", "md5"]
+    #sqlite 单条语句的参数个数上限
+    SQL_MAX_PARAMS = 900
+
+    def __init__(self, cache_path, logger=None):
+        """
+            功能:
+                    * 打开(不存在则创建)缓存数据库
+            参数:
+                    * cache_path: 缓存文件路径, 为目录时使用目录下的默认文件名
+                    * logger: 日志记录器
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        if os.path.isdir(cache_path):
+            cache_path = os.path.join(cache_path, self.CACHE_FILE_NAME)
+        cache_dir = os.path.dirname(cache_path)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = cache_path
+        #同一连接可能被 StagedExecutor 的读取线程使用, 由 self.lock 串行化访问
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(cache_path, timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""CREATE TABLE IF NOT EXISTS wav_meta (
+                                path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, ino INTEGER,
+                                audio_format INTEGER, channels INTEGER, framerate INTEGER,
+                                byte_rate INTEGER, block_align INTEGER, bits_per_sample INTEGER,
+                                fmt_size INTEGER, data_offset INTEGER, data_size INTEGER,
+                                duration REAL, peak REAL, md5 TEXT)""")
+        #旧版本的缓存没有 inode 列, 补上后旧记录的 inode 为空, 首次访问时视为过期
+        if "ino" not in [row[1] for row in self.conn.execute("PRAGMA table_info(wav_meta)")]:
+            self.conn.execute("ALTER TABLE wav_meta ADD COLUMN ino INTEGER")
+        self.conn.commit()
+        self.hit_count = 0
+        self.miss_count = 0
+        self.logger.log(f"[MetadataCache]: 调试! 打开元数据缓存 {cache_path}", "debug")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+    def close(self):
+        with self.lock:
+            if self.conn is not None:
+                self.conn.commit()
+                self.conn.close()
+                self.conn = None
+
+    def _upsert_sql(self, columns):
+        """
+            功能:
+                    * 生成写入部分字段的 upsert 语句
+                    * 文件大小/修改时间/inode 未变时保留其他字段, 变化时其他字段清空(旧记录作废)
+            参数:
+                    * columns: 本次写入的列名列表
+            返回值:
+                    * str sql 语句, 参数顺序为 path, size, mtime_ns, ino, *columns
+        """
+        unchanged = "wav_meta.size=excluded.size AND wav_meta.mtime_ns=excluded.mtime_ns AND wav_meta.ino=excluded.ino"
+        set_list = [f"{column}=excluded.{column}" for column in columns]
+        set_list += [f"{column}=CASE WHEN {unchanged} THEN wav_meta.{column} END"
+                     for column in self.VALUE_COLUMNS if column not in columns]
+        set_list += ["size=excluded.size", "mtime_ns=excluded.mtime_ns", "ino=excluded.ino"]
+        return (f"INSERT INTO wav_meta (path, size, mtime_ns, ino, {', '.join(columns)}) "
+                f"VALUES ({', '.join('?' * (len(columns) + 4))}) "
+                f"ON CONFLICT(path) DO UPDATE SET {', '.join(set_list)}")
+
+    @staticmethod
+    def _key(path):
+        return os.path.abspath(path)
+
+    @staticmethod
+    def _stat_key(st):
+        return st.st_size, st.st_mtime_ns, st.st_ino
+
+    def _select_rows(self, key_list, columns):
+        """
+            功能:
+                    * 分批查询多条缓存记录
+            返回值:
+                    * dict 路径 -> 记录元组
+        """
+        row_dict = {}
+        for index in range(0, len(key_list), self.SQL_MAX_PARAMS):
+            sub_key_list = key_list[index:index + self.SQL_MAX_PARAMS]
+            sql = f"SELECT path, size, mtime_ns, ino, {columns} FROM wav_meta WHERE path IN ({','.join('?' * len(sub_key_list))})"
+            for row in self.conn.execute(sql, sub_key_list):
+                row_dict[row[0]] = row
+        return row_dict
+
+    def getHeads(self, path_list, stat_list):
+        """
+            功能:
+                    * 批量查询 wav 头缓存, 大小/修改时间/inode 变化的记录视为过期并删除
+            参数:
+                    * path_list: 文件路径列表
+                    * stat_list: 与路径对应的 os.stat 结果
+            返回值:
+                    * list 与输入顺序一致的 head 字典, 未命中为 None
+        """
+        with self.lock:
+            key_list = [self._key(path) for path in path_list]
+            row_dict = self._select_rows(key_list, ", ".join(self.HEAD_COLUMNS))
+            head_list = []
+            stale_key_list = []
+            for key, st in zip(key_list, stat_list):
+                row = row_dict.get(key)
+                if row is None or row[4] is None:
+                    head_list.append(None)
+                    continue
+                if row[1:4] != self._stat_key(st):
+                    stale_key_list.append((key,))
+                    head_list.append(None)
+                    continue
+                head = dict(zip(self.HEAD_FIELDS, row[4:]))
+                head["FileSize"] = st.st_size
+                head_list.append(head)
+            if stale_key_list:
+                self.conn.executemany("DELETE FROM wav_meta WHERE path = ?", stale_key_list)
+                self.conn.commit()
+            hit_num = len(head_list) - head_list.count(None)
+            self.hit_count += hit_num
+            self.miss_count += len(head_list) - hit_num
+            return head_list
+
+    def putHeads(self, path_list, stat_list, head_list, duration_list):
+        """
+            功能:
+                    * 批量写入 wav 头缓存, 一个事务内完成
+            参数:
+                    * path_list: 文件路径列表
+                    * stat_list: 与路径对应的 os.stat 结果
+                    * head_list: readWavHeader 的返回值列表
+                    * duration_list: 时长列表(秒)
+        """
+        with self.lock:
+            rows = []
+            for path, st, head, duration in zip(path_list, stat_list, head_list, duration_list):
+                rows.append((self._key(path),) + self._stat_key(st)
+                            + tuple(head[field] for field in self.HEAD_FIELDS) + (duration,))
+            if not rows:
+                return
+            head_columns = self.HEAD_COLUMNS + ["duration"]
+            self.conn.executemany(self._upsert_sql(head_columns), rows)
+            self.conn.commit()
+
+    def _get_value(self, path, column, st=None):
+        """
+            功能:
+                    * 查询单个文件的某个缓存字段, 过期返回 None
+        """
+        with self.lock:
+            st = st or os.stat(path)
+            key = self._key(path)
+            row = self._select_rows([key], column).get(key)
+            if row is None or row[1:4] != self._stat_key(st) or row[4] is None:
+                self.miss_count += 1
+                return None
+            self.hit_count += 1
+            return row[4]
+
+    def _put_value(self, path, column, value, st=None):
+        """
+            功能:
+                    * 写入单个文件的某个缓存字段, 文件已变化时清空该记录的其他字段
+        """
+        with self.lock:
+            st = st or os.stat(path)
+            self.conn.execute(self._upsert_sql([column]), (self._key(path),) + self._stat_key(st) + (value,))
+            self.conn.commit()
+
+    def getPeak(self, path, st=None):
+        """ 功能: 查询峰值缓存(满幅为 1.0), 未命中返回 None"""
+        return self._get_value(path, "peak", st)
+
+    def putPeak(self, path, peak, st=None):
+        """ 功能: 写入峰值缓存"""
+        self._put_value(path, "peak", float(peak), st)
+
+    def getMd5(self, path, st=None):
+        """ 功能: 查询 MD5 缓存, 未命中返回 None"""
+        return self._get_value(path, "md5", st)
+
+    def putMd5(self, path, md5, st=None):
+        """ 功能: 写入 MD5 缓存"""
+        self._put_value(path, "md5", md5, st)
+
+    def evictMissing(self, root_path, seen_path_list):
+        """
+            功能:
+                    * 删除 root_path 目录下本次遍历未出现(已删除/已移走)的文件记录
+            参数:
+                    * root_path: 本次遍历的根目录
+                    * seen_path_list: 本次遍历到的全部文件路径
+            返回值:
+                    * int 删除的记录数
+        """
+        with self.lock:
+            root_key = os.path.join(self._key(root_path), "")
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen_path (path TEXT PRIMARY KEY)")
+            self.conn.execute("DELETE FROM seen_path")
+            self.conn.executemany("INSERT OR IGNORE INTO seen_path VALUES (?)", ((self._key(path),) for path in seen_path_list))
+            cursor = self.conn.execute("""DELETE FROM wav_meta WHERE substr(path, 1, ?) = ?
+                                          AND path NOT IN (SELECT path FROM seen_path)""", (len(root_key), root_key))
+            self.conn.execute("DELETE FROM seen_path")
+            self.conn.commit()
+            if cursor.rowcount:
+                self.logger.log(f"[MetadataCache]: 调试! 清理 {root_path} 下已不存在的缓存记录 {cursor.rowcount} 条", "debug")
+            return cursor.rowcount
+
+
+if __name__=="__main__":
+    pass
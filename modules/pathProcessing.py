@@ -2,6 +2,7 @@
 # -*- coding: utf-8 -*-
 
 import sys, os, re
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 try:
     from modules.debugLogger import DebugLogger
@@ -14,41 +15,134 @@ __version__="1.0.1"
 
 class PathProcessing:
     """ 这是一个处理路径相关的类"""
+
+    #编辑器临时文件, 始终跳过
+    SWP_PATTERN = re.compile(r"\.swp$")
+
     def __init__(self, logger=None):
         self.skip_list = []
         self.logger = logger
         if not self.logger:
             self.logger = DebugLogger()
+        #预编译的文件匹配规则
+        self.pattern_dict = {}
 
-    def get_file_list(self, dir_path, lock_regular=".c"):
+    def _get_pattern(self, lock_regular):
+        pattern = self.pattern_dict.get(lock_regular)
+        if pattern is None:
+            pattern = re.compile(lock_regular, re.I)
+            self.pattern_dict[lock_regular] = pattern
+        return pattern
+
+    def _scan_dir(self, dir_path, pattern):
         """
             功能:
-                    * 递归获取指定目录下指定类型的文件列表
+                    * 单次 scandir 列出目录, 区分子目录与匹配的文件
+            参数:
+                    * str 目录路径 dir_path
+                    * re.Pattern 预编译的文件匹配规则 pattern
+            返回值:
+                    * tuple (匹配文件列表, 子目录列表)
+        """
+        file_list, sub_dir_list = [], []
+        try:
+            with os.scandir(dir_path) as entry_iter:
+                for entry in entry_iter:
+                    if entry.is_dir():
+                        sub_dir_list.append(entry.path)
+                    elif pattern.search(entry.path) and not self.SWP_PATTERN.search(entry.path):
+                        file_list.append(entry.path)
+        except OSError as e:
+            self.logger.log(f"[PathProcessing]: 警告! 无法读取目录 {dir_path}, 因 {e}", "warning")
+        return file_list, sub_dir_list
+
+    def iter_file_list(self, dir_path, lock_regular=".c", threads=0):
+        """
+            功能:
+                    * 基于 os.scandir 递归、惰性地遍历指定目录下指定类型的文件
+                    * 边遍历边返回, 调用方可以在遍历完成前开始处理
             参数：
                     * str 文件目录路径 dir_path
                     * str 锁定文件的正则表达式 lock_regular
+                    * int 并行遍历子目录的线程数 threads, 0 为单线程(顺序与 get_file_list 一致)
             返回值:
-                    * list 文件列表 flist
+                    * 生成器 文件路径
         """
-        flist = []
+        pattern = self._get_pattern(lock_regular)
         if not os.path.exists(dir_path):
             self.logger.log(f"[PathProcessing]: 错误! {dir_path} 路径下, 指定 {lock_regular} 规则文件不存在", "Error")
-            return flist
-        else:
-            if os.path.isfile(dir_path):
-                if re.findall(lock_regular, dir_path, re.I) and not re.findall("\.swp$", dir_path):
-                    flist.append(dir_path)
-                    return flist
-                else:
-                    return flist
-            else:
-                for i in os.listdir(dir_path):
-                    tmp_path = os.path.join(dir_path,i)
-                    if os.path.isdir(tmp_path) and os.listdir(tmp_path):
-                        flist.extend(self.get_file_list(tmp_path, lock_regular))
-                    elif re.findall(lock_regular, tmp_path, re.I) and not re.findall("\.swp$", tmp_path):
-                        flist.append(tmp_path)
-                return flist
+            return
+        if os.path.isfile(dir_path):
+            if pattern.search(dir_path) and not self.SWP_PATTERN.search(dir_path):
+                yield dir_path
+            return
+
+        if threads > 0:
+            yield from self._iter_file_list_threads(dir_path, pattern, threads)
+            return
+
+        #深度优先, 与原递归实现的输出顺序一致
+        scandir_stack = [os.scandir(dir_path)]
+        try:
+            while scandir_stack:
+                entry = next(scandir_stack[-1], None)
+                if entry is None:
+                    scandir_stack.pop().close()
+                    continue
+                if entry.is_dir():
+                    try:
+                        scandir_stack.append(os.scandir(entry.path))
+                    except OSError as e:
+                        self.logger.log(f"[PathProcessing]: 警告! 无法读取目录 {entry.path}, 因 {e}", "warning")
+                elif pattern.search(entry.path) and not self.SWP_PATTERN.search(entry.path):
+                    yield entry.path
+        finally:
+            for entry_iter in scandir_stack:
+                entry_iter.close()
+
+    def _iter_file_list_threads(self, dir_path, pattern, threads):
+        """
+            功能:
+                    * 多线程并行遍历子目录, 适合网络存储上的超大目录树, 输出顺序不固定
+        """
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            pending = {executor.submit(self._scan_dir, dir_path, pattern)}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    file_list, sub_dir_list = future.result()
+                    for sub_dir in sub_dir_list:
+                        pending.add(executor.submit(self._scan_dir, sub_dir, pattern))
+                    yield from file_list
+
+    def get_file_list(self, dir_path, lock_regular=".c", threads=0):
+        """
+            功能:
+                    * 递归获取指定目录下指定类型的文件列表
+            参数：
+                    * str 文件目录路径 dir_path
+                    * str 锁定文件的正则表达式 lock_regular
+                    * int 并行遍历子目录的线程数 threads
+            返回值:
+                    * list 文件列表 flist
+        """
+        return list(self.iter_file_list(dir_path, lock_regular, threads))
+
+    @staticmethod
+    def mirror_path(output_root_path, input_path):
+        """
+            功能:
+                    * 输入路径 -> 输出目录下的镜像路径
+                    * 去掉盘符、根目录及开头的 .., 绝对路径或 ../ 开头的输入也在输出目录下, 不会指回输入本身
+            参数：
+                    * str 输出目录 output_root_path
+                    * str 输入文件或目录路径 input_path
+            返回值:
+                    * str 镜像路径
+        """
+        part_list = os.path.splitdrive(os.path.normpath(input_path))[1].replace("\\", "/").split("/")
+        part_list = [part for part in part_list if part not in ("", ".", "..")]
+        return os.path.join(output_root_path, *part_list)
 
 if __name__=="__main__":
     pass
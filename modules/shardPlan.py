@@ -0,0 +1,152 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, json, glob, hashlib
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+class ShardPlan:
+    """ 这是一个多机分片运行的划分, 按稳定哈希把文件/指令分到 N 个分片, 各分片的结果再合并"""
+
+    #分片结果目录, 放在输出目录下
+    SHARD_DIR_NAME = ".audioForgeXS_shards"
+
+    def __init__(self, shard_spec, logger=None):
+        """
+            功能:
+                    * 解析分片设置
+            参数:
+                    * shard_spec: "K/N", 表示共 N 个分片中的第 K 个(从 1 开始)
+                    * logger: 日志记录器
+            异常:
+                    * ValueError: 格式错误或 K 不在 1~N 内
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        try:
+            index, count = (int(value) for value in shard_spec.split("/"))
+        except ValueError:
+            raise ValueError(f"分片 {shard_spec} 格式错误，应为 K/N，例如 1/4")
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"分片 {shard_spec} 错误，K 需在 1~N 之间")
+        self.index = index
+        self.count = count
+
+    @property
+    def suffix(self):
+        return f"{self.index}-of-{self.count}"
+
+    @staticmethod
+    def shard_of(key, count):
+        """
+            功能:
+                    * 键 -> 所属分片(从 1 开始), 与机器、进程和 python 的哈希随机化无关
+        """
+        return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big") % count + 1
+
+    def owns(self, key):
+        return self.shard_of(key, self.count) == self.index
+
+    @staticmethod
+    def relative_key(path, root_path, root_is_dir):
+        """
+            功能:
+                    * 分片所用的键: 相对输入根目录的路径, 以 / 分隔, 不同机器的挂载位置不同时结果一致
+            参数:
+                    * path: 文件路径
+                    * root_path: 输入路径
+                    * root_is_dir: 输入路径是否为目录, 由调用方在遍历前判断一次; 为文件时以文件名为键
+        """
+        if root_is_dir:
+            path = os.path.relpath(path, root_path)
+        else:
+            path = os.path.basename(path)
+        return path.replace(os.sep, "/")
+
+    def shard_path(self, file_path):
+        """
+            功能:
+                    * 分片各自使用的文件路径(如处理记录、元数据缓存), 在扩展名前加分片后缀
+        """
+        base_path, ext = os.path.splitext(file_path)
+        return f"{base_path}.{self.suffix}{ext}"
+
+    @staticmethod
+    def shard_files(file_path):
+        """
+            功能:
+                    * 已存在的各分片的 shard_path 文件, 用于合并
+        """
+        base_path, ext = os.path.splitext(file_path)
+        return sorted(glob.glob(f"{glob.escape(base_path)}.*-of-*{glob.escape(ext)}"))
+
+    @classmethod
+    def result_path(cls, output_root_path, name, suffix):
+        return os.path.join(output_root_path, cls.SHARD_DIR_NAME, f"{name}.{suffix}.json")
+
+    def write_result(self, output_root_path, name, result):
+        """
+            功能:
+                    * 写出本分片的结果, 先写临时文件再替换, 中断时不会留下不完整的结果
+            参数:
+                    * output_root_path: 输出目录
+                    * name: 结果名称(功能名称)
+                    * result: dict 可写入 json 的结果
+            返回值:
+                    * str 结果文件路径
+        """
+        result_path = self.result_path(output_root_path, name, self.suffix)
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+        temp_path = f"{result_path}.{os.getpid()}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(dict(result, shard=[self.index, self.count]), f, ensure_ascii=False)
+        os.replace(temp_path, result_path)
+        self.logger.log(f"[ShardPlan]: 提示! 分片 {self.index}/{self.count} 的结果已写入 {result_path}", "info")
+        return result_path
+
+    @classmethod
+    def load_results(cls, output_root_path, name, logger=None):
+        """
+            功能:
+                    * 读取全部分片的结果, 分片数不一致时报错, 缺少分片时警告
+            参数:
+                    * output_root_path: 输出目录
+                    * name: 结果名称(功能名称)
+                    * logger: 日志记录器
+            返回值:
+                    * list 按分片序号排序的结果, 没有结果或分片数不一致时返回 False
+        """
+        logger = logger or DebugLogger()
+        result_list = []
+        for result_path in sorted(glob.glob(cls.result_path(glob.escape(output_root_path), glob.escape(name), "*-of-*"))):
+            try:
+                with open(result_path, "r", encoding="utf-8") as f:
+                    result_list.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.log(f"[ShardPlan]: 错误! 分片结果 {result_path} 读取失败: {e}", "error")
+                return False
+        if not result_list:
+            logger.log(f"[ShardPlan]: 错误! {os.path.join(output_root_path, cls.SHARD_DIR_NAME)} 下没有 {name} 的分片结果", "error")
+            return False
+        count_set = {result["shard"][1] for result in result_list}
+        if len(count_set) != 1:
+            logger.log(f"[ShardPlan]: 错误! {name} 的分片结果来自不同的分片数 {sorted(count_set)}，请删除旧的结果后重新运行", "error")
+            return False
+        result_list.sort(key=lambda result: result["shard"][0])
+        count = count_set.pop()
+        missing_list = sorted(set(range(1, count + 1)) - {result["shard"][0] for result in result_list})
+        if missing_list:
+            logger.log(f"[ShardPlan]: 警告! {name} 缺少分片 {missing_list} (共 {count} 个)，合并结果不完整", "warning")
+        return result_list
+
+
+if __name__=="__main__":
+    pass
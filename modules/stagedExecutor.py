@@ -0,0 +1,243 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import sys, threading, queue
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+#队列结束标记
+_STOP = object()
+
+
+#等待额度/队列时检查是否已停止的间隔(秒)
+_WAIT_SECONDS = 0.1
+
+
+class _ByteBudget:
+    """ 这是一个按字节计数的内存额度, 超出额度时阻塞申请方"""
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.cond = threading.Condition()
+
+    def acquire(self, size, stop_event):
+        """
+            功能:
+                    * 申请额度, 已用额度为 0 时总是放行, 单个超过额度的文件也能单独处理
+            返回值:
+                    * bool 是否申请成功, 等待期间 stop_event 置位时放弃申请
+        """
+        with self.cond:
+            while self.used and self.used + size > self.limit:
+                if stop_event.is_set():
+                    return False
+                self.cond.wait(_WAIT_SECONDS)
+            self.used += size
+            return True
+
+    def release(self, size):
+        with self.cond:
+            self.used -= size
+            self.cond.notify_all()
+
+    def wake(self):
+        """ 功能: 唤醒全部等待额度的线程, 停止时使用"""
+        with self.cond:
+            self.cond.notify_all()
+
+
+def _put(out_queue, item, stop_event):
+    """
+        功能:
+                * 向有界队列放入数据, 队列满时定期检查是否已停止
+        返回值:
+                * bool 是否放入, 已停止时返回 False
+    """
+    while not stop_event.is_set():
+        try:
+            out_queue.put(item, timeout=_WAIT_SECONDS)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _get(in_queue, stop_event):
+    """
+        功能:
+                * 从队列取数据, 队列空时定期检查是否已停止
+        返回值:
+                * 取到的数据, 已停止时返回结束标记
+    """
+    while not stop_event.is_set():
+        try:
+            return in_queue.get(timeout=_WAIT_SECONDS)
+        except queue.Empty:
+            continue
+    return _STOP
+
+
+class StagedExecutor:
+    """ 这是一个读取/计算/写出三段重叠执行的引擎, 各段之间用有界队列连接"""
+    def __init__(self, pipeline, queue_depth=4, memory_budget=1024 * 1024 * 1024, read_threads=2, compute_threads=1,
+                 write_threads=2, logger=None):
+        """
+            功能:
+                    * 初始化执行引擎参数
+            参数:
+                    * pipeline: AudioPipeline 对象, 提供 output_path/read/transform/write 各步骤
+                    * queue_depth: 每段之间队列的长度, 队列满时上游阻塞(背压)
+                    * memory_budget: 同时在内存中的音频数据字节数上限
+                    * read_threads/compute_threads/write_threads: 各段线程数
+                    * logger: 日志记录器
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        self.pipeline = pipeline
+        self.queue_depth = max(1, queue_depth)
+        self.memory_budget = max(1, memory_budget)
+        self.thread_num_list = [max(1, read_threads), max(1, compute_threads), max(1, write_threads)]
+
+    def _read_stage(self, task_iter, task_lock, out_queue, result_queue, budget, stop_event):
+        """
+            功能:
+                    * 读取段: 确定输出路径并读入音频, 读入前按解码后的大小申请内存额度
+        """
+        while not stop_event.is_set():
+            with task_lock:
+                task = next(task_iter, _STOP)
+            if task is _STOP:
+                return
+            input_audio_path, output_audio_path, fill_para = task
+            stage_list = fill_para["stages"]
+            para_dict = fill_para.get("paras", {})
+            size = 0
+            try:
+                final_output_path = self.pipeline.output_path(input_audio_path, output_audio_path, stage_list)
+                if not final_output_path:
+                    result_queue.put((input_audio_path, True, False, None))
+                    continue
+                size = self.pipeline.estimate_size(input_audio_path, stage_list, para_dict)
+                if not budget.acquire(size, stop_event):
+                    return
+                with self.logger.metrics.timer("staged.read"):
+                    sig, fs, subtype = self.pipeline.read(input_audio_path, stage_list, para_dict)
+                if not _put(out_queue, (input_audio_path, final_output_path, fill_para, size, sig, fs, subtype), stop_event):
+                    return
+            except Exception as e:
+                budget.release(size)
+                result_queue.put((input_audio_path, False, None, f"{type(e).__name__}: {e}"))
+
+    def _compute_stage(self, in_queue, out_queue, result_queue, budget, stop_event):
+        """
+            功能:
+                    * 计算段: 在内存中执行各处理步骤
+        """
+        while True:
+            item = _get(in_queue, stop_event)
+            if item is _STOP:
+                return
+            input_audio_path, final_output_path, fill_para, size, sig, fs, subtype = item
+            try:
+                with self.logger.metrics.timer("staged.compute"):
+                    sig = self.pipeline.transform(sig, fill_para["stages"], fill_para.get("paras", {}))
+                if not _put(out_queue, (input_audio_path, final_output_path, fill_para, size, sig, fs, subtype), stop_event):
+                    return
+            except Exception as e:
+                budget.release(size)
+                result_queue.put((input_audio_path, False, None, f"{type(e).__name__}: {e}"))
+
+    def _write_stage(self, in_queue, result_queue, budget, stop_event):
+        """
+            功能:
+                    * 写出段: 写出结果后归还内存额度
+        """
+        while True:
+            item = _get(in_queue, stop_event)
+            if item is _STOP:
+                return
+            input_audio_path, final_output_path, fill_para, size, sig, fs, subtype = item
+            try:
+                with self.logger.metrics.timer("staged.write"):
+                    final_output_path = self.pipeline.write(sig, fs, subtype, final_output_path)
+                self.logger.log("[StagedExecutor]: %s 处理成功，新文件 %s", "debug", input_audio_path, final_output_path)
+                result_queue.put((input_audio_path, True, True, None))
+            except Exception as e:
+                result_queue.put((input_audio_path, False, None, f"{type(e).__name__}: {e}"))
+            finally:
+                del sig
+                budget.release(size)
+
+    def _run_stage(self, target, args, thread_num, next_queue, next_thread_num, stop_event):
+        """
+            功能:
+                    * 启动一段的全部线程, 该段全部线程结束后向下游发送结束标记
+            返回值:
+                    * list 该段的全部线程(含发送结束标记的线程)
+        """
+        thread_list = [threading.Thread(target=target, args=args, daemon=True) for _ in range(thread_num)]
+        for thread in thread_list:
+            thread.start()
+
+        def close():
+            for thread in thread_list:
+                thread.join()
+            for _ in range(next_thread_num):
+                if not _put(next_queue, _STOP, stop_event):
+                    return
+
+        closer = threading.Thread(target=close, daemon=True)
+        closer.start()
+        return thread_list + [closer]
+
+    def imap(self, task_iterable):
+        """
+            功能:
+                    * 三段重叠执行全部任务, 按完成顺序返回结果
+            参数:
+                    * task_iterable: 每个任务为 (输入路径, 镜像输出路径, {"stages": 步骤列表, "paras": 步骤 -> 参数})
+            返回值:
+                    * 生成器 (输入路径, 是否成功, 返回值, 错误信息)
+        """
+        read_threads, compute_threads, write_threads = self.thread_num_list
+        read_queue = queue.Queue(self.queue_depth)
+        write_queue = queue.Queue(self.queue_depth)
+        result_queue = queue.Queue()
+        #每次运行使用各自的停止标记与内存额度, 不受之前运行遗留线程的影响
+        stop_event = threading.Event()
+        budget = _ByteBudget(self.memory_budget)
+        self.logger.log(f"[StagedExecutor]: 调试! 读取/计算/写出线程 {read_threads}/{compute_threads}/{write_threads}, "
+                        f"队列长度 {self.queue_depth}, 内存额度 {self.memory_budget} 字节", "debug")
+
+        thread_list = []
+        try:
+            thread_list += self._run_stage(self._read_stage,
+                                           (iter(task_iterable), threading.Lock(), read_queue, result_queue, budget, stop_event),
+                                           read_threads, read_queue, compute_threads, stop_event)
+            thread_list += self._run_stage(self._compute_stage, (read_queue, write_queue, result_queue, budget, stop_event),
+                                           compute_threads, write_queue, write_threads, stop_event)
+            thread_list += self._run_stage(self._write_stage, (write_queue, result_queue, budget, stop_event),
+                                           write_threads, result_queue, 1, stop_event)
+            while True:
+                result = result_queue.get()
+                if result is _STOP:
+                    return
+                yield result
+        finally:
+            #调用方提前结束时通知各段停止(含等待额度/队列的线程), 等待全部线程退出
+            stop_event.set()
+            budget.wake()
+            for thread in thread_list:
+                thread.join()
+
+
+if __name__=="__main__":
+    pass
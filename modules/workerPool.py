@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, itertools, multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from modules.debugLogger import DebugLogger
+except ImportError:
+    sys.path.append("../")
+    from modules.debugLogger import DebugLogger
+
+__version__="1.0.0"
+
+
+#每个工作进程内只初始化一次的处理对象
+_worker_obj = None
+
+
+def _init_worker(factory, factory_kwargs):
+    """
+        功能:
+                * 工作进程初始化, 每个进程只构造一次处理对象
+        参数:
+                * factory: 处理对象的类(必须可被 pickle, 即模块级的类)
+                * factory_kwargs: 构造参数
+        返回值:
+                * /
+    """
+    global _worker_obj
+    _worker_obj = factory(**factory_kwargs)
+
+
+def _run_task(task):
+    """
+        功能:
+                * 在工作进程中执行单个任务, 异常在进程内捕获后回传
+        参数:
+                * task: (方法名, 参数元组)
+        返回值:
+                * tuple (是否成功, 返回值, 错误信息, 本任务产生的指标)
+    """
+    method_name, args = task
+    try:
+        ok, res, err = True, getattr(_worker_obj, method_name)(*args), None
+    except Exception as e:
+        ok, res, err = False, None, f"{type(e).__name__}: {e}"
+    logger = getattr(_worker_obj, "logger", None)
+    return ok, res, err, logger.metrics.drain() if logger is not None else None
+
+
+def _run_chunk(task_list):
+    """
+        功能:
+                * 在工作进程中依次执行一批任务, 减少进程间通信次数
+        参数:
+                * task_list: 任务列表
+        返回值:
+                * list 各任务的 _run_task 结果
+    """
+    return [_run_task(task) for task in task_list]
+
+
+class WorkerPool:
+    """ 这是一个多进程任务池, 按提交顺序返回结果"""
+    def __init__(self, factory, factory_kwargs=None, jobs=1, logger=None):
+        """
+            功能:
+                    * 初始化进程池参数
+            参数:
+                    * factory: 工作进程内构造处理对象的类
+                    * factory_kwargs: 构造参数字典
+                    * jobs: 进程数, 0 表示使用全部 CPU 核
+                    * logger: 日志记录器
+        """
+        self.logger = logger
+        if not self.logger:
+            self.logger = DebugLogger()
+        self.factory = factory
+        self.factory_kwargs = factory_kwargs or {}
+        self.jobs = jobs if jobs and jobs > 0 else (os.cpu_count() or 1)
+        self.executor = None
+
+    def __enter__(self):
+        # 统一使用 spawn, 保证 linux/windows/macos 行为一致, 也避免 fork 继承父进程的日志句柄
+        self.executor = ProcessPoolExecutor(max_workers=self.jobs,
+                                            mp_context=multiprocessing.get_context("spawn"),
+                                            initializer=_init_worker,
+                                            initargs=(self.factory, self.factory_kwargs))
+        self.logger.log(f"[WorkerPool]: 调试! 启动 {self.jobs} 个工作进程", "debug")
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.executor.shutdown(wait=True)
+        self.executor = None
+        return False
+
+    def imap(self, method_name, args_iterable, chunksize=16):
+        """
+            功能:
+                    * 把任务分发到各工作进程, 结果按输入顺序逐个返回
+                    * 同时在途的任务约为 jobs * chunksize * 2 个, 按需从输入中读取, 超大目录也不会一次提交全部任务
+            参数:
+                    * method_name: 工作进程内处理对象的方法名
+                    * args_iterable: 每个任务的参数元组
+                    * chunksize: 每次发送给工作进程的任务数, 短音频多时调大可减少进程间通信
+            返回值:
+                    * 生成器 (是否成功, 返回值, 错误信息), 工作进程的指标合并到本进程的记录器
+        """
+        tasks = ((method_name, args) for args in args_iterable)
+        pending = deque()
+
+        def submit():
+            task_list = list(itertools.islice(tasks, chunksize))
+            if task_list:
+                pending.append(self.executor.submit(_run_chunk, task_list))
+            return bool(task_list)
+
+        try:
+            while len(pending) < self.jobs * 2 and submit():
+                pass
+            while pending:
+                result_list = pending.popleft().result()
+                #先补充一批再返回结果, 调用方处理结果时工作进程不空闲
+                submit()
+                for ok, res, err, metrics in result_list:
+                    self.logger.metrics.merge(metrics)
+                    yield ok, res, err
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+if __name__=="__main__":
+    pass
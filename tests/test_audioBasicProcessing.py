@@ -0,0 +1,252 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.audioBasicProcessing import AudioBasicProcessing
+
+
+@pytest.mark.parametrize("dtype", [np.int16, np.int32])
+def test_peak_negative_full_scale(dtype):
+    full_scale = np.iinfo(dtype).min
+    sig = np.array([1000, full_scale, 5], dtype)
+    assert AudioBasicProcessing()._peak(sig) == 1.0
+    assert AudioBasicProcessing()._peak(sig.reshape(-1, 1)) == 1.0
+
+
+@pytest.mark.parametrize("subtype, dtype", [("PCM_16", np.int16), ("PCM_32", np.int32)])
+@pytest.mark.parametrize("block_size", [0, 2])
+def test_norm_negative_full_scale_unchanged(tmp_path, subtype, dtype, block_size):
+    sig = np.array([0, 1000, np.iinfo(dtype).min, 500], dtype)
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    sf.write(input_path, sig, 16000, subtype=subtype)
+
+    assert AudioBasicProcessing(block_size=block_size).wavNorm(input_path, output_path, 1.0)
+    out, _ = sf.read(output_path, dtype=dtype.__name__)
+    assert out.tolist() == sig.tolist()
+
+
+@pytest.mark.parametrize("subtype", ["PCM_16", "PCM_24", "FLOAT"])
+@pytest.mark.parametrize("channel", [0, 1, "mean"])
+@pytest.mark.parametrize("block_size", [1, 7, 4096])
+def test_block_norm_matches_whole_file(tmp_path, subtype, channel, block_size):
+    sig = np.random.default_rng(0).uniform(-0.5, 0.5, (1000, 2))
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, sig, 16000, subtype=subtype)
+    whole_path = str(tmp_path / "whole.wav")
+    block_path = str(tmp_path / "block.wav")
+
+    assert AudioBasicProcessing().wavNorm(input_path, whole_path, 0.9, channel)
+    assert AudioBasicProcessing(block_size=block_size).wavNorm(input_path, block_path, 0.9, channel)
+    #浮点 wav 的 PEAK 块含写出时间, 只比较编码与采样值
+    assert sf.info(block_path).subtype == sf.info(whole_path).subtype == subtype
+    dtype = AudioBasicProcessing().native_dtype(subtype)
+    assert np.array_equal(sf.read(whole_path, dtype=dtype)[0], sf.read(block_path, dtype=dtype)[0])
+
+
+def test_block_norm_silent_fails(tmp_path):
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, np.zeros(100, np.int16), 16000, subtype="PCM_16")
+    assert not AudioBasicProcessing(block_size=16).wavNorm(input_path, str(tmp_path / "out.wav"))
+    assert not os.path.exists(tmp_path / "out.wav")
+
+
+def _fail_copy(*args):
+    raise OSError("unsupported")
+
+
+@pytest.mark.parametrize("copy_mode", ["kernel", "sendfile", "read"])
+@pytest.mark.parametrize("channels, framerate, sampwidth, data_size", [(1, 16000, 2, 3200), (2, 48000, 3, 6006),
+                                                                        (1, 8000, 1, 801), (2, 16000, 2, 4003)])
+def test_pcm_to_wav_matches_wave(tmp_path, monkeypatch, copy_mode, channels, framerate, sampwidth, data_size):
+    import wave
+    if copy_mode in ["sendfile", "read"]:
+        monkeypatch.setattr(os, "copy_file_range", _fail_copy, raising=False)
+    if copy_mode == "read":
+        monkeypatch.setattr(os, "sendfile", _fail_copy, raising=False)
+    monkeypatch.setattr(AudioBasicProcessing, "COPY_CHUNK_SIZE", 1000)
+    payload = os.urandom(data_size)
+    input_path = str(tmp_path / "in.pcm")
+    with open(input_path, "wb") as f:
+        f.write(payload)
+    fill_para = {"channels": channels, "Framerate": framerate, "SampleEncoding": sampwidth * 8}
+
+    assert AudioBasicProcessing().pcmToWav(input_path, str(tmp_path / "out.pcm"), fill_para)
+    frame_size = channels * sampwidth
+    with wave.open(str(tmp_path / "out.wav"), "rb") as f:
+        assert (f.getnchannels(), f.getframerate(), f.getsampwidth()) == (channels, framerate, sampwidth)
+        assert f.readframes(f.getnframes()) == payload[:data_size - data_size % frame_size]
+    #奇数长度的 data 块补齐一个字节, RIFF 长度与文件长度一致
+    wav_size = os.path.getsize(tmp_path / "out.wav")
+    with open(tmp_path / "out.wav", "rb") as f:
+        assert int.from_bytes(f.read(8)[4:], "little") == wav_size - 8
+    assert wav_size % 2 == 0
+
+
+def test_pcm_to_wav_bad_para(tmp_path):
+    input_path = str(tmp_path / "in.pcm")
+    open(input_path, "wb").close()
+    assert not AudioBasicProcessing().pcmToWav(input_path, str(tmp_path / "out.wav"), {"channels": 1, "Framerate": 16000})
+    assert not os.path.exists(tmp_path / "out.wav")
+
+
+def old_head_repair(input_path, output_path, fill_para):
+    """ 原实现: 跳过前 44 字节, 用 wave 重写整个文件"""
+    import wave
+    with open(input_path, "rb") as fd:
+        fd.seek(44)
+        wav_data = fd.read()
+    with wave.open(output_path, "wb") as wavf:
+        wavf.setnchannels(int(fill_para["channels"]))
+        wavf.setsampwidth(int(fill_para["SampleEncoding"]) // 8)
+        wavf.setframerate(int(fill_para["Framerate"]))
+        wavf.writeframes(wav_data)
+
+
+@pytest.mark.parametrize("header_type", ["wrong_para", "zeroed"])
+def test_head_repair_matches_old(tmp_path, header_type):
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, np.arange(-500, 500, dtype=np.int16).reshape(-1, 2), 8000, subtype="PCM_16")
+    with open(input_path, "r+b") as f:
+        if header_type == "zeroed":
+            f.write(b"\x00" * 44)
+    fill_para = {"channels": 1, "Framerate": 16000, "SampleEncoding": 16}
+    old_path = str(tmp_path / "old.wav")
+    old_head_repair(input_path, old_path, fill_para)
+    with open(old_path, "rb") as f:
+        old_bytes = f.read()
+
+    copy_path = str(tmp_path / "copy.wav")
+    assert AudioBasicProcessing().wavHeadRepair(input_path, copy_path, fill_para)
+    assert AudioBasicProcessing().wavHeadRepair(input_path, input_path, fill_para)
+    for path in [copy_path, input_path]:
+        with open(path, "rb") as f:
+            assert f.read() == old_bytes
+
+
+def test_head_repair_keeps_list_chunk(tmp_path):
+    from modules.getAudioInfo import GetAudioInfo
+    input_path = str(tmp_path / "in.wav")
+    sig = np.arange(-500, 501, dtype=np.int16)
+    with sf.SoundFile(input_path, "w", 8000, 1, subtype="PCM_16") as f:
+        f.comment = "audioForgeXS"
+        f.write(sig)
+    head = GetAudioInfo().readWavHeader(input_path)
+    assert head["DataOffset"] > 44
+
+    assert AudioBasicProcessing().wavHeadRepair(input_path, input_path, {"channels": 1, "Framerate": 16000, "SampleEncoding": 16})
+    repaired_head = GetAudioInfo().readWavHeader(input_path)
+    assert (repaired_head["Framerate"], repaired_head["DataOffset"]) == (16000, head["DataOffset"])
+    out, fs = sf.read(input_path, dtype="int16")
+    assert fs == 16000 and out.tolist() == sig.tolist()
+
+
+@pytest.mark.parametrize("channel", [0, 2, "2", "mean"])
+@pytest.mark.parametrize("block_size", [0, 64])
+def test_fused_channel_norm_matches_select_then_norm(tmp_path, monkeypatch, channel, block_size):
+    monkeypatch.chdir(tmp_path)
+    sig = np.random.default_rng(1).uniform(-0.5, 0.5, (500, 3)).astype(np.float32)
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    sf.write(input_path, sig, 16000, subtype="FLOAT")
+
+    assert AudioBasicProcessing(block_size=block_size).wavNorm(input_path, output_path, 0.8, channel)
+    mono = sig.mean(axis=1, dtype=np.float32) if channel == "mean" else sig[:, int(channel)]
+    expected = mono * np.float32(0.8 / np.abs(mono).max())
+    out, _ = sf.read(output_path, dtype="float32")
+    assert np.allclose(out, expected, rtol=0, atol=1e-6)
+    assert sorted(os.listdir(tmp_path)) == ["in.wav", "out.wav"]
+
+
+def test_fused_channel_norm_bad_channel(tmp_path):
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, np.zeros((10, 2), np.int16) + 100, 16000, subtype="PCM_16")
+    for channel in [2, -1, "left"]:
+        assert not AudioBasicProcessing().wavNorm(input_path, str(tmp_path / "out.wav"), 1, channel)
+    assert not os.path.exists(tmp_path / "out.wav")
+
+
+@pytest.mark.parametrize("subtype, dtype", [("PCM_16", "int16"), ("PCM_24", "int32"), ("PCM_32", "int32"), ("FLOAT", "float32")])
+@pytest.mark.parametrize("block_size", [0, 100])
+def test_norm_keeps_native_format(tmp_path, subtype, dtype, block_size):
+    processing = AudioBasicProcessing(block_size=block_size)
+    assert processing.native_dtype(subtype) == dtype
+    input_path = str(tmp_path / "in.wav")
+    output_path = str(tmp_path / "out.wav")
+    sf.write(input_path, np.random.default_rng(2).uniform(-0.25, 0.25, 1000), 16000, subtype=subtype)
+
+    assert processing.wavNorm(input_path, output_path, 0.5)
+    assert sf.info(output_path).subtype == subtype
+    sig, _ = sf.read(input_path, dtype=dtype)
+    out, _ = sf.read(output_path, dtype=dtype)
+    if dtype == "float32":
+        assert np.allclose(out, sig * (0.5 / np.abs(sig).max()), rtol=0, atol=1e-6)
+    else:
+        #整数域缩放, 与按 float64 计算后四舍五入最多相差输出位宽的 1 个最小单位
+        peak = max(int(sig.max()), -int(sig.min()))
+        expected = np.rint(sig.astype(np.float64) * (0.5 * (1 << (8 * np.dtype(dtype).itemsize - 1)) / peak))
+        lsb = 1 << (8 * np.dtype(dtype).itemsize - int(subtype.split("_")[1]))
+        assert np.abs(out - expected).max() <= lsb
+
+
+@pytest.mark.parametrize("subtype", ["FLOAT", "DOUBLE", "PCM_24"])
+@pytest.mark.parametrize("block_size", [0, 64])
+def test_subtype_override(tmp_path, subtype, block_size):
+    from modules.audioPipeline import AudioPipeline
+    input_path = str(tmp_path / "in.wav")
+    sig = np.stack([np.arange(-100, 100), np.arange(100, -100, -1)], axis=1).astype(np.int16)
+    sf.write(input_path, sig, 16000, subtype="PCM_16")
+    processing = AudioBasicProcessing(block_size=block_size, subtype=subtype)
+
+    assert processing.wavNorm(input_path, str(tmp_path / "norm.wav"), 1.0)
+    assert processing.getMono(input_path, str(tmp_path / "mono.wav"), "all")
+    assert AudioPipeline(str(tmp_path), basic_processing=processing).run(input_path, str(tmp_path / "pipeline.wav"),
+                                                                         {"stages": ["audioNorm"], "paras": {"audioNorm": 1.0}})
+    expected_list = [("norm.wav", sig[:, 0] / 100), ("mono_ch0.wav", sig[:, 0] / 32768), ("mono_ch1.wav", sig[:, 1] / 32768),
+                     ("pipeline.wav", sig[:, 0] / 100)]
+    for file_name, expected in expected_list:
+        assert sf.info(str(tmp_path / file_name)).subtype == subtype
+        out, _ = sf.read(str(tmp_path / file_name))
+        assert np.allclose(out, expected, rtol=0, atol=1e-4)
+
+
+@pytest.mark.parametrize("subtype, dtype", [("PCM_16", "int16"), ("PCM_24", "int32"), ("FLOAT", "float32")])
+@pytest.mark.parametrize("block_size", [0, 1, 37])
+def test_get_mono_split_matches_channels(tmp_path, subtype, dtype, block_size):
+    sig = np.random.default_rng(3).uniform(-0.5, 0.5, (301, 3))
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, sig, 16000, subtype=subtype)
+    sig, _ = sf.read(input_path, dtype=dtype)
+    processing = AudioBasicProcessing(block_size=block_size)
+    output_path = str(tmp_path / "out.wav")
+
+    assert processing.mono_output_paths(input_path, output_path, "all,mean,mix=0.5:0.25:0.25") == \
+        [str(tmp_path / f"out_{name}.wav") for name in ["ch0", "ch1", "ch2", "mean", "mix"]]
+    assert processing.getMono(input_path, output_path, "all,mean,mix=0.5:0.25:0.25")
+    for index in range(3):
+        out, _ = sf.read(str(tmp_path / f"out_ch{index}.wav"), dtype=dtype)
+        assert out.tolist() == sig[:, index].tolist()
+    #混合结果写出时按输出位宽取整, 允许相差 1 个最小单位
+    lsb = {"PCM_16": 1, "PCM_24": 256, "FLOAT": 1e-6}[subtype]
+    for name, weight_list in [("mean", [1 / 3] * 3), ("mix", [0.5, 0.25, 0.25])]:
+        out, _ = sf.read(str(tmp_path / f"out_{name}.wav"), dtype=dtype)
+        assert np.abs(out.astype(np.float64) - sig.astype(np.float64) @ weight_list).max() <= lsb
+
+    #单个输出直接写到输出路径
+    assert processing.getMono(input_path, str(tmp_path / "single.wav"), 2)
+    assert sf.read(str(tmp_path / "single.wav"), dtype=dtype)[0].tolist() == sig[:, 2].tolist()
+
+
+@pytest.mark.parametrize("spec", ["3", "0,5", "mix=0.5:0.5", "left"])
+def test_get_mono_bad_spec_writes_nothing(tmp_path, spec):
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, np.zeros((10, 3), np.int16), 16000, subtype="PCM_16")
+    assert not AudioBasicProcessing().getMono(input_path, str(tmp_path / "out.wav"), spec)
+    assert os.listdir(tmp_path) == ["in.wav"]
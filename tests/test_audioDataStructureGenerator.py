@@ -0,0 +1,184 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, re, json, random
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+
+
+def write_labs(speaker_dir, lab_list):
+    """ lab_list: [(文本, 编码)], 生成同名的空 wav 与 lab"""
+    os.makedirs(speaker_dir, exist_ok=True)
+    wav_path_list = []
+    for index, (text, encoding) in enumerate(lab_list):
+        wav_path = os.path.join(speaker_dir, f"{index:02d}.wav")
+        open(wav_path, "wb").close()
+        with open(os.path.join(speaker_dir, f"{index:02d}.lab"), "wb") as f:
+            f.write(text.encode(encoding))
+        wav_path_list.append(wav_path)
+    return wav_path_list
+
+
+def test_read_lab_mixed_source_encodings(tmp_path):
+    #gbk 长文本让 chardet 记录 GB2312, 之后的 utf-8 短文本按 GB2312 也能解码成功(乱码)
+    lab_list = [("请把客厅的空调温度调高到二十六度", "gbk"), ("温度", "utf-8"), ("室温", "utf-8"),
+                ("小爱同学请帮我打开卧室的灯并且把窗帘关上", "gbk"), ("打开空调", "utf-8"),
+                ("播放一首周杰伦的稻香然后把音量调到一半", "gbk")]
+    wav_path_list = write_labs(str(tmp_path / "测试来源" / "Spk01"), lab_list)
+
+    generator = AudioDataStructureGenerator()
+    assert [generator.readLab(wav_path)[0] for wav_path in wav_path_list] == [text for text, _ in lab_list]
+    assert generator.find_lab(wav_path_list[0]) == wav_path_list[0][:-4] + ".lab"
+
+
+KEYWORDS_CONFIG = {"info_keywords": {"口音": {"sichuan": ["川普", "sichuanhua"], "yueyu": ["粤语"]}},
+                   "area_keywords": {"guangdong": ["广东", "粤"], "sichuan": ["四川"]}}
+
+
+def old_classify(generator, input_audio_path):
+    """
+        旧版逐个关键字 re.findall 的分类循环, 地区表按同样的规则参与
+        返回 (分类结果, 匹配到多个取值的类别); 多个取值时新旧优先级规则不同, 由 test_classify_path_precedence 覆盖
+    """
+    category_dict = dict(generator.info_keywords_dict, 地区=generator.area_keywords_dict)
+    classify_dict = {}
+    ambiguous_set = set()
+    for category, key_dict in category_dict.items():
+        matched_key_list = []
+        for key in key_dict:
+            for keyword in key_dict[key]:
+                if re.findall(keyword, input_audio_path, re.I):
+                    classify_dict[category] = key
+                    matched_key_list.append(key)
+                    break
+        #woman 中含 man, 旧循环两者都匹配且 woman 在后生效, 与最长匹配一致
+        if len(set(matched_key_list) - ({"man"} if "woman" in matched_key_list else set())) > 1:
+            ambiguous_set.add(category)
+    return classify_dict, ambiguous_set
+
+
+def test_classify_path_matches_old_loop(tmp_path):
+    config_path = str(tmp_path / "keywords.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(KEYWORDS_CONFIG, f, ensure_ascii=False)
+    generator = AudioDataStructureGenerator()
+    assert generator.load_keywords_config(config_path)
+    category_dict = dict(generator.info_keywords_dict, 地区=generator.area_keywords_dict)
+
+    #每个关键字单独出现
+    path_list = []
+    for key_dict in category_dict.values():
+        for keyword_list in key_dict.values():
+            for keyword in keyword_list:
+                path_list += [f"/data/语料/{keyword}/Spk01/0001.wav", f"/data/{keyword.upper()}_录音/Spk01/0001.wav"]
+    #每个类别取一个关键字随机组合
+    rng = random.Random(0)
+    for _ in range(500):
+        part_list = [rng.choice(rng.choice(list(key_dict.values()))) for key_dict in category_dict.values()]
+        rng.shuffle(part_list)
+        path_list.append("/data/" + "/".join(part_list) + "/0001.wav")
+    path_list.append("/data/无关键字/Spk01/0001.wav")
+
+    compared_num = 0
+    for input_audio_path in path_list:
+        old_dict, ambiguous_set = old_classify(generator, input_audio_path)
+        classify_dict = generator.classify_path(input_audio_path)
+        assert set(classify_dict) == set(old_dict), input_audio_path
+        for category in set(old_dict) - ambiguous_set:
+            assert classify_dict[category] == old_dict[category], input_audio_path
+            compared_num += 1
+    assert compared_num > len(path_list)
+
+
+def test_classify_path_precedence(tmp_path):
+    generator = AudioDataStructureGenerator()
+    assert generator.classify_path("/data/woman/0001.wav")["性别"] == "woman"
+    #同一类别多处匹配时靠近文件名的生效
+    assert generator.classify_path("/data/男/女/0001.wav")["性别"] == "woman"
+    assert generator.classify_path("/data/女/男/0001.wav")["性别"] == "man"
+    #不同类别的关键字互不遮挡
+    config_path = str(tmp_path / "keywords.json")
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(KEYWORDS_CONFIG, f, ensure_ascii=False)
+    assert generator.load_keywords_config(config_path)
+    assert generator.classify_path("/data/粤语/0001.wav") == {"口音": "yueyu", "地区": "guangdong"}
+
+
+def old_find_lab(wav_path):
+    """ 旧版: 按后缀顺序逐个 os.path.isfile"""
+    base_path = wav_path.rsplit('.wav', 1)[0] if wav_path.endswith('.wav') else wav_path
+    return next((f"{base_path}{suffix}" for suffix in AudioDataStructureGenerator.LAB_SUFFIX_VARIANTS
+                 if os.path.isfile(f"{base_path}{suffix}")), None)
+
+
+def test_find_lab_matches_old_lookup(tmp_path):
+    rng = random.Random(0)
+    suffix_list = AudioDataStructureGenerator.LAB_SUFFIX_VARIANTS
+    wav_path_list = []
+    for index in range(60):
+        dir_path = str(tmp_path / f"dir{index % 7}")
+        os.makedirs(dir_path, exist_ok=True)
+        wav_path = os.path.join(dir_path, f"{index:02d}.wav")
+        open(wav_path, "wb").close()
+        lab_suffix_list = rng.sample(suffix_list, rng.randint(0, 4))
+        for suffix in lab_suffix_list[1:]:
+            open(wav_path[:-4] + suffix, "w").close()
+        if lab_suffix_list and index % 3 == 0:
+            #与 LAB 同名的目录不算
+            os.makedirs(wav_path[:-4] + lab_suffix_list[0])
+        wav_path_list.append(wav_path)
+
+    generator = AudioDataStructureGenerator()
+    generator.LAB_INDEX_DIR_NUM = 3
+    for wav_path in wav_path_list + wav_path_list[::-1]:
+        assert generator.find_lab(wav_path) == old_find_lab(wav_path), wav_path
+    assert len(generator.lab_dir_index) <= 3
+
+
+def test_cached_names_match_uncached():
+    generator = AudioDataStructureGenerator()
+    assert generator.pypinyin is None
+    text_list = ["打开空调", "把音量调高", "hello_world", "OpenTheDoor", "打开空调", "nihao_xiao_ai", "hello_world"]
+    for _ in range(3):
+        for text in text_list:
+            assert generator.chinese_characters_to_pinyin(text) == generator._chinese_characters_to_pinyin(text)
+            assert generator.ToLargeCamel(text) == generator._to_large_camel(text)
+            assert generator.command_name_cache(text) == generator._to_large_camel(generator._chinese_characters_to_pinyin(text))
+            assert generator.field_cache(text) == generator._to_large_camel(text).replace("_", "")
+    assert generator.chinese_characters_to_pinyin("打开空调") == "dakaikongtiao"
+
+    #每个不同的文本只转换一次
+    distinct_num = len(set(text_list))
+    pinyin_info = generator.pinyin_cache.cache_info()
+    assert pinyin_info.currsize == pinyin_info.misses == distinct_num
+    assert generator.command_name_cache.cache_info().misses == distinct_num
+
+
+def test_file_md5_prefetch_and_memo(tmp_path, monkeypatch):
+    import hashlib
+    path_list = []
+    for size in [0, 1, 4095, 4096, 4097, 3 * 4096 + 7]:
+        file_path = str(tmp_path / f"{size}.wav")
+        with open(file_path, "wb") as f:
+            f.write(os.urandom(size))
+        path_list.append(file_path)
+    generator = AudioDataStructureGenerator()
+    monkeypatch.setattr(generator, "MD5_CHUNK_SIZE", 4096)
+
+    generator.prefetch_file_md5(path_list + [str(tmp_path / "missing.wav")], max_workers=3)
+    compute_list = []
+    original_compute = generator._compute_file_md5
+    monkeypatch.setattr(generator, "_compute_file_md5", lambda file_path, chunk_size=None:
+                        compute_list.append(file_path) or original_compute(file_path, chunk_size))
+    for file_path in path_list:
+        with open(file_path, "rb") as f:
+            assert generator.get_file_md5(file_path) == hashlib.md5(f.read()).hexdigest()
+    assert compute_list == []
+
+    #内容变化(大小/修改时间/inode 任一变化)后重新计算
+    os.replace(path_list[1], path_list[0])
+    with open(path_list[0], "rb") as f:
+        assert generator.get_file_md5(path_list[0]) == hashlib.md5(f.read()).hexdigest()
+    assert compute_list == [path_list[0]]
@@ -0,0 +1,131 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, sqlite3
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from audioForgeXS import AudioProcessSet
+from modules.buildManifest import BuildManifest
+
+
+def make_wavs(input_path, file_num):
+    os.makedirs(input_path)
+    rng = np.random.default_rng(0)
+    for index in range(file_num):
+        sf.write(os.path.join(input_path, f"{index:03d}.wav"), (rng.standard_normal(800) * 0.1).astype(np.float32),
+                 16000, "PCM_16")
+
+
+def test_interrupted_incremental_run_keeps_records(tmp_path, monkeypatch):
+    input_path = os.path.relpath(str(tmp_path / "in"))
+    output_path = str(tmp_path / "out")
+    make_wavs(input_path, 6)
+
+    original_iter = AudioProcessSet._iter_process_results
+    def interrupted_iter(self, *args):
+        for index, result in enumerate(original_iter(self, *args)):
+            if index == 3:
+                raise KeyboardInterrupt
+            yield result
+    monkeypatch.setattr(AudioProcessSet, "_iter_process_results", interrupted_iter)
+    with pytest.raises(KeyboardInterrupt):
+        AudioProcessSet(output_path, False, incremental=True).audio_basic_process(input_path, "audioNorm", 1.0)
+
+    conn = sqlite3.connect(os.path.join(output_path, BuildManifest.MANIFEST_FILE_NAME))
+    assert conn.execute("SELECT COUNT(*) FROM outputs").fetchone()[0] == 3
+    conn.close()
+
+    monkeypatch.setattr(AudioProcessSet, "_iter_process_results", original_iter)
+    aps = AudioProcessSet(output_path, False, incremental=True)
+    processed_list = []
+    monkeypatch.setattr(aps, "process_single", lambda audio_path, *args: processed_list.append(audio_path) or True)
+    aps.audio_basic_process(input_path, "audioNorm", 1.0)
+    assert len(processed_list) == 3
+
+
+def test_progress_total_follows_walk(tmp_path, monkeypatch):
+    import tqdm
+    input_path = os.path.relpath(str(tmp_path / "in"))
+    make_wavs(input_path, 5)
+
+    progress_list = []
+    class RecordingTqdm(tqdm.tqdm):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.total_list = []
+            progress_list.append(self)
+        def update(self, n=1):
+            self.total_list.append(self.total)
+            return super().update(n)
+    monkeypatch.setattr(tqdm, "tqdm", RecordingTqdm)
+
+    aps = AudioProcessSet(str(tmp_path / "out"), False)
+    aps.audio_basic_process(input_path, "getAllWavDuration")
+    assert progress_list[0].n == progress_list[0].total == 5
+    #处理过程中已有总数, 可以显示百分比
+    assert all(total for total in progress_list[0].total_list)
+
+
+def test_structured_prefetch_skips_files_without_lab(tmp_path, monkeypatch):
+    from modules.audioDataStructureGenerator import AudioDataStructureGenerator
+    monkeypatch.chdir(tmp_path)
+    input_path = os.path.join("in", "测试来源", "Spk01")
+    make_wavs(input_path, 6)
+    for index in [1, 4]:
+        with open(os.path.join(input_path, f"{index:03d}.lab"), "w", encoding="utf-8") as f:
+            f.write("打开空调")
+
+    hashed_list = []
+    original_compute = AudioDataStructureGenerator._compute_file_md5
+    monkeypatch.setattr(AudioDataStructureGenerator, "_compute_file_md5",
+                        lambda self, file_path, *args: hashed_list.append(file_path) or original_compute(self, file_path, *args))
+    AudioProcessSet("out", False).audio_basic_process("in", "structuredAudio", 1)
+    assert sorted(os.path.basename(file_path) for file_path in hashed_list) == ["001.wav", "004.wav"]
+
+
+@pytest.mark.parametrize("staged", [False, True])
+def test_absolute_input_keeps_source(tmp_path, staged):
+    import hashlib
+    input_path = str(tmp_path / "abs_in")
+    output_path = str(tmp_path / "abs_out")
+    make_wavs(input_path, 4)
+    def snapshot(root_path):
+        result = {}
+        for dir_path, _, file_list in os.walk(root_path):
+            for file_name in file_list:
+                with open(os.path.join(dir_path, file_name), "rb") as f:
+                    result[os.path.relpath(os.path.join(dir_path, file_name), root_path)] = hashlib.md5(f.read()).hexdigest()
+        return result
+    before = snapshot(input_path)
+
+    aps = AudioProcessSet(output_path, False, staged=staged, incremental=True)
+    aps.audio_basic_process(input_path, "audioNorm", 0.5)
+    assert snapshot(input_path) == before
+    mirror_dir = os.path.join(output_path, *input_path.strip(os.sep).split(os.sep))
+    assert sorted(snapshot(mirror_dir)) == sorted(before)
+    for audio_path in sorted(os.path.join(input_path, name) for name in before):
+        assert aps.expected_outputs(audio_path, "audioNorm", 0.5) == [os.path.join(mirror_dir, os.path.basename(audio_path))]
+
+
+def test_light_commands_skip_heavy_imports(tmp_path):
+    import subprocess
+    input_path = tmp_path / "in"
+    input_path.mkdir()
+    (input_path / "a.wav").write_bytes(b"\x00" * 1000)
+    code = ("import sys, audioForgeXS\n"
+            "heavy_list = ['numpy', 'soundfile', 'pydub', 'pypinyin', 'chardet', 'sqlite3', 'multiprocessing']\n"
+            "for argv in [['-v'], sys.argv[1:]]:\n"
+            "    sys.argv = ['audioForgeXS.py'] + argv\n"
+            "    try:\n"
+            "        audioForgeXS.main()\n"
+            "    except SystemExit:\n"
+            "        pass\n"
+            "    print('loaded:', [name for name in heavy_list if name in sys.modules])\n")
+    result = subprocess.run([sys.executable, "-c", code, "BasicMode", "-i", str(input_path), "-o", str(tmp_path / "out"),
+                             "-f", "getFileSize"], cwd=ROOT_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.count("loaded: []") == 2
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, struct
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.audioBasicProcessing import AudioBasicProcessing
+from modules.audioPipeline import AudioPipeline
+
+WAV_PARA = {"Framerate": 16000, "channels": 1, "SampleEncoding": 16}
+
+
+def build_wav(sig, header_type):
+    """ 带 LIST 块 / 扩展 fmt 块 / 清零头 的 16bit 单通道 wav"""
+    data = sig.astype("<i2").tobytes()
+    if header_type == "zeroed":
+        return b"\x00" * 44 + data
+    if header_type == "extensible":
+        fmt = struct.pack("<HHIIHHHHI16s", 0xFFFE, 1, 16000, 32000, 2, 16, 22, 16, 4,
+                          b"\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71")
+        extra = b"fact" + struct.pack("<II", 4, len(sig))
+    else:
+        fmt = struct.pack("<HHIIHH", 1, 1, 16000, 32000, 2, 16)
+        extra = b"LIST" + struct.pack("<I", 26) + b"INFOISFT" + struct.pack("<I", 14) + b"audioForgeXS\x00\x00"
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+@pytest.mark.parametrize("header_type", ["list", "extensible", "zeroed"])
+def test_pipeline_head_repair_matches_standalone(tmp_path, header_type):
+    sig = (np.random.default_rng(0).standard_normal(1000) * 3000).astype(np.int16)
+    input_path = str(tmp_path / "in.wav")
+    with open(input_path, "wb") as f:
+        f.write(build_wav(sig, header_type))
+
+    repaired_path = str(tmp_path / "repaired.wav")
+    standalone_path = str(tmp_path / "standalone.wav")
+    pipeline_path = str(tmp_path / "pipeline.wav")
+    basic_processing = AudioBasicProcessing()
+    assert basic_processing.wavHeadRepair(input_path, repaired_path, WAV_PARA)
+    assert basic_processing.wavNorm(repaired_path, standalone_path, 0.5)
+    pipeline = AudioPipeline(str(tmp_path), basic_processing=basic_processing)
+    assert pipeline.run(input_path, pipeline_path, {"stages": ["wavHeadRepair", "audioNorm"],
+                                                    "paras": {"wavHeadRepair": WAV_PARA, "audioNorm": 0.5}})
+
+    standalone = sf.read(standalone_path, dtype="int16")[0]
+    assert sf.read(pipeline_path, dtype="int16")[0].tolist() == standalone.tolist()
+    if header_type != "zeroed":
+        assert sf.read(repaired_path, dtype="int16")[0].tolist() == sig.tolist()
+
+
+def snapshot(root_path):
+    """ 相对路径 -> 音频数据"""
+    result = {}
+    for dir_path, _, file_list in os.walk(root_path):
+        for file_name in file_list:
+            if file_name.endswith(".wav"):
+                file_path = os.path.join(dir_path, file_name)
+                result[os.path.relpath(file_path, root_path)] = sf.read(file_path, dtype="int16")[0].tolist()
+    return result
+
+
+def test_structured_pipeline_matches_two_steps(tmp_path, monkeypatch):
+    from audioForgeXS import AudioProcessSet
+    monkeypatch.chdir(tmp_path)
+    rng = np.random.default_rng(0)
+    for speaker in ["Spk01", "Spk02"]:
+        speaker_dir = os.path.join("in", "测试来源", speaker)
+        os.makedirs(speaker_dir)
+        for index in range(2):
+            sf.write(os.path.join(speaker_dir, f"{index:02d}.wav"), (rng.standard_normal(800) * 0.1).astype(np.float32),
+                     16000, "PCM_16")
+            with open(os.path.join(speaker_dir, f"{index:02d}.lab"), "w", encoding="utf-8") as f:
+                f.write("打开空调")
+
+    AudioProcessSet("pipeline_out", False).audio_basic_process(
+        "in", "pipeline", {"stages": ["audioNorm", "structuredAudio"], "paras": {"audioNorm": 0.5}})
+
+    #分步: 先归一化, 把 LAB 放到输出旁, 再对归一化结果结构化
+    AudioProcessSet("norm_out", False).audio_basic_process("in", "audioNorm", 0.5)
+    for dir_path, _, file_list in os.walk("in"):
+        for file_name in file_list:
+            if file_name.endswith(".lab"):
+                with open(os.path.join(dir_path, file_name), "rb") as fin, \
+                        open(os.path.join("norm_out", dir_path, file_name), "wb") as fout:
+                    fout.write(fin.read())
+    AudioProcessSet("step_out", False).audio_basic_process(os.path.join("norm_out", "in"), "structuredAudio", 2)
+
+    pipeline_result = snapshot("pipeline_out")
+    assert len(pipeline_result) == 4
+    assert pipeline_result == snapshot("step_out")
@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.buildManifest import BuildManifest
+
+
+def write(file_path, data=b"x"):
+    with open(file_path, "wb") as f:
+        f.write(data)
+
+
+def bump_mtime(file_path, reference_path, delta_ns):
+    st = os.stat(reference_path)
+    os.utime(file_path, ns=(st.st_atime_ns, st.st_mtime_ns + delta_ns))
+
+
+def test_up_to_date_rules(tmp_path):
+    input_path, output_path = str(tmp_path / "in.wav"), str(tmp_path / "out.wav")
+    write(input_path)
+    write(output_path)
+    bump_mtime(output_path, input_path, 10 ** 9)
+    signature = BuildManifest.signature("audioNorm", 0.5)
+    assert signature == BuildManifest.signature("audioNorm", 0.5) != BuildManifest.signature("audioNorm", 0.6)
+
+    with BuildManifest(str(tmp_path / "m.sqlite")) as manifest:
+        assert not manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+        manifest.putOutputs(input_path, "audioNorm", signature, [output_path])
+        assert manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+        #参数、功能、输出列表变化
+        assert not manifest.isUpToDate(input_path, "audioNorm", BuildManifest.signature("audioNorm", 0.6), [output_path])
+        assert not manifest.isUpToDate(input_path, "getMono", signature, [output_path])
+        assert not manifest.isUpToDate(input_path, "audioNorm", signature, [output_path, input_path])
+        #输出早于输入
+        bump_mtime(output_path, input_path, -10 ** 9)
+        assert not manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+        bump_mtime(output_path, input_path, 10 ** 9)
+        #输入变化 / 输出被删除
+        write(input_path, b"xy")
+        bump_mtime(output_path, input_path, 10 ** 9)
+        assert not manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+        manifest.putOutputs(input_path, "audioNorm", signature, [output_path])
+        assert manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+        os.remove(output_path)
+        assert not manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+
+
+def test_shard_manifests_fallback_and_merge(tmp_path):
+    signature = BuildManifest.signature("audioNorm", 0.5)
+    path_list = []
+    for index in range(4):
+        input_path, output_path = str(tmp_path / f"in{index}.wav"), str(tmp_path / f"out{index}.wav")
+        write(input_path)
+        write(output_path)
+        bump_mtime(output_path, input_path, 10 ** 9)
+        path_list.append((input_path, output_path))
+
+    main_path = str(tmp_path / "m.sqlite")
+    with BuildManifest(main_path) as manifest:
+        manifest.putOutputs(*path_list[0][:1], "audioNorm", signature, path_list[0][1:])
+    shard_path_list = []
+    for index in [1, 2]:
+        shard_path = str(tmp_path / f"m.{index}-of-2.sqlite")
+        with BuildManifest(shard_path, fallback_path=main_path) as manifest:
+            #分片记录可读到合并前的总记录
+            assert manifest.isUpToDate(path_list[0][0], "audioNorm", signature, [path_list[0][1]])
+            for input_path, output_path in path_list[index::2]:
+                manifest.putOutputs(input_path, "audioNorm", signature, [output_path])
+        shard_path_list.append(shard_path)
+
+    with BuildManifest(main_path) as manifest:
+        assert manifest.merge(shard_path_list) == 3
+    with BuildManifest(main_path) as manifest:
+        assert all(manifest.isUpToDate(input_path, "audioNorm", signature, [output_path])
+                   for input_path, output_path in path_list)
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.corpusIndex import CorpusIndex
+
+COMMAND = "DaKaiKongTiao"
+
+
+def make_corpus(root_path, speaker_num=6, file_num=3):
+    """ 只需文件名的空 wav 语料"""
+    for speaker_index in range(speaker_num):
+        speaker = f"Spk{speaker_index:02d}"
+        gender = ["Man", "Woman"][speaker_index % 2]
+        speaker_dir = os.path.join(root_path, COMMAND, speaker)
+        os.makedirs(speaker_dir, exist_ok=True)
+        for file_index in range(file_num):
+            name = f"ZhongGuo_PuTongHua_Normal_1m_{gender}_20-30_{speaker}_{COMMAND}_{file_index:02d}+MD5+{speaker_index}{file_index}.wav"
+            open(os.path.join(speaker_dir, name), "wb").close()
+
+
+def select(root_path, seed, **kwargs):
+    corpus_index = CorpusIndex()
+    corpus_index.build(root_path)
+    return corpus_index.select(COMMAND, os.path.join(root_path, COMMAND), seed, **kwargs)[0]
+
+
+def test_same_seed_same_selection(tmp_path):
+    root_path = str(tmp_path / "corpus")
+    make_corpus(root_path)
+    selected_list = select(root_path, 7)
+    assert selected_list == select(root_path, 7)
+    assert selected_list != select(root_path, 8)
+    assert sorted(selected_list) == sorted(select(root_path, 8))
+    assert len(selected_list) == 18
+
+    #保存后读取的索引给出相同的选取
+    index_path = str(tmp_path / "index.json")
+    corpus_index = CorpusIndex()
+    corpus_index.load_or_build(root_path, index_path)
+    loaded_index = CorpusIndex()
+    assert loaded_index.load(index_path, root_path)
+    assert loaded_index.select(COMMAND, os.path.join(root_path, COMMAND), 7)[0] == selected_list
+
+    #每轮每个人取一条, 性别交替
+    first_round = [os.path.basename(os.path.dirname(path)) for path in selected_list[:6]]
+    assert sorted(first_round) == [f"Spk{index:02d}" for index in range(6)]
+    assert [int(speaker[-2:]) % 2 for speaker in first_round] in ([0, 1] * 3, [1, 0] * 3)
+
+
+def test_new_speaker_keeps_existing_order(tmp_path):
+    root_path = str(tmp_path / "corpus")
+    make_corpus(root_path, speaker_num=4)
+    before_list = select(root_path, 3)
+    make_corpus(root_path, speaker_num=6)
+    after_list = select(root_path, 3)
+    #已有的每个人自己的音频顺序不变
+    for speaker_index in range(4):
+        speaker_dir = os.path.join(root_path, COMMAND, f"Spk{speaker_index:02d}")
+        assert [path for path in after_list if os.path.dirname(path) == speaker_dir] == \
+            [path for path in before_list if os.path.dirname(path) == speaker_dir]
+
+
+def test_index_invalidated_and_filters(tmp_path):
+    root_path = str(tmp_path / "corpus")
+    make_corpus(root_path)
+    index_path = str(tmp_path / "index.json")
+    CorpusIndex().load_or_build(root_path, index_path)
+    open(os.path.join(root_path, COMMAND, "Spk00", "extra.wav"), "wb").close()
+    assert not CorpusIndex().load(index_path, root_path)
+
+    selected_list = select(root_path, 0, only_pattern_list=CorpusIndex.compile_patterns(["Woman"]),
+                           non_pattern_list=CorpusIndex.compile_patterns(["Spk01"]))
+    assert selected_list and all("Woman" in path and "Spk01" not in path for path in selected_list)
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, json, random
+from fractions import Fraction
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.corpusStats import CorpusStats
+from modules.getAudioInfo import DurationSum
+
+GROUP_BY = "command,speaker+gender,source,command+speaker+distance"
+BYTE_RATE_LIST = [16000, 32000, 88200, 96000, 192000, 44100 * 2 * 3]
+
+
+def make_records(num, seed=0):
+    rng = random.Random(seed)
+    record_list = []
+    for index in range(num):
+        speaker = f"Spk{rng.randrange(12):02d}"
+        command = rng.choice(["DaKaiKongTiao", "GuanBiKongTiao", "BoFangYinYue"])
+        name = (f"ZhongGuo_PuTongHua_Normal_{rng.choice(['1m', '3m'])}_{rng.choice(['Man', 'Woman'])}_20-30_"
+                f"{speaker}_{command}_01+MD5+{index:08x}.wav")
+        audio_path = os.path.join("corpus", f"{rng.choice(['甲', '乙'])}来源", speaker, name)
+        #最大接近 4GB 的 data 块, 浮点逐条累加时会丢失精度
+        record_list.append((audio_path, rng.choice([rng.randrange(1, 5000), rng.randrange(2 ** 31, 2 ** 32)]),
+                            rng.choice(BYTE_RATE_LIST)))
+    record_list.append(("corpus/unstructured.wav", 12345, 32000))
+    return record_list
+
+
+def build(record_list):
+    corpus_stats = CorpusStats(GROUP_BY)
+    for record in record_list:
+        corpus_stats.add(*record)
+    return corpus_stats
+
+
+def reference_groups(corpus_stats, record_list):
+    """ 纯 python 整数累加的参考结果: 分组名 -> {字段值元组: (条数, 每秒字节数 -> 字节数)}"""
+    field_index_dict = {field: index for index, field in enumerate(CorpusStats.NAME_FIELD_LIST)}
+    group_dict = {}
+    for field_tuple in corpus_stats.group_list:
+        row_dict = group_dict.setdefault(corpus_stats.group_name(field_tuple), {})
+        for audio_path, data_size, byte_rate in record_list:
+            dir_path, file_name = os.path.split(audio_path)
+            field_list = os.path.splitext(file_name)[0].split("_")
+            if len(field_list) != CorpusStats.NAME_FIELD_NUM:
+                continue
+            value_tuple = tuple(os.path.basename(os.path.dirname(dir_path)) if field == CorpusStats.SOURCE_FIELD
+                                else field_list[field_index_dict[field]] for field in field_tuple)
+            file_num, bytes_dict = row_dict.get(value_tuple, (0, {}))
+            bytes_dict[str(byte_rate)] = bytes_dict.get(str(byte_rate), 0) + data_size
+            row_dict[value_tuple] = (file_num + 1, bytes_dict)
+    return group_dict
+
+
+def test_group_sums_are_exact():
+    record_list = make_records(3000)
+    corpus_stats = build(record_list)
+    partial = corpus_stats.partial()
+    for group_name, row_dict in reference_groups(corpus_stats, record_list).items():
+        assert {tuple(value_list): (file_num, bytes_dict) for value_list, file_num, bytes_dict
+                in partial["groups"][group_name]} == {key: (num, dict(sorted(bytes_dict.items(), key=lambda item: int(item[0]))))
+                                                      for key, (num, bytes_dict) in row_dict.items()}
+    structured_list = record_list[:-1]
+    assert partial["total"][0] == len(structured_list)
+    total = DurationSum(partial["total"][1])
+    assert sum(Fraction(size, rate) for _, size, rate in structured_list) == \
+        sum(Fraction(size, int(rate)) for rate, size in total.to_dict().items())
+    assert partial["unparsed"] == [1, {"32000": 12345}]
+
+
+def test_order_and_shards_do_not_change_report(tmp_path):
+    record_list = make_records(1000, seed=1)
+    expected = build(record_list).report(str(tmp_path / "whole"))
+
+    shuffled_list = list(record_list)
+    random.Random(2).shuffle(shuffled_list)
+    part_list = [build(shuffled_list[index::3]).partial() for index in range(3)]
+    #partial 经过 json 往返, 与分片结果文件一致
+    part_list = [json.loads(json.dumps(part, ensure_ascii=False)) for part in part_list]
+    merged = CorpusStats(GROUP_BY).report(str(tmp_path / "merged"), CorpusStats.merge_partials(part_list))
+    assert merged == expected
+    for file_name in os.listdir(str(tmp_path / "whole")):
+        with open(str(tmp_path / "whole" / file_name), "rb") as f_whole, open(str(tmp_path / "merged" / file_name), "rb") as f_merged:
+            assert f_whole.read() == f_merged.read(), file_name
+
+
+def test_duration_sum_merge():
+    duration = DurationSum()
+    duration.add(32000, 32000)
+    duration.add(16000, 16000)
+    other = DurationSum({"32000": 16000})
+    duration.merge(other)
+    assert duration.to_dict() == {"16000": 16000, "32000": 48000}
+    assert duration.seconds() == 2.5
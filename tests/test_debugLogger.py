@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, json, logging
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.debugLogger import DebugLogger, MetricsSink
+
+
+class Unformattable:
+    """ 格式化时计数, 用于确认被过滤的信息不会格式化"""
+    format_num = 0
+
+    def __str__(self):
+        Unformattable.format_num += 1
+        return "x"
+
+
+def test_level_guard_skips_formatting(caplog):
+    logger = DebugLogger("info")
+    with caplog.at_level(logging.DEBUG, logger="console_logger"):
+        logger.log("调试 %s", "debug", Unformattable())
+        assert Unformattable.format_num == 0
+        assert not logger.isEnabledFor("debug") and logger.isEnabledFor("ERROR")
+        logger.log("提示 %s", "info", Unformattable())
+        assert Unformattable.format_num == 1
+    assert [record.levelno for record in caplog.records] == [logging.INFO]
+    with pytest.raises(ValueError):
+        DebugLogger("verbose")
+
+
+def test_console_handler_added_once():
+    for _ in range(5):
+        DebugLogger("debug")
+    handler_list = [handler for handler in logging.getLogger("console_logger").handlers
+                    if getattr(handler, "_debug_logger", False)]
+    assert len(handler_list) == 1
+
+
+def test_metrics_drain_merge_emit(tmp_path):
+    worker = MetricsSink()
+    worker.count("files", 2)
+    worker.add_time("read", 0.5)
+    with worker.timer("read"):
+        pass
+    main = MetricsSink()
+    main.count("files")
+    main.add_time("read", 1.0)
+    main.merge(worker.drain())
+    main.merge(None)
+    assert worker.drain() == {"counters": {}, "timers": {}}
+    assert main.counter_dict == {"files": 3}
+    assert main.timer_dict["read"][0] == 3 and main.timer_dict["read"][2] == 1.0
+
+    output_path = str(tmp_path / "metrics" / "m.jsonl")
+    main.emit(output_path, function="audioNorm")
+    main.emit(output_path, function="audioNorm")
+    with open(output_path, "r", encoding="utf-8") as f:
+        line_list = [json.loads(line) for line in f]
+    assert len(line_list) == 4
+    assert {line["name"] for line in line_list} == {"files", "read"}
+    assert all(line["function"] == "audioNorm" for line in line_list)
+    timer_line = next(line for line in line_list if line["type"] == "timer")
+    assert timer_line["count"] == 3 and timer_line["max_s"] == 1.0
@@ -0,0 +1,18 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "benchmarks"))
+from functionBenchmark import compare
+
+
+def test_compare_error_is_regression():
+    baseline_dict = {"ok": {"files_per_s": 100, "peak_rss_mb": 50}, "broken": {"files_per_s": 100},
+                     "base_error": {"error": "失败"}}
+    result_dict = {"ok": {"files_per_s": 95, "peak_rss_mb": 52}, "broken": {"error": "失败"},
+                   "base_error": {"error": "失败"}, "new": {"error": "失败"}}
+    regression_list = compare(result_dict, baseline_dict, 0.15)
+    assert len(regression_list) == 1 and regression_list[0].startswith("broken")
+    assert compare({"ok": {"files_per_s": 80, "peak_rss_mb": 50}}, baseline_dict, 0.15)
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, struct, binascii
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.getAudioInfo import GetAudioInfo
+
+#与旧版按固定偏移解析的结果对比的字段
+COMPARE_FIELDS = ["音频格式(PCM音频数据的值为1)", "Channels", "Framerate", "每秒的数据字节数", "数据快对齐",
+                  "SampWidth", "FileDuration", "SampleTime", "nFrames"]
+
+
+def old_get_wav_infor(input_wav):
+    """ 旧版 getWavInfor: 按 44 字节标准头的固定偏移解析十六进制字符串"""
+    with open(input_wav, "rb") as f:
+        hexstr = str(binascii.b2a_hex(f.read(44)), "utf-8")
+    hex_data_list = [hexstr[index:index + 2] for index in range(0, len(hexstr), 2)]
+    def field(start, end):
+        return int("".join(hex_data_list[start:end][::-1]), base=16)
+    info = {"区块长度": field(16, 20), "音频格式(PCM音频数据的值为1)": field(20, 22), "Channels": field(22, 24),
+            "Framerate": field(24, 28), "每秒的数据字节数": field(28, 32), "数据快对齐": field(32, 34),
+            "SampWidth": {8: 1, 16: 2, 24: 3, 32: 4}[field(34, 36)]}
+    info["文件的数据大小"] = os.path.getsize(input_wav)
+    info["FileDuration"] = (info["文件的数据大小"] - 44) / (info["Channels"] * info["Framerate"] * info["SampWidth"])
+    info["SampleTime"] = 1 / info["Framerate"]
+    info["nFrames"] = info["Framerate"] * info["FileDuration"]
+    return info
+
+
+def build_wav(data, channels, framerate, sampwidth, header_type="plain"):
+    """ 生成 标准/带 LIST 块/扩展格式/含奇数长度块 的 wav 文件内容"""
+    block_align = channels * sampwidth
+    fmt = struct.pack("<HHIIHH", 1, channels, framerate, framerate * block_align, block_align, sampwidth * 8)
+    extra = b""
+    if header_type == "extensible":
+        fmt = struct.pack("<HHIIHHHHI16s", 0xFFFE, channels, framerate, framerate * block_align, block_align,
+                          sampwidth * 8, 22, sampwidth * 8, 0,
+                          b"\x01\x00\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71")
+        extra = b"fact" + struct.pack("<II", 4, len(data) // block_align)
+    elif header_type == "list":
+        info = b"INFOISFT" + struct.pack("<I", 14) + b"audioForgeXS\x00\x00"
+        extra = b"LIST" + struct.pack("<I", len(info)) + info
+    elif header_type == "odd":
+        #奇数长度的块后补一个字节对齐
+        extra = b"junk" + struct.pack("<I", 5) + b"abcde\x00"
+    body = b"WAVE" + b"fmt " + struct.pack("<I", len(fmt)) + fmt + extra + b"data" + struct.pack("<I", len(data)) + data
+    return b"RIFF" + struct.pack("<I", len(body)) + body
+
+
+FORMAT_LIST = [(1, 16000, 2), (2, 44100, 2), (1, 8000, 1), (2, 48000, 3), (1, 16000, 4)]
+
+
+@pytest.mark.parametrize("channels, framerate, sampwidth", FORMAT_LIST)
+@pytest.mark.parametrize("header_type", ["plain", "list", "extensible", "odd"])
+def test_chunk_walker_matches_old_parser(tmp_path, channels, framerate, sampwidth, header_type):
+    data = bytes(range(256)) * (channels * sampwidth * 7)
+    plain_path = str(tmp_path / "plain.wav")
+    with open(plain_path, "wb") as f:
+        f.write(build_wav(data, channels, framerate, sampwidth))
+    wav_path = str(tmp_path / f"{header_type}.wav")
+    with open(wav_path, "wb") as f:
+        f.write(build_wav(data, channels, framerate, sampwidth, header_type))
+
+    #同一段音频, 新解析器对任意头的结果与旧解析器对标准头的结果一致
+    old_info = old_get_wav_infor(plain_path)
+    get_audio_info = GetAudioInfo()
+    info = get_audio_info.getWavInfor(wav_path)
+    assert {key: info[key] for key in COMPARE_FIELDS} == {key: old_info[key] for key in COMPARE_FIELDS}
+    assert info["DataSize"] == len(data)
+    with open(wav_path, "rb") as f:
+        assert f.read()[info["DataOffset"]:] == data
+    if header_type == "plain":
+        assert info["区块长度"] == old_info["区块长度"] and info["文件的数据大小"] == old_info["文件的数据大小"]
+
+    (batch_info, err), = get_audio_info.getWavInfoBatch([wav_path])
+    assert err is None and batch_info == info
+
+
+def test_truncated_and_invalid(tmp_path):
+    data = b"\x01\x02" * 100
+    wav_path = str(tmp_path / "cut.wav")
+    with open(wav_path, "wb") as f:
+        f.write(build_wav(data, 1, 16000, 2)[:-50])
+    assert GetAudioInfo().getWavInfor(wav_path)["DataSize"] == len(data) - 50
+
+    bad_path = str(tmp_path / "bad.wav")
+    with open(bad_path, "wb") as f:
+        f.write(b"\x00" * 100)
+    with pytest.raises(ValueError):
+        GetAudioInfo().readWavHeader(bad_path)
+    (info, err), = GetAudioInfo().getWavInfoBatch([bad_path])
+    assert info is None and err
@@ -0,0 +1,136 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, hashlib
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.getTestSetAndNorm import GetTestSetAndNorm
+
+
+COMMAND = "DaKaiKongTiao"
+
+
+def make_corpus(root_path, speaker_num=4, file_num=2):
+    """ 指令/人编号/结构化文件名 的小语料"""
+    rng = np.random.default_rng(0)
+    for speaker_index in range(speaker_num):
+        speaker = f"Spk{speaker_index:02d}"
+        speaker_dir = os.path.join(root_path, COMMAND, speaker)
+        os.makedirs(speaker_dir)
+        for file_index in range(file_num):
+            name = f"BeiJing_PuTong_ZhongSu_1m_Man_20-30_{speaker}_{COMMAND}_{file_index:02d}+MD5+{speaker_index}{file_index}.wav"
+            sf.write(os.path.join(speaker_dir, name), (rng.standard_normal(1600) * 0.1).astype(np.float32), 16000, "PCM_16")
+
+
+def snapshot(root_path):
+    """ 相对路径 -> md5"""
+    result = {}
+    for dir_path, _, file_list in os.walk(root_path):
+        for file_name in file_list:
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "rb") as f:
+                result[os.path.relpath(file_path, root_path)] = hashlib.md5(f.read()).hexdigest()
+    return result
+
+
+def test_absolute_input_keeps_source(tmp_path):
+    input_path = str(tmp_path / "abs_in")
+    output_path = str(tmp_path / "abs_out")
+    make_corpus(input_path)
+    before = snapshot(input_path)
+
+    gtsan = GetTestSetAndNorm(output_path, False)
+    gtsan.getTestSetAndNorm(input_path, COMMAND, 5)
+    #增量刷新及中断遗留目录的清理也不能动到输入
+    os.makedirs(gtsan._output_path(os.path.join(input_path, COMMAND)))
+    GetTestSetAndNorm(output_path, False, incremental=True).getTestSetAndNorm(input_path, COMMAND, 6)
+
+    assert snapshot(input_path) == before
+    norm_dir = gtsan._output_path(os.path.join(input_path, f"{COMMAND}_norm_6"))
+    assert os.path.realpath(norm_dir).startswith(os.path.realpath(output_path))
+    assert len([name for name in snapshot(norm_dir) if name.endswith(".wav")]) == 6
+
+
+def test_check_output_path(tmp_path):
+    gtsan = GetTestSetAndNorm(str(tmp_path / "out"), False)
+    for path in [str(tmp_path / "out"), str(tmp_path / "in"), str(tmp_path / "out" / ".." / "in")]:
+        try:
+            gtsan._check_output_path(path)
+        except OSError:
+            continue
+        raise AssertionError(f"{path} 不应允许删除")
+    gtsan._check_output_path(str(tmp_path / "out" / "cmd"))
+
+
+def test_same_seed_same_test_set(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_corpus("in", speaker_num=5, file_num=3)
+    result_list = []
+    for output_path, seed in [("out_a", 11), ("out_b", 11), ("out_c", 12)]:
+        GetTestSetAndNorm(output_path, False, seed=seed).getTestSetAndNorm("in", COMMAND, 7)
+        result_list.append(sorted(name for name in snapshot(output_path) if name.endswith(".wav")))
+    assert len(result_list[0]) == 7
+    assert result_list[0] == result_list[1]
+    assert result_list[0] != result_list[2]
+
+
+def wav_names(root_path):
+    return sorted(name for name in snapshot(root_path) if name.endswith(".wav"))
+
+
+def run_counting(monkeypatch, output_path, set_max_num, **kwargs):
+    """ 运行一次, 返回本次实际归一化的源文件列表"""
+    from modules.audioBasicProcessing import AudioBasicProcessing
+    norm_list = []
+    original_norm = AudioBasicProcessing.wavNorm
+    def counting_norm(self, input_audio_path, *args, **norm_kwargs):
+        norm_list.append(input_audio_path)
+        return original_norm(self, input_audio_path, *args, **norm_kwargs)
+    with monkeypatch.context() as patch:
+        patch.setattr(AudioBasicProcessing, "wavNorm", counting_norm)
+        GetTestSetAndNorm(output_path, False, seed=3, **kwargs).getTestSetAndNorm("in", COMMAND, set_max_num)
+    return norm_list
+
+
+def test_incremental_grow_and_shrink(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_corpus("in", speaker_num=4, file_num=3)
+    assert len(run_counting(monkeypatch, "out", 5)) == 5
+    before = snapshot("out")
+
+    #数量增加: 只归一化新增的 2 条, 结果与重新全量生成一致
+    assert len(run_counting(monkeypatch, "out", 7, incremental=True)) == 2
+    run_counting(monkeypatch, "fresh", 7)
+    assert wav_names("out") == wav_names("fresh")
+    after = snapshot("out")
+    for name, md5 in before.items():
+        if name.endswith(".wav"):
+            assert after[name.replace("_norm_5", "_norm_7")] == md5
+
+    #数量减少: 不再归一化, 按轮询顺序保留
+    assert run_counting(monkeypatch, "out", 4, incremental=True) == []
+    run_counting(monkeypatch, "fresh4", 4)
+    assert wav_names("out") == wav_names("fresh4")
+
+
+def test_incremental_changed_source_and_new_speaker(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_corpus("in", speaker_num=4, file_num=2)
+    first_list = run_counting(monkeypatch, "out", 6)
+    changed_path = first_list[0]
+    sf.write(changed_path, np.full(1600, 0.2, np.float32), 16000, "PCM_16")
+    os.utime(changed_path, ns=(1, 1))
+    speaker_dir = os.path.join("in", COMMAND, "Spk09")
+    os.makedirs(speaker_dir)
+    sf.write(os.path.join(speaker_dir, f"BeiJing_PuTong_ZhongSu_1m_Man_20-30_Spk09_{COMMAND}_00+MD5+90.wav"),
+             np.full(1600, 0.1, np.float32), 16000, "PCM_16")
+
+    norm_list = run_counting(monkeypatch, "out", 6, incremental=True)
+    #未变化的成员全部保留, 只补足被作废的 1 条
+    assert len(norm_list) == 1
+    assert not set(norm_list) & (set(first_list) - {changed_path})
+    assert len(wav_names("out")) == 6
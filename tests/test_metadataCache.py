@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, sqlite3
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.getAudioInfo import GetAudioInfo
+from modules.metadataCache import MetadataCache
+
+
+def test_md5_invalidated_by_inode(tmp_path):
+    file_path = str(tmp_path / "a.wav")
+    with open(file_path, "wb") as f:
+        f.write(b"a" * 100)
+    with MetadataCache(str(tmp_path / "cache.sqlite")) as cache:
+        cache.putMd5(file_path, "md5a")
+        assert cache.getMd5(file_path) == "md5a"
+
+        #同大小、同修改时间的另一个文件替换原文件, 只有 inode 不同
+        st = os.stat(file_path)
+        other_path = str(tmp_path / "b.wav")
+        with open(other_path, "wb") as f:
+            f.write(b"b" * 100)
+        os.utime(other_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+        os.replace(other_path, file_path)
+        assert os.stat(file_path).st_size == st.st_size and os.stat(file_path).st_ino != st.st_ino
+        assert cache.getMd5(file_path) is None
+
+
+def test_old_cache_schema_upgraded(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    conn = sqlite3.connect(cache_path)
+    conn.execute("""CREATE TABLE wav_meta (
+                        path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER,
+                        audio_format INTEGER, channels INTEGER, framerate INTEGER,
+                        byte_rate INTEGER, block_align INTEGER, bits_per_sample INTEGER,
+                        fmt_size INTEGER, data_offset INTEGER, data_size INTEGER,
+                        duration REAL, peak REAL, md5 TEXT)""")
+    file_path = str(tmp_path / "a.wav")
+    with open(file_path, "wb") as f:
+        f.write(b"a" * 100)
+    st = os.stat(file_path)
+    conn.execute("INSERT INTO wav_meta (path, size, mtime_ns, md5) VALUES (?, ?, ?, ?)",
+                 (os.path.abspath(file_path), st.st_size, st.st_mtime_ns, "old"))
+    conn.commit()
+    conn.close()
+
+    with MetadataCache(cache_path) as cache:
+        assert cache.getMd5(file_path) is None
+        cache.putMd5(file_path, "new")
+        assert cache.getMd5(file_path) == "new"
+
+
+def make_wavs(dir_path, file_num):
+    os.makedirs(dir_path, exist_ok=True)
+    path_list = []
+    for index in range(file_num):
+        file_path = os.path.join(dir_path, f"{index:02d}.wav")
+        sf.write(file_path, np.zeros(160 * (index + 1), np.int16), 16000, "PCM_16")
+        path_list.append(file_path)
+    return path_list
+
+
+def test_batch_info_served_from_cache(tmp_path):
+    path_list = make_wavs(str(tmp_path / "in"), 5)
+    expected_list = GetAudioInfo().getWavInfoBatch(path_list)
+
+    cache_path = str(tmp_path / "cache.sqlite")
+    for run_index in range(2):
+        with MetadataCache(cache_path) as cache:
+            get_audio_info = GetAudioInfo()
+            get_audio_info.cache = cache
+            assert get_audio_info.getWavInfoBatch(path_list) == expected_list
+            #第二次运行全部命中
+            assert (cache.hit_count, cache.miss_count) == ((0, 5) if run_index == 0 else (5, 0))
+
+    #修改过的文件重新解析, 其余仍命中
+    sf.write(path_list[2], np.zeros(16000, np.int16), 16000, "PCM_16")
+    with MetadataCache(cache_path) as cache:
+        get_audio_info = GetAudioInfo()
+        get_audio_info.cache = cache
+        result_list = get_audio_info.getWavInfoBatch(path_list)
+        assert (cache.hit_count, cache.miss_count) == (4, 1)
+        assert result_list[2][0]["FileDuration"] == 1.0
+
+
+def test_evict_missing(tmp_path):
+    path_list = make_wavs(str(tmp_path / "in"), 3)
+    other_path = make_wavs(str(tmp_path / "other"), 1)[0]
+    with MetadataCache(str(tmp_path / "cache.sqlite")) as cache:
+        for path in path_list + [other_path]:
+            cache.putPeak(path, 0.5)
+        os.remove(path_list[1])
+        assert cache.evictMissing(str(tmp_path / "in"), [path_list[0], path_list[2]]) == 1
+        assert cache.getPeak(path_list[0]) == 0.5 and cache.getPeak(other_path) == 0.5
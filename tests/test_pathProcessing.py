@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, re, sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.pathProcessing import PathProcessing
+
+
+def old_get_file_list(dir_path, lock_regular):
+    """ 原 listdir/isdir 递归实现, 作为对照"""
+    flist = []
+    if os.path.isfile(dir_path):
+        if re.findall(lock_regular, dir_path, re.I) and not re.findall(r"\.swp$", dir_path):
+            flist.append(dir_path)
+        return flist
+    for i in os.listdir(dir_path):
+        tmp_path = os.path.join(dir_path, i)
+        if os.path.isdir(tmp_path) and os.listdir(tmp_path):
+            flist.extend(old_get_file_list(tmp_path, lock_regular))
+        elif re.findall(lock_regular, tmp_path, re.I) and not re.findall(r"\.swp$", tmp_path):
+            flist.append(tmp_path)
+    return flist
+
+
+def make_tree(root):
+    for dir_index in range(4):
+        for sub_index in range(3):
+            sub_dir = os.path.join(root, f"d{dir_index}", f"s{sub_index}")
+            os.makedirs(sub_dir)
+            for name in ["a.wav", "b.WAV", "c.txt", "d.wav.swp", "e.lab"]:
+                open(os.path.join(sub_dir, f"{dir_index}{sub_index}_{name}"), "w").close()
+    open(os.path.join(root, "top.wav"), "w").close()
+
+
+@pytest.mark.parametrize("lock_regular", [r"\.wav$", r"\.(wav|lab)$", ".c"])
+def test_walk_matches_old_listing(tmp_path, lock_regular):
+    make_tree(str(tmp_path))
+    old_list = old_get_file_list(str(tmp_path), lock_regular)
+    path_processing = PathProcessing()
+
+    assert path_processing.get_file_list(str(tmp_path), lock_regular) == old_list
+    assert sorted(path_processing.get_file_list(str(tmp_path), lock_regular, threads=3)) == sorted(old_list)
+    single_path = os.path.join(str(tmp_path), "top.wav")
+    assert path_processing.get_file_list(single_path, lock_regular) == old_get_file_list(single_path, lock_regular)
+
+
+def test_walk_is_lazy(tmp_path, monkeypatch):
+    make_tree(str(tmp_path))
+    scan_list = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, "scandir", lambda path: scan_list.append(path) or scandir(path))
+
+    file_iter = PathProcessing().iter_file_list(str(tmp_path), r"\.wav$")
+    next(file_iter)
+    #第一个文件返回时最多打开了从根目录到第一个叶子目录的路径, 其余 14 个目录尚未读取
+    assert len(scan_list) <= 3
+    file_iter.close()
+
+
+def test_missing_path_yields_nothing(tmp_path):
+    assert PathProcessing().get_file_list(str(tmp_path / "missing"), r"\.wav$") == []
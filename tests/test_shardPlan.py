@@ -0,0 +1,65 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, hashlib
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from audioForgeXS import AudioProcessSet
+from modules.shardPlan import ShardPlan
+
+
+SHARD_NUM = 3
+
+
+def make_corpus(root_path):
+    """ 结构化文件名、不同采样率的小语料"""
+    rng = np.random.default_rng(0)
+    for index in range(24):
+        speaker = f"Spk{index % 5:02d}"
+        command = ["DaKaiKongTiao", "GuanBiKongTiao"][index % 2]
+        speaker_dir = os.path.join(root_path, f"测试来源{index % 2}", speaker)
+        os.makedirs(speaker_dir, exist_ok=True)
+        name = f"ZhongGuo_PuTongHua_Normal_1m_{['Man', 'Woman'][index % 3 % 2]}_20-30_{speaker}_{command}_01+MD5+{index:04d}.wav"
+        sf.write(os.path.join(speaker_dir, name), (rng.standard_normal(331 + 97 * index) * 0.1).astype(np.float32),
+                 [8000, 16000, 44100][index % 3], "PCM_16")
+
+
+def snapshot(root_path):
+    result = {}
+    for dir_path, dir_list, file_list in os.walk(root_path):
+        dir_list[:] = [dir_name for dir_name in dir_list if dir_name != ShardPlan.SHARD_DIR_NAME]
+        for file_name in file_list:
+            if file_name.startswith(".audioForgeXS_"):
+                continue
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "rb") as f:
+                result[os.path.relpath(file_path, root_path)] = hashlib.md5(f.read()).hexdigest()
+    return result
+
+
+def test_shard_union_matches_unsharded(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_corpus("in")
+    for process_type, input_wav_info in [("audioNorm", 0.5), ("corpusStats", "command,speaker+gender,source")]:
+        AudioProcessSet(f"{process_type}_full", False).audio_basic_process("in", process_type, input_wav_info)
+        for index in range(1, SHARD_NUM + 1):
+            aps = AudioProcessSet(f"{process_type}_shard", False, shard=f"{index}/{SHARD_NUM}")
+            aps.audio_basic_process("in", process_type, input_wav_info)
+        assert AudioProcessSet(f"{process_type}_shard", False).merge_shards(process_type)
+        full_result = snapshot(f"{process_type}_full")
+        assert full_result
+        assert snapshot(f"{process_type}_shard") == full_result
+
+
+def test_shard_keys_partition_files():
+    key_list = [ShardPlan.relative_key(os.path.join("root", "a", f"{index}.wav"), "root", True) for index in range(100)]
+    assert key_list[0] == "a/0.wav"
+    owner_list = [[index for index in range(1, SHARD_NUM + 1) if ShardPlan(f"{index}/{SHARD_NUM}").owns(key)]
+                  for key in key_list]
+    assert all(len(owner) == 1 for owner in owner_list)
+    assert {owner[0] for owner in owner_list} == set(range(1, SHARD_NUM + 1))
+    assert ShardPlan.relative_key(os.path.join("root", "a", "0.wav"), os.path.join("root", "a", "0.wav"), False) == "0.wav"
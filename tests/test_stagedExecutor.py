@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, threading, time
+
+import numpy as np
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from modules.stagedExecutor import StagedExecutor
+
+
+FILL_PARA = {"stages": ["audioNorm"], "paras": {}}
+
+
+class FakePipeline:
+    """ 不读写文件的流水线, 写出可设置延迟; 输入名含 bad 时读取失败"""
+    def __init__(self, write_delay=0.0):
+        self.write_delay = write_delay
+        self.written_list = []
+        self.lock = threading.Lock()
+
+    def output_path(self, input_audio_path, output_audio_path, stage_list):
+        return output_audio_path
+
+    def estimate_size(self, input_audio_path, stage_list, para_dict):
+        return 100
+
+    def read(self, input_audio_path, stage_list, para_dict):
+        if "bad" in input_audio_path:
+            raise ValueError("损坏")
+        return np.zeros((10, 1), np.int16), 16000, "PCM_16"
+
+    def transform(self, sig, stage_list, para_dict):
+        return sig
+
+    def write(self, sig, fs, subtype, final_output_path):
+        time.sleep(self.write_delay)
+        with self.lock:
+            self.written_list.append(final_output_path)
+        return final_output_path
+
+
+def tasks(num):
+    return [(f"{'bad' if index % 5 == 2 else 'in'}{index}.wav", f"out{index}.wav", FILL_PARA) for index in range(num)]
+
+
+def test_results_cover_all_tasks():
+    pipeline = FakePipeline()
+    result_list = list(StagedExecutor(pipeline, queue_depth=2, memory_budget=300).imap(tasks(40)))
+    result_dict = {result[0]: result for result in result_list}
+    assert len(result_list) == len(result_dict) == 40
+    assert sorted(path for path, ok, _, _ in result_list if not ok) == sorted(task[0] for task in tasks(40) if "bad" in task[0])
+    assert len(pipeline.written_list) == 32
+
+
+def test_early_close_stops_all_threads():
+    thread_num = threading.active_count()
+    executor = StagedExecutor(FakePipeline(write_delay=0.05), queue_depth=1, memory_budget=100)
+    result_iter = executor.imap(tasks(1000))
+    next(result_iter)
+    start = time.time()
+    result_iter.close()
+    #关闭时各段线程都已退出, 包括等待额度和队列的线程
+    assert time.time() - start < 2
+    assert threading.active_count() == thread_num
+
+    #再次运行不受上一次的影响
+    pipeline = FakePipeline()
+    executor.pipeline = pipeline
+    assert len(list(executor.imap(tasks(20)))) == 20
+    assert len(pipeline.written_list) == 16
@@ -0,0 +1,84 @@
+#!/usr/bin/python3
+#-*- coding:utf-8 -*-
+
+import os, sys, hashlib
+
+import numpy as np
+import soundfile as sf
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from audioForgeXS import AudioProcessSet
+from modules.audioBasicProcessing import AudioBasicProcessing
+from modules.workerPool import WorkerPool
+
+
+def make_inputs(input_path, file_num):
+    """ 正常 wav 中夹杂损坏的 wav 与不存在的路径"""
+    os.makedirs(input_path)
+    rng = np.random.default_rng(0)
+    path_list = []
+    for index in range(file_num):
+        file_path = os.path.join(input_path, f"{index:03d}.wav")
+        if index % 7 == 3:
+            with open(file_path, "wb") as f:
+                f.write(b"RIFF\x00\x00")
+        else:
+            sf.write(file_path, (rng.standard_normal(400) * 0.1).astype(np.float32), 16000, "PCM_16")
+        path_list.append(file_path)
+    path_list.insert(5, os.path.join(input_path, "missing.wav"))
+    return path_list
+
+
+def snapshot(root_path):
+    result = {}
+    for dir_path, _, file_list in os.walk(root_path):
+        for file_name in file_list:
+            file_path = os.path.join(dir_path, file_name)
+            with open(file_path, "rb") as f:
+                result[os.path.relpath(file_path, root_path)] = hashlib.md5(f.read()).hexdigest()
+    return result
+
+
+def test_jobs_match_single_process(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    path_list = make_inputs("in", 30)
+
+    result_dict = {}
+    for jobs in [1, 3]:
+        aps = AudioProcessSet(f"out_{jobs}", False, jobs=jobs)
+        result_dict[jobs] = list(aps._iter_process_results(iter(path_list), "audioNorm", 0.5))
+
+    assert [result[0] for result in result_dict[3]] == path_list
+    assert result_dict[3] == result_dict[1]
+    assert snapshot("out_3") == snapshot("out_1")
+    assert sum(1 for result in result_dict[1] if result[2] is True) == 26
+
+
+def test_imap_bounded_window(tmp_path):
+    sig = (np.random.default_rng(0).standard_normal(400) * 0.1).astype(np.float32)
+    input_path = str(tmp_path / "in.wav")
+    sf.write(input_path, sig, 16000, "PCM_16")
+
+    consumed = [0]
+    def iter_args():
+        for index in range(200):
+            consumed[0] += 1
+            if index == 7:
+                yield (input_path,)  #参数缺失, 工作进程内抛出异常
+            else:
+                yield input_path, str(tmp_path / f"{index:03d}.wav"), 0.5
+
+    jobs, chunksize = 2, 4
+    result_list = []
+    with WorkerPool(AudioBasicProcessing, jobs=jobs) as pool:
+        for result in pool.imap("wavNorm", iter_args(), chunksize=chunksize):
+            if not result_list:
+                #取得第一个结果时, 已读取的任务不超过窗口大小再加补充的一批
+                assert consumed[0] <= jobs * chunksize * 2 + chunksize
+            result_list.append(result)
+
+    assert len(result_list) == 200
+    assert [index for index, (ok, _, _) in enumerate(result_list) if not ok] == [7]
+    assert result_list[7][2].startswith("TypeError")
+    assert all(res is True for index, (_, res, _) in enumerate(result_list) if index != 7)